@@ -0,0 +1,118 @@
+"""
+Benchmark: writing a flush of ``user_activity_details`` minutes.
+
+Adds one minute count to each of ``--rows`` (user, activity type, name) keys
+in three ways:
+
+- ``per-row``: one awaited ``INSERT ... ON CONFLICT`` per key. This is how
+  the radio listener tracking (and, before the presence pipeline, the detailed
+  activity flush) wrote.
+- ``executemany``: the same statement through ``executemany``. One round
+  trip, but the server still executes it once per key.
+- ``unnest``: ``add_detail_minutes``, one statement for the whole batch.
+
+Each flush runs twice per size. The first pass inserts the rows and the
+second updates them, so both sides of the upsert are timed.
+
+Usage (from the repository root; without ``--dsn`` it runs against a throwaway
+local cluster, see ``src/database/ephemeral.py``. A ``--dsn`` database must be
+migrated; the benchmark deletes its own rows afterwards)::
+
+    python -m benchmarks.activity_details
+    python -m benchmarks.activity_details --rows 100 1000 5000
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import random
+import time
+from contextlib import AsyncExitStack
+
+from src.database.database import db
+from src.database.ephemeral import offline_database
+from src.services.activity_details import add_detail_minutes
+
+_BASE_ID = 300_000_000_000_000_000
+_PER_ROW_SQL = """
+    INSERT INTO user_activity_details (user_id, activity_type, activity_name, duration_minutes, last_seen)
+    VALUES ($1, $2, $3, $4, NOW())
+    ON CONFLICT (user_id, activity_type, activity_name)
+    DO UPDATE SET
+        duration_minutes = user_activity_details.duration_minutes + $4,
+        last_seen = NOW()
+"""
+_TYPES = ('game', 'listening', 'coding', 'streaming_game', 'radio')
+
+
+def build_batch(rows: int, offset: int, seed: int = 7) -> dict[tuple[int, str, str], int]:
+    rng = random.Random(seed + offset)
+    batch: dict[tuple[int, str, str], int] = {}
+    user = 0
+    while len(batch) < rows:
+        user_id = _BASE_ID + offset + user // 3
+        batch[(user_id, rng.choice(_TYPES), f'Activity {rng.randrange(200)}')] = rng.randint(1, 30)
+        user += 1
+    return batch
+
+
+async def _per_row(batch: dict[tuple[int, str, str], int]) -> int:
+    for (user_id, activity_type, name), minutes in batch.items():
+        await db.execute(_PER_ROW_SQL, str(user_id), activity_type, name, minutes)
+    return len(batch)
+
+
+async def _executemany(batch: dict[tuple[int, str, str], int]) -> int:
+    rows = [(str(user_id), activity_type, name, minutes) for (user_id, activity_type, name), minutes in batch.items()]
+    await db.execute_many(_PER_ROW_SQL, rows)
+    return len(rows)
+
+
+async def _unnest(batch: dict[tuple[int, str, str], int]) -> int:
+    await add_detail_minutes(batch)
+    return 1
+
+
+async def run(sizes: list[int]) -> None:
+    modes = (('per-row', _per_row), ('executemany', _executemany), ('unnest', _unnest))
+    for size in sizes:
+        for index, (name, write) in enumerate(modes):
+            # Each mode gets its own key range, so its first pass inserts
+            batch = build_batch(size, offset=index * 10 * size)
+            timings = []
+            for _ in range(2):  # insert pass, then update pass
+                started = time.perf_counter()
+                statements = await write(batch)
+                timings.append((time.perf_counter() - started) * 1000)
+            print(
+                f'{size:>6,} rows  {name:<12} {statements:>6,} statements/flush | '
+                f'insert {timings[0]:>8,.1f}ms  update {timings[1]:>8,.1f}ms'
+            )
+        print()
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--dsn', help='migrated PostgreSQL DSN (default: a throwaway local cluster)')
+    parser.add_argument('--rows', type=int, nargs='+', default=[100, 1_000, 5_000])
+    args = parser.parse_args()
+
+    async with AsyncExitStack() as stack:
+        if args.dsn:
+            await db.connect(args.dsn)
+            stack.push_async_callback(db.close)
+        else:
+            await stack.enter_async_context(offline_database())
+        try:
+            await run(args.rows)
+        finally:
+            await db.execute(
+                'DELETE FROM user_activity_details WHERE user_id >= $1 AND length(user_id) = $2',
+                str(_BASE_ID),
+                len(str(_BASE_ID)),
+            )
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,155 @@
+"""
+Benchmark: heap held by open activity sessions, tuple-keyed dicts vs the compact store.
+
+Builds ``--members`` synthetic members (about half playing one of ``--games``
+titles, a third listening to one of ``--songs`` songs, some streaming or
+coding). As with gateway payloads, every member carries freshly allocated
+title strings. Each member is then tracked two ways:
+
+- ``dicts``: the layout ``RPGManager`` and the first presence pipeline used.
+  ``user_id -> activity_type -> set(names)``, ``(user_id, type, name) -> start``
+  and one ``user_id -> start`` dict per category. The keys hold on to every
+  member's own copy of every title.
+- ``compact``: ``PresencePipeline``, one ``__slots__`` record per member with
+  open sessions, holding interned activity ids.
+
+Memory is measured with ``tracemalloc`` once the member objects are gone, so
+it counts only what the tracking structures keep alive. It is measured again
+after every member goes idle (all activities end); what remains then is
+mostly dict tables, which CPython does not shrink, plus the id list both runs
+keep.
+
+Usage (from the repository root)::
+
+    python -m benchmarks.presence_memory
+    python -m benchmarks.presence_memory --members 50000 --games 800 --songs 10000
+"""
+
+from __future__ import annotations
+
+import argparse
+import gc
+import random
+import tracemalloc
+from types import SimpleNamespace
+from typing import cast
+
+import nextcord
+
+from src.services.presence_pipeline import CATEGORIES, EMPTY_PRESENCE, PresencePipeline, snapshot_member
+
+_BASE_ID = 400_000_000_000_000_000
+
+
+def build_members(count: int, games: int, songs: int, seed: int = 11) -> list[SimpleNamespace]:
+    """Members whose activity names are fresh strings, like payloads parsed per member."""
+    rng = random.Random(seed)
+    members = []
+    for index in range(count):
+        activities = []
+        if rng.random() < 0.5:
+            title = 'Visual Studio Code' if rng.random() < 0.05 else 'Game'
+            activities.append(
+                SimpleNamespace(
+                    type=nextcord.ActivityType.playing, name=''.join((title, ' ', str(rng.randrange(games))))
+                )
+            )
+        if rng.random() < 0.35:
+            song = rng.randrange(songs)
+            activities.append(
+                SimpleNamespace(
+                    type=nextcord.ActivityType.listening,
+                    name=''.join(('Spot', 'ify')),
+                    details=''.join(('Song title number ', str(song))),
+                    state=''.join(('Artist ', str(song % 900))),
+                )
+            )
+        if rng.random() < 0.03:
+            activities.append(SimpleNamespace(type=nextcord.ActivityType.streaming, name=''.join(('Li', 've'))))
+        members.append(SimpleNamespace(id=_BASE_ID + index, activities=activities))
+    return members
+
+
+class DictTracker:
+    """The previous layout: tuple keys and per-member strings."""
+
+    def __init__(self) -> None:
+        self.user_active_activities: dict[int, dict[str, set[str]]] = {}
+        self.detailed_activity_start: dict[tuple[int, str, str], float] = {}
+        self.category_started: dict[str, dict[int, float]] = {category: {} for category in CATEGORIES}
+
+    def track(self, member: SimpleNamespace, now: float) -> None:
+        snapshot = snapshot_member(cast(nextcord.Member, member))
+        for category in snapshot.categories:
+            self.category_started[category][member.id] = now
+        if snapshot.details:
+            per_type = self.user_active_activities.setdefault(member.id, {})
+            for activity_type, name in snapshot.details:
+                per_type.setdefault(activity_type, set()).add(name)
+                self.detailed_activity_start[(member.id, activity_type, name)] = now
+
+    def idle(self, member_id: int) -> None:
+        for activity_type, names in self.user_active_activities.pop(member_id, {}).items():
+            for name in names:
+                self.detailed_activity_start.pop((member_id, activity_type, name), None)
+        for started in self.category_started.values():
+            started.pop(member_id, None)
+
+
+class CompactTracker:
+    def __init__(self) -> None:
+        self.pipeline = PresencePipeline(window=0)
+
+    def track(self, member: SimpleNamespace, now: float) -> None:
+        self.pipeline.submit(member.id, snapshot_member(cast(nextcord.Member, member)), now)
+        self.pipeline.drain()
+
+    def idle(self, member_id: int) -> None:
+        self.pipeline.submit(member_id, EMPTY_PRESENCE, 1.0)
+        self.pipeline.drain()
+
+
+def measure(name: str, tracker_class, members_args: tuple[int, int, int]) -> None:
+    gc.collect()
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+
+    tracker = tracker_class()
+    members = build_members(*members_args)
+    for member in members:
+        tracker.track(member, 0.0)
+    member_ids = [member.id for member in members]
+    del members
+    gc.collect()
+    held = tracemalloc.get_traced_memory()[0] - baseline
+
+    for member_id in member_ids:
+        tracker.idle(member_id)
+    gc.collect()
+    idle = tracemalloc.get_traced_memory()[0] - baseline
+    tracemalloc.stop()
+
+    extra = ''
+    if isinstance(tracker, CompactTracker):
+        stats = tracker.pipeline.snapshot()
+        extra = f' | {stats["active_users"]:,} records, {stats["interned_names"]:,} interned names left'
+    print(
+        f'{name:<8} {held / 1024 / 1024:>7.2f} MiB held ({held / len(member_ids):,.0f} B/member) | '
+        f'{idle / 1024:>8,.1f} KiB after all go idle{extra}'
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--members', type=int, default=50_000)
+    parser.add_argument('--games', type=int, default=500)
+    parser.add_argument('--songs', type=int, default=5_000)
+    args = parser.parse_args()
+
+    members_args = (args.members, args.games, args.songs)
+    measure('dicts', DictTracker, members_args)
+    measure('compact', CompactTracker, members_args)
+
+
+if __name__ == '__main__':
+    main()
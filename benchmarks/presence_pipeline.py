@@ -0,0 +1,189 @@
+"""
+Benchmark: presence-update ingestion, per-event diffing vs the coalesced pipeline.
+
+Gives ``--users`` synthetic members an initial presence (a game, a Spotify
+song, some streaming) and then, ``--session-minutes`` later, replays a burst
+of ``--events`` presence updates within ``--burst-seconds``. About 40% of the
+updates are status-only (same activities); the rest start, stop or switch
+an activity. The same replay runs twice through ``PresencePipeline``:
+
+- ``per-event``: drained after every update. This matches the old
+  ``on_member_update`` behaviour, where every ended session was one awaited
+  statement on the dispatch path.
+- ``coalesced``: drained once per ``--window`` seconds of replay time.
+
+It reports ingest throughput, queue depth, drain cost, diffs, and the rows
+left for the batched writer. Timestamps are simulated, so the replay runs as
+fast as the CPU allows.
+
+Usage (from the repository root)::
+
+    python -m benchmarks.presence_pipeline
+    python -m benchmarks.presence_pipeline --events 10000 --users 2000 --window 2
+    python -m benchmarks.presence_pipeline --offline-db   # also time the flush (needs local PostgreSQL binaries)
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import random
+import time
+from types import SimpleNamespace
+
+import nextcord
+
+from src.services.presence_pipeline import PresencePipeline, snapshot_member
+
+_GAMES = [f'Game {i}' for i in range(40)] + ['Visual Studio Code', 'PyCharm']
+_SONGS = [(f'Song {i}', f'Artist {i % 60}') for i in range(300)]
+_BASE_ID = 200_000_000_000_000_000
+
+
+def _member(user_id: int, game: str | None, song: tuple[str, str] | None, streaming: bool) -> SimpleNamespace:
+    activities = []
+    if game:
+        activities.append(SimpleNamespace(type=nextcord.ActivityType.playing, name=game))
+    if song:
+        activities.append(
+            SimpleNamespace(type=nextcord.ActivityType.listening, name='Spotify', details=song[0], state=song[1])
+        )
+    if streaming:
+        activities.append(SimpleNamespace(type=nextcord.ActivityType.streaming, name='Live'))
+    return SimpleNamespace(id=user_id, activities=activities)
+
+
+def build_replay(users: int, events: int, session_minutes: float, burst_seconds: float, seed: int = 42):
+    """Initial presences at t=0, then a burst of updates starting ``session_minutes`` later."""
+    rng = random.Random(seed)
+    state: dict[int, list] = {}
+    initial = []
+    for index in range(users):
+        user_id = _BASE_ID + index
+        state[user_id] = [
+            rng.choice(_GAMES) if rng.random() < 0.5 else None,
+            rng.choice(_SONGS) if rng.random() < 0.4 else None,
+            rng.random() < 0.05,
+        ]
+        initial.append((0.0, _member(user_id, *state[user_id])))
+
+    # Long-tailed activity: a few members produce most of the updates
+    population = list(state)
+    weights = [rng.paretovariate(1.5) for _ in population]
+    burst_start = session_minutes * 60
+    times = sorted(burst_start + rng.random() * burst_seconds for _ in range(events))
+    replay = []
+    for observed_at, user_id in zip(times, rng.choices(population, weights, k=events), strict=True):
+        current = state[user_id]
+        roll = rng.random()
+        if roll < 0.4:
+            pass  # status-only update: same activities
+        elif roll < 0.65:
+            current[0] = None if current[0] else rng.choice(_GAMES)
+        elif roll < 0.95:
+            current[1] = rng.choice(_SONGS) if rng.random() < 0.8 else None
+        else:
+            current[2] = not current[2]
+        replay.append((observed_at, _member(user_id, *current)))
+    return initial, replay
+
+
+def run(initial, replay, window: float) -> tuple[PresencePipeline, dict[str, float]]:
+    pipeline = PresencePipeline(window=window)
+    for observed_at, member in initial:
+        pipeline.submit(member.id, snapshot_member(member), observed_at)
+    pipeline.drain()
+    for key in ('events', 'coalesced', 'drains', 'diffs', 'sessions_closed', 'sessions_banked', 'max_queue_depth'):
+        pipeline.stats[key] = 0
+
+    drain_ms: list[float] = []
+    depths: list[int] = []
+    ingest_s = 0.0
+    next_drain = replay[0][0] + window
+    for observed_at, member in replay:
+        if window > 0 and observed_at >= next_drain:
+            depths.append(pipeline.queue_depth)
+            started = time.perf_counter()
+            pipeline.drain()
+            drain_ms.append((time.perf_counter() - started) * 1000)
+            next_drain = observed_at + window
+        started = time.perf_counter()
+        pipeline.submit(member.id, snapshot_member(member), observed_at)
+        ingest_s += time.perf_counter() - started
+        if window <= 0:
+            depths.append(pipeline.queue_depth)
+            started = time.perf_counter()
+            pipeline.drain()
+            drain_ms.append((time.perf_counter() - started) * 1000)
+    depths.append(pipeline.queue_depth)
+    started = time.perf_counter()
+    pipeline.drain()
+    drain_ms.append((time.perf_counter() - started) * 1000)
+
+    drain_ms.sort()
+    return pipeline, {
+        'ingest_rate': len(replay) / ingest_s if ingest_s else 0.0,
+        'drains': len(drain_ms),
+        'drain_total_ms': sum(drain_ms),
+        'drain_p95_ms': drain_ms[int(len(drain_ms) * 0.95) - 1] if len(drain_ms) > 1 else drain_ms[0],
+        'max_depth': max(depths),
+        'avg_depth': sum(depths) / len(depths),
+    }
+
+
+def report(name: str, pipeline: PresencePipeline, metrics: dict[str, float]) -> None:
+    stats = pipeline.stats
+    print(
+        f'{name:<10} ingest {metrics["ingest_rate"]:>9,.0f} events/s | '
+        f'queue depth max {metrics["max_depth"]:,} avg {metrics["avg_depth"]:,.1f} | '
+        f'{metrics["drains"]:,} drains, {metrics["drain_total_ms"]:,.1f}ms total, p95 {metrics["drain_p95_ms"]:.3f}ms'
+    )
+    print(
+        f'{"":<10} {stats["events"]:,.0f} events -> {stats["diffs"]:,.0f} diffs '
+        f'({stats["coalesced"]:,.0f} coalesced) -> {stats["sessions_banked"]:,.0f} ended sessions '
+        f'-> {pipeline.buffered:,} rows for the batched writer'
+    )
+
+
+async def flush_offline(pipeline: PresencePipeline, users: int) -> None:
+    from src.database.database import db
+    from src.database.ephemeral import offline_database
+
+    async with offline_database():
+        await db.execute(
+            'INSERT INTO users (discord_id) SELECT unnest($1::VARCHAR[])',
+            [str(_BASE_ID + index) for index in range(users)],
+        )
+        rows = pipeline.buffered
+        started = time.perf_counter()
+        written = await pipeline.flush()
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        print(f'flush      {written:,} of {rows:,} rows in {elapsed_ms:,.1f}ms (2 statements)')
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--events', type=int, default=10_000)
+    parser.add_argument('--users', type=int, default=2_000)
+    parser.add_argument('--window', type=float, default=2.0, help='coalescing window (seconds of replay time)')
+    parser.add_argument('--burst-seconds', type=float, default=10.0)
+    parser.add_argument('--session-minutes', type=float, default=30.0)
+    parser.add_argument('--offline-db', action='store_true', help='flush the coalesced buffer into a throwaway DB')
+    args = parser.parse_args()
+
+    initial, replay = build_replay(args.users, args.events, args.session_minutes, args.burst_seconds)
+    baseline, baseline_metrics = run(initial, replay, window=0)
+    report('per-event', baseline, baseline_metrics)
+    coalesced, coalesced_metrics = run(initial, replay, window=args.window)
+    report('coalesced', coalesced, coalesced_metrics)
+    print(
+        f'inline statements avoided on the dispatch path: {baseline.stats["sessions_banked"]:,.0f} '
+        f'(now 2 batched statements per flush)'
+    )
+
+    if args.offline_db:
+        asyncio.run(flush_offline(coalesced, args.users))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,164 @@
+-- 014: Monthly range partitioning for user_activity_log, plus incrementally maintained
+-- rollups so period leaderboards and /most stats no longer aggregate raw history.
+
+-- ------------------------------------------------------------
+-- Daily rollup of user_activity_log (period leaderboards)
+-- ------------------------------------------------------------
+
+CREATE TABLE IF NOT EXISTS user_activity_daily (
+    user_id         VARCHAR(20) NOT NULL,
+    activity_type   VARCHAR(20) NOT NULL,
+    day             DATE NOT NULL,
+    points_sum      BIGINT NOT NULL DEFAULT 0,
+    event_count     INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (user_id, activity_type, day)
+);
+
+CREATE INDEX IF NOT EXISTS idx_activity_daily_type_day ON user_activity_daily(activity_type, day);
+
+-- Statement-level trigger: one set-based upsert per INSERT/COPY batch
+CREATE OR REPLACE FUNCTION rollup_user_activity_log()
+RETURNS TRIGGER AS $$
+BEGIN
+    INSERT INTO user_activity_daily (user_id, activity_type, day, points_sum, event_count)
+    SELECT user_id, activity_type, created_at::DATE, SUM(COALESCE(points_awarded, 0)), COUNT(*)
+    FROM new_rows
+    GROUP BY user_id, activity_type, created_at::DATE
+    ON CONFLICT (user_id, activity_type, day) DO UPDATE SET
+        points_sum = user_activity_daily.points_sum + EXCLUDED.points_sum,
+        event_count = user_activity_daily.event_count + EXCLUDED.event_count;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- ------------------------------------------------------------
+-- Partitioned user_activity_log
+-- ------------------------------------------------------------
+
+ALTER TABLE user_activity_log RENAME TO user_activity_log_legacy;
+ALTER INDEX IF EXISTS user_activity_log_pkey RENAME TO user_activity_log_legacy_pkey;
+ALTER SEQUENCE IF EXISTS user_activity_log_id_seq RENAME TO user_activity_log_legacy_id_seq;
+ALTER INDEX IF EXISTS idx_activity_log_user RENAME TO idx_activity_log_legacy_user;
+ALTER INDEX IF EXISTS idx_activity_log_created RENAME TO idx_activity_log_legacy_created;
+
+CREATE TABLE user_activity_log (
+    id              BIGSERIAL,
+    user_id         VARCHAR(20) NOT NULL,
+    activity_type   VARCHAR(20) NOT NULL,
+    points_awarded  INTEGER DEFAULT 0,
+    channel_id      BIGINT,
+    guild_id        BIGINT,
+    created_at      TIMESTAMP NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (id, created_at)
+) PARTITION BY RANGE (created_at);
+
+CREATE INDEX IF NOT EXISTS idx_activity_log_user_created ON user_activity_log(user_id, created_at);
+CREATE INDEX IF NOT EXISTS idx_activity_log_type_created ON user_activity_log(activity_type, created_at);
+
+-- Catch-all for rows outside the monthly partitions. The bot creates partitions
+-- ahead of time (see src/services/activity_log_maintenance.py) so this stays empty.
+CREATE TABLE IF NOT EXISTS user_activity_log_default PARTITION OF user_activity_log DEFAULT;
+
+-- Monthly partitions covering existing history through two months ahead
+DO $$
+DECLARE
+    month_start DATE := date_trunc('month', COALESCE((SELECT MIN(created_at) FROM user_activity_log_legacy), NOW()))::DATE;
+    last_month  DATE := (date_trunc('month', NOW()) + INTERVAL '2 months')::DATE;
+BEGIN
+    WHILE month_start <= last_month LOOP
+        EXECUTE format(
+            'CREATE TABLE IF NOT EXISTS %I PARTITION OF user_activity_log FOR VALUES FROM (%L) TO (%L)',
+            'user_activity_log_' || to_char(month_start, 'YYYY_MM'),
+            month_start,
+            (month_start + INTERVAL '1 month')::DATE
+        );
+        month_start := (month_start + INTERVAL '1 month')::DATE;
+    END LOOP;
+END $$;
+
+CREATE TRIGGER trg_user_activity_log_rollup
+    AFTER INSERT ON user_activity_log
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION rollup_user_activity_log();
+
+-- Move existing history across; the rollup trigger backfills user_activity_daily
+INSERT INTO user_activity_log (user_id, activity_type, points_awarded, channel_id, guild_id, created_at)
+SELECT user_id, activity_type, points_awarded, channel_id, guild_id, COALESCE(created_at, NOW())
+FROM user_activity_log_legacy;
+
+DROP TABLE user_activity_log_legacy;
+
+-- ------------------------------------------------------------
+-- Rollups of user_activity_details (/most stats)
+-- ------------------------------------------------------------
+
+-- Per activity name across all users (most played games, top songs, top coding apps)
+CREATE TABLE IF NOT EXISTS activity_name_totals (
+    activity_type   VARCHAR(20) NOT NULL,
+    activity_name   TEXT NOT NULL,
+    total_minutes   BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (activity_type, activity_name)
+);
+
+CREATE INDEX IF NOT EXISTS idx_activity_name_totals_rank ON activity_name_totals(activity_type, total_minutes DESC);
+
+-- Per user and activity type (top coders, top radio listeners)
+CREATE TABLE IF NOT EXISTS user_activity_type_totals (
+    user_id         VARCHAR(20) NOT NULL,
+    activity_type   VARCHAR(20) NOT NULL,
+    total_minutes   BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (user_id, activity_type)
+);
+
+CREATE INDEX IF NOT EXISTS idx_user_activity_type_totals_rank ON user_activity_type_totals(activity_type, total_minutes DESC);
+
+INSERT INTO activity_name_totals (activity_type, activity_name, total_minutes)
+SELECT activity_type, activity_name, SUM(COALESCE(duration_minutes, 0))
+FROM user_activity_details
+GROUP BY activity_type, activity_name;
+
+INSERT INTO user_activity_type_totals (user_id, activity_type, total_minutes)
+SELECT user_id, activity_type, SUM(COALESCE(duration_minutes, 0))
+FROM user_activity_details
+GROUP BY user_id, activity_type;
+
+CREATE OR REPLACE FUNCTION rollup_user_activity_details()
+RETURNS TRIGGER AS $$
+DECLARE
+    delta   BIGINT;
+    rec     RECORD;
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        delta := COALESCE(NEW.duration_minutes, 0);
+        rec := NEW;
+    ELSIF TG_OP = 'UPDATE' THEN
+        delta := COALESCE(NEW.duration_minutes, 0) - COALESCE(OLD.duration_minutes, 0);
+        rec := NEW;
+    ELSE
+        delta := -COALESCE(OLD.duration_minutes, 0);
+        rec := OLD;
+    END IF;
+
+    IF delta = 0 THEN
+        RETURN NULL;
+    END IF;
+
+    INSERT INTO activity_name_totals (activity_type, activity_name, total_minutes)
+    VALUES (rec.activity_type, rec.activity_name, delta)
+    ON CONFLICT (activity_type, activity_name)
+    DO UPDATE SET total_minutes = activity_name_totals.total_minutes + EXCLUDED.total_minutes;
+
+    INSERT INTO user_activity_type_totals (user_id, activity_type, total_minutes)
+    VALUES (rec.user_id, rec.activity_type, delta)
+    ON CONFLICT (user_id, activity_type)
+    DO UPDATE SET total_minutes = user_activity_type_totals.total_minutes + EXCLUDED.total_minutes;
+
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trg_user_activity_details_rollup
+    AFTER INSERT OR UPDATE OF duration_minutes OR DELETE ON user_activity_details
+    FOR EACH ROW
+    EXECUTE FUNCTION rollup_user_activity_details();
@@ -0,0 +1,9 @@
+-- 015: Per-feed HTTP validators so RSS refreshes can use conditional GETs
+-- (If-None-Match / If-Modified-Since) and skip parsing unchanged feeds.
+
+CREATE TABLE IF NOT EXISTS rss_feed_state (
+    feed_url        VARCHAR(500) PRIMARY KEY,
+    etag            TEXT,
+    last_modified   TEXT,
+    updated_at      TIMESTAMP DEFAULT NOW()
+);
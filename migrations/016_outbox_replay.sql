@@ -0,0 +1,8 @@
+-- 016: Replay high-water mark for the local write outbox (src/database/outbox.py).
+-- Advanced in the same transaction as each replayed batch, so no entry is applied twice.
+
+CREATE TABLE IF NOT EXISTS outbox_replay (
+    outbox_id       TEXT PRIMARY KEY,
+    last_seq        BIGINT NOT NULL,
+    updated_at      TIMESTAMP DEFAULT NOW()
+);
@@ -0,0 +1,4 @@
+-- 017: Checkpoint time for persisted in-flight activity sessions
+
+-- When the bot last wrote the session; restarts only resume sessions checkpointed recently
+ALTER TABLE user_active_activities ADD COLUMN IF NOT EXISTS checkpointed_at TIMESTAMP DEFAULT NOW();
@@ -0,0 +1,70 @@
+-- 018: Roll user_activity_details up per statement instead of per row.
+-- The presence flush writes a whole batch in one unnest upsert; the per-row trigger
+-- from 014 still ran two upserts per detail row, all on the same hot totals rows.
+
+DROP TRIGGER IF EXISTS trg_user_activity_details_rollup ON user_activity_details;
+
+-- Apply signed per-row minute changes to both totals, aggregated once per key
+CREATE OR REPLACE FUNCTION add_activity_detail_totals(
+    user_ids VARCHAR[], activity_types VARCHAR[], activity_names TEXT[], deltas BIGINT[]
+)
+RETURNS VOID AS $$
+    INSERT INTO activity_name_totals (activity_type, activity_name, total_minutes)
+    SELECT activity_type, activity_name, SUM(delta)
+    FROM unnest(activity_types, activity_names, deltas) AS d(activity_type, activity_name, delta)
+    GROUP BY activity_type, activity_name
+    HAVING SUM(delta) <> 0
+    ORDER BY activity_type, activity_name
+    ON CONFLICT (activity_type, activity_name)
+    DO UPDATE SET total_minutes = activity_name_totals.total_minutes + EXCLUDED.total_minutes;
+
+    INSERT INTO user_activity_type_totals (user_id, activity_type, total_minutes)
+    SELECT user_id, activity_type, SUM(delta)
+    FROM unnest(user_ids, activity_types, deltas) AS d(user_id, activity_type, delta)
+    GROUP BY user_id, activity_type
+    HAVING SUM(delta) <> 0
+    ORDER BY user_id, activity_type
+    ON CONFLICT (user_id, activity_type)
+    DO UPDATE SET total_minutes = user_activity_type_totals.total_minutes + EXCLUDED.total_minutes;
+$$ LANGUAGE sql;
+
+-- Statement-level trigger: one set-based upsert per totals table per INSERT/UPDATE/DELETE.
+-- Only the transition tables of the firing event exist, so each branch reads its own.
+CREATE OR REPLACE FUNCTION rollup_user_activity_details()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        PERFORM add_activity_detail_totals(
+            array_agg(user_id), array_agg(activity_type), array_agg(activity_name),
+            array_agg(COALESCE(duration_minutes, 0)::BIGINT)
+        )
+        FROM new_rows;
+    ELSIF TG_OP = 'UPDATE' THEN
+        -- Updates that leave duration_minutes alone (last_seen) net to zero and are skipped
+        PERFORM add_activity_detail_totals(
+            array_agg(user_id), array_agg(activity_type), array_agg(activity_name), array_agg(delta)
+        )
+        FROM (
+            SELECT user_id, activity_type, activity_name, COALESCE(duration_minutes, 0)::BIGINT AS delta
+            FROM new_rows
+            UNION ALL
+            SELECT user_id, activity_type, activity_name, -COALESCE(duration_minutes, 0)::BIGINT
+            FROM old_rows
+        ) AS changes;
+    ELSE
+        PERFORM add_activity_detail_totals(
+            array_agg(user_id), array_agg(activity_type), array_agg(activity_name),
+            array_agg(-COALESCE(duration_minutes, 0)::BIGINT)
+        )
+        FROM old_rows;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Transition tables rule out an UPDATE OF column list, hence the zero-delta filter above
+CREATE TRIGGER trg_user_activity_details_rollup
+    AFTER INSERT OR UPDATE OR DELETE ON user_activity_details
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION rollup_user_activity_details();
@@ -4,8 +4,14 @@ from datetime import UTC, datetime
 import nextcord
 from nextcord.ext import commands
 
-from src.config.config import CODING_APPS, ENVIRONMENT
+from src.config.config import CODING_APPS, DB_STATEMENT_CACHE_SIZE, ENVIRONMENT
 from src.core.runtime_state import runtime_state
+from src.database.circuit_breaker import CLOSED
+from src.database.database import db
+from src.database.instrumentation import query_stats
+from src.database.statements import statements
+from src.services.presence_pipeline import presence_pipeline
+from src.services.session_store import session_store
 from src.utils.embeds import error_embed, info_embed, success_embed
 from src.utils.safety import safe_command, safe_send, safe_slash_command, staff_only
 from src.utils.security.rbac import require_founder, require_staff
@@ -67,6 +73,8 @@ class Health(commands.Cog):
     async def send_health_status(self, target):
         status = 'Degraded' if self._is_degraded() else 'Healthy'
         db_status = 'Available' if runtime_state.db_available else 'Unavailable'
+        if db.breaker.state != CLOSED:
+            db_status += f' (circuit {db.breaker.state.replace("_", "-")})'
         uptime = datetime.now(UTC) - runtime_state.startup_time
 
         user = target.author if hasattr(target, 'author') else target.user if hasattr(target, 'user') else None
@@ -97,6 +105,17 @@ class Health(commands.Cog):
         # Error history
         last_error = runtime_state.last_db_error or 'None recorded'
         embed.add_field(name='Last DB Error', value=last_error, inline=False)
+        outbox = db.outbox.snapshot()
+        if outbox['pending'] or outbox['spilled']:
+            embed.add_field(
+                name='Write Outbox',
+                value=(
+                    f'{outbox["pending"]} pending ({outbox["bytes"] / 1024:.0f} KiB) | '
+                    f'{outbox["replayed"]} replayed ({outbox["last_replay_rate"]:.0f}/s) | '
+                    f'{outbox["dropped"]} dropped'
+                ),
+                inline=False,
+            )
 
         if runtime_state.last_recovery_time:
             recov = runtime_state.last_recovery_time.strftime('%Y-%m-%d %H:%M:%S UTC')
@@ -150,6 +169,14 @@ class Health(commands.Cog):
         embed.add_field(name='CPU Load', value=f'{stats["cpu_percent"]}%', inline=True)
         embed.add_field(name='CPU Cores', value=str(stats['cpu_count']), inline=True)
         embed.add_field(name='Memory', value=f'{stats["mem_used_mb"]}MB ({stats["mem_percent"]}%)', inline=True)
+        embed.add_field(
+            name='Loop Lag',
+            value=(
+                f'{runtime_state.loop_lag_ms:.0f}ms now | {runtime_state.loop_lag_avg_ms:.0f}ms avg | '
+                f'{runtime_state.loop_lag_max_ms:.0f}ms max'
+            ),
+            inline=False,
+        )
 
         embed.add_field(name='Uptime', value=str(uptime).split('.')[0], inline=False)
         embed.add_field(name='Loaded Cogs', value=str(len(runtime_state.loaded_cogs)), inline=True)
@@ -184,6 +211,62 @@ class Health(commands.Cog):
 
         await safe_send(interaction, embed=embed, ephemeral=True)
 
+    @admin.subcommand(name='dbstats', description='Show query, lane, and write pipeline internals')
+    @staff_only()
+    @safe_slash_command()
+    async def dbstats(self, interaction: nextcord.Interaction):
+        embed = await info_embed(
+            title='Database Internals',
+            description='Query fingerprints, pool lanes, and write pipeline counters.',
+            contributor_source=__name__,
+            user=interaction.user,
+        )
+
+        top_queries = query_stats.top(3)
+        if top_queries:
+            lines = [
+                f'`{item["fingerprint"][:60]}` — {item["calls"]} calls, {item["total_ms"]:,.0f}ms total, '
+                f'p95 {item["p95_ms"]:.0f}ms, acquire {item["acquire_ms"] / item["calls"]:.1f}ms avg '
+                f'({item["top_source"]})'
+                for item in top_queries
+            ]
+            lines.append(f'Slow queries (>= {query_stats.slow_query_ms:.0f}ms): {query_stats.slow_queries}')
+            embed.add_field(name='Top Queries', value='\n'.join(lines)[:1024], inline=False)
+
+        lane_lines = [
+            f'{lane["lane"]}: {lane["in_use"]}/{lane["limit"]} in use, {lane["waiting"]} waiting, '
+            f'{lane["utilization"]:.0%} utilized, {lane["avg_wait_ms"]:.1f}ms avg wait'
+            for lane in db.get_lane_stats()
+        ]
+        embed.add_field(name='DB Lanes', value='\n'.join(lane_lines), inline=False)
+
+        presence = presence_pipeline.snapshot()
+        sessions = session_store.stats
+        embed.add_field(
+            name='Presence Pipeline',
+            value=(
+                f'{presence["events"]:,.0f} events, {presence["coalesced"]:,.0f} coalesced, '
+                f'{presence["diffs"]:,.0f} diffs | '
+                f'queue {presence["queue_depth"]} (max {presence["max_queue_depth"]:,.0f}) | '
+                f'{presence["buffered"]:,} rows buffered, {presence["rows_written"]:,.0f} written | '
+                f'{sessions["rows_saved"]:,.0f} sessions checkpointed ({sessions["last_save_ms"]}ms)'
+            ),
+            inline=False,
+        )
+
+        prepared = statements.snapshot()
+        embed.add_field(
+            name='Prepared Statements',
+            value=(
+                f'{prepared["registered"]} registered | {prepared["hits"]:,} hits, {prepared["misses"]:,} misses '
+                f'({prepared["hit_rate"]:.1%} hit rate) | {prepared["reprepared"]} re-prepared | '
+                f'ad-hoc cache {DB_STATEMENT_CACHE_SIZE}/connection'
+            ),
+            inline=False,
+        )
+
+        await safe_send(interaction, embed=embed, ephemeral=True)
+
     @admin.subcommand(name='startupchecks', description='Show results of initial boot checks')
     @staff_only()
     @safe_slash_command()
@@ -145,6 +145,7 @@ class Help(commands.Cog):
             staff_cmds = (
                 '`/featurestatus` - Feature status\n'
                 '`/startupchecks` - Boot checks\n'
+                '`/dbstats` - Query, lane, and write pipeline stats\n'
                 '`/reloadcog <name>` - Reload a cog\n'
                 '`/panic` / `/lockdown` - Server lockdown'
             )
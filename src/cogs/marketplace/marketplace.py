@@ -6,6 +6,7 @@ from nextcord.ext import commands
 
 from src.config.config import MARKETPLACE_CHANNEL_ID
 from src.database.database import db
+from src.database.identity_map import user_ids
 from src.utils.embeds import error_embed, info_embed, success_embed
 from src.utils.safety import admin_only, safe_command, safe_send, safe_slash_command
 from src.utils.security import rate_limit
@@ -74,31 +75,48 @@ class Marketplace(commands.Cog):
             return
 
         image_url = image.url if image else ''
+        listing_id = f'MP{int(datetime.datetime.utcnow().timestamp())}'
 
-        # Fetch category ID based on the provided name
-        category_record = await db.fetch_one('SELECT id FROM marketplace_categories WHERE name = $1', category)
-        if not category_record:
-            # Fallback: insert with SERIAL auto-generated id, then re-fetch
-            await db.execute(
-                "INSERT INTO marketplace_categories (name, emoji, is_active) VALUES ($1, '📦', TRUE) ON CONFLICT DO NOTHING",
-                category,
-            )
-            category_record = await db.fetch_one('SELECT id FROM marketplace_categories WHERE name = $1', category)
+        # One connection and one transaction for the whole lookup/insert flow
+        seller_id = None
+        async with db.transaction() as tx:
+            # Fetch category ID based on the provided name
+            category_record = await tx.fetch_one('SELECT id FROM marketplace_categories WHERE name = $1', category)
             if not category_record:
-                embed = await error_embed(
-                    'Category Error', 'Could not find or create the category.', contributor_source=__name__
+                # Fallback: insert with SERIAL auto-generated id, then re-fetch
+                await tx.execute(
+                    "INSERT INTO marketplace_categories (name, emoji, is_active) VALUES ($1, '📦', TRUE) ON CONFLICT DO NOTHING",
+                    category,
+                )
+                category_record = await tx.fetch_one('SELECT id FROM marketplace_categories WHERE name = $1', category)
+
+            if category_record:
+                # Ensure user exists in db
+                seller_id = await user_ids.resolve(str(interaction.user.id), conn=tx)
+
+            if category_record and seller_id is not None:
+                await tx.execute(
+                    """INSERT INTO marketplace_listings
+                       (id, seller_id, title, description, price, category_id, condition, status, image_url)
+                       VALUES ($1, $2, $3, $4, $5, $6, $7, 'active', $8)""",
+                    listing_id,
+                    seller_id,
+                    title,
+                    description,
+                    price,
+                    category_record['id'],
+                    condition,
+                    image_url or None,
                 )
-                await safe_send(interaction, embed=embed, ephemeral=True)
-                return
-
-        category_id = category_record['id']
 
-        listing_id = f'MP{int(datetime.datetime.utcnow().timestamp())}'
+        if not category_record:
+            embed = await error_embed(
+                'Category Error', 'Could not find or create the category.', contributor_source=__name__
+            )
+            await safe_send(interaction, embed=embed, ephemeral=True)
+            return
 
-        # Ensure user exists in db
-        await db.execute('INSERT INTO users (discord_id) VALUES ($1) ON CONFLICT DO NOTHING', str(interaction.user.id))
-        user = await db.fetch_one('SELECT id FROM users WHERE discord_id = $1', str(interaction.user.id))
-        if user is None:
+        if seller_id is None:
             embed = await error_embed(
                 'User Error',
                 'Could not find or create your user record.',
@@ -108,20 +126,6 @@ class Marketplace(commands.Cog):
             await safe_send(interaction, embed=embed, ephemeral=True)
             return
 
-        await db.execute(
-            """INSERT INTO marketplace_listings
-               (id, seller_id, title, description, price, category_id, condition, status, image_url)
-               VALUES ($1, $2, $3, $4, $5, $6, $7, 'active', $8)""",
-            listing_id,
-            user['id'],
-            title,
-            description,
-            price,
-            category_id,
-            condition,
-            image_url or None,
-        )
-
         embed = await success_embed(
             title='Listing Created',
             description=f'Your item **{title}** has been posted for **${price:.2f}**.',
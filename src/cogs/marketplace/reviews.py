@@ -8,7 +8,8 @@ import logging
 import nextcord
 from nextcord.ext import commands
 
-from src.database.database import db, get_user
+from src.database.database import db
+from src.database.identity_map import user_ids
 from src.utils.embeds import error_embed, info_embed, success_embed
 from src.utils.safety import safe_send, safe_slash_command
 from src.utils.security import rate_limit, sanitize
@@ -30,7 +31,7 @@ class MarketplaceReviews(commands.Cog):
         comment: str = '',
     ):
         try:
-            user = await get_user(str(interaction.user.id))
+            user_id = await user_ids.resolve(str(interaction.user.id))
 
             transaction = await db.fetch_one(
                 """SELECT t.*, l.title, u_seller.discord_id as seller_discord_id,
@@ -72,7 +73,7 @@ class MarketplaceReviews(commands.Cog):
             existing = await db.fetch_one(
                 'SELECT id FROM marketplace_reviews WHERE transaction_id = $1 AND reviewer_id = $2',
                 transaction_id,
-                user['id'],
+                user_id,
             )
 
             if existing:
@@ -92,7 +93,7 @@ class MarketplaceReviews(commands.Cog):
                    (transaction_id, reviewer_id, reviewee_id, rating, comment, is_buyer_review)
                    VALUES ($1, $2, $3, $4, $5, $6)""",
                 transaction_id,
-                user['id'],
+                user_id,
                 reviewee_id,
                 rating,
                 safe_comment,
@@ -142,9 +143,11 @@ class MarketplaceReviews(commands.Cog):
     async def seller_slash(self, interaction: nextcord.Interaction, member: nextcord.Member = None):
         try:
             target = member or interaction.user
-            user = await get_user(str(target.id))
+            user_id = await user_ids.lookup(str(target.id))
 
-            stats = await db.fetch_one('SELECT * FROM marketplace_seller_stats WHERE user_id = $1', user['id'])
+            stats = None
+            if user_id is not None:
+                stats = await db.fetch_one('SELECT * FROM marketplace_seller_stats WHERE user_id = $1', user_id)
 
             if not stats or stats['total_sales'] == 0:
                 embed = await info_embed(
@@ -165,7 +168,7 @@ class MarketplaceReviews(commands.Cog):
                    WHERE r.reviewee_id = $1 AND r.is_buyer_review = TRUE
                    ORDER BY r.created_at DESC
                    LIMIT 5""",
-                user['id'],
+                user_id,
             )
 
             embed = await info_embed(
@@ -205,7 +208,7 @@ class MarketplaceReviews(commands.Cog):
                    WHERE seller_id = $1 AND status = 'active'
                    ORDER BY created_at DESC
                    LIMIT 3""",
-                user['id'],
+                user_id,
             )
 
             if active:
@@ -225,7 +228,7 @@ class MarketplaceReviews(commands.Cog):
 
     async def reviews_slash(self, interaction: nextcord.Interaction):
         try:
-            user = await get_user(str(interaction.user.id))
+            user_id = await user_ids.resolve(str(interaction.user.id))
 
             reviews = await db.fetch_many(
                 """SELECT r.*, l.title, u.discord_id as reviewer_discord_id
@@ -236,7 +239,7 @@ class MarketplaceReviews(commands.Cog):
                    WHERE r.reviewee_id = $1
                    ORDER BY r.created_at DESC
                    LIMIT 10""",
-                user['id'],
+                user_id,
             )
 
             if not reviews:
@@ -276,20 +279,21 @@ class MarketplaceReviews(commands.Cog):
 
     async def helpful_slash(self, interaction: nextcord.Interaction, review_id: int):
         try:
-            await db.execute(
-                """INSERT INTO marketplace_review_votes (review_id, user_id, is_helpful)
-                   VALUES ($1, $2, TRUE)
-                   ON CONFLICT DO NOTHING""",
-                review_id,
-                interaction.user.id,
-            )
+            async with db.transaction() as tx:
+                await tx.execute(
+                    """INSERT INTO marketplace_review_votes (review_id, user_id, is_helpful)
+                       VALUES ($1, $2, TRUE)
+                       ON CONFLICT DO NOTHING""",
+                    review_id,
+                    interaction.user.id,
+                )
 
-            await db.execute(
-                """UPDATE marketplace_reviews
-                   SET helpful_count = (SELECT COUNT(*) FROM marketplace_review_votes WHERE review_id = $1)
-                   WHERE id = $1""",
-                review_id,
-            )
+                await tx.execute(
+                    """UPDATE marketplace_reviews
+                       SET helpful_count = (SELECT COUNT(*) FROM marketplace_review_votes WHERE review_id = $1)
+                       WHERE id = $1""",
+                    review_id,
+                )
 
             embed = await success_embed(
                 title='Thanks!',
@@ -311,7 +315,7 @@ class MarketplaceReviews(commands.Cog):
     @safe_slash_command(requires_db=True)
     async def bump_slash(self, interaction: nextcord.Interaction, listing_id: str):
         try:
-            user = await get_user(str(interaction.user.id))
+            user_id = await user_ids.resolve(str(interaction.user.id))
 
             listing = await db.fetch_one(
                 "SELECT seller_id, title, bumped_at FROM marketplace_listings WHERE id = $1 AND status = 'active'",
@@ -325,7 +329,7 @@ class MarketplaceReviews(commands.Cog):
                 await safe_send(interaction, embed=embed, ephemeral=True)
                 return
 
-            if listing['seller_id'] != user['id']:
+            if listing['seller_id'] != user_id:
                 embed = await error_embed(
                     'Not Allowed',
                     'You can only bump your own listings.',
@@ -382,7 +386,7 @@ class MarketplaceReviews(commands.Cog):
                 await ctx.send('❌ Rating must be between 1 and 5 stars.')
                 return
 
-            user = await get_user(str(ctx.author.id))
+            user_id = await user_ids.resolve(str(ctx.author.id))
 
             transaction = await db.fetch_one(
                 """SELECT t.*, l.title, u_seller.discord_id as seller_discord_id,
@@ -412,7 +416,7 @@ class MarketplaceReviews(commands.Cog):
             existing = await db.fetch_one(
                 'SELECT id FROM marketplace_reviews WHERE transaction_id = $1 AND reviewer_id = $2',
                 transaction_id,
-                user['id'],
+                user_id,
             )
 
             if existing:
@@ -426,7 +430,7 @@ class MarketplaceReviews(commands.Cog):
                    (transaction_id, reviewer_id, reviewee_id, rating, comment, is_buyer_review)
                    VALUES ($1, $2, $3, $4, $5, $6)""",
                 transaction_id,
-                user['id'],
+                user_id,
                 reviewee_id,
                 rating,
                 safe_comment,
@@ -465,9 +469,11 @@ class MarketplaceReviews(commands.Cog):
         """View a seller's reputation and statistics"""
         try:
             target = member or ctx.author
-            user = await get_user(str(target.id))
+            user_id = await user_ids.lookup(str(target.id))
 
-            stats = await db.fetch_one('SELECT * FROM marketplace_seller_stats WHERE user_id = $1', user['id'])
+            stats = None
+            if user_id is not None:
+                stats = await db.fetch_one('SELECT * FROM marketplace_seller_stats WHERE user_id = $1', user_id)
 
             if not stats or stats['total_sales'] == 0:
                 await ctx.send(f"📭 {target.display_name} hasn't made any sales yet.")
@@ -482,7 +488,7 @@ class MarketplaceReviews(commands.Cog):
                    WHERE r.reviewee_id = $1 AND r.is_buyer_review = TRUE
                    ORDER BY r.created_at DESC
                    LIMIT 5""",
-                user['id'],
+                user_id,
             )
 
             embed = nextcord.Embed(title=f"🏪 {target.display_name}'s Seller Profile", color=nextcord.Color.blue())
@@ -520,7 +526,7 @@ class MarketplaceReviews(commands.Cog):
                    WHERE seller_id = $1 AND status = 'active'
                    ORDER BY created_at DESC
                    LIMIT 3""",
-                user['id'],
+                user_id,
             )
 
             if active:
@@ -539,7 +545,7 @@ class MarketplaceReviews(commands.Cog):
     async def view_my_reviews(self, ctx):
         """View reviews you have received"""
         try:
-            user = await get_user(str(ctx.author.id))
+            user_id = await user_ids.resolve(str(ctx.author.id))
 
             reviews = await db.fetch_many(
                 """SELECT r.*, l.title, u.discord_id as reviewer_discord_id
@@ -550,7 +556,7 @@ class MarketplaceReviews(commands.Cog):
                    WHERE r.reviewee_id = $1
                    ORDER BY r.created_at DESC
                    LIMIT 10""",
-                user['id'],
+                user_id,
             )
 
             if not reviews:
@@ -608,7 +614,7 @@ class MarketplaceReviews(commands.Cog):
     async def bump_listing(self, ctx, listing_id: str):
         """Bump your listing to the top (once per day per listing)"""
         try:
-            user = await get_user(str(ctx.author.id))
+            user_id = await user_ids.resolve(str(ctx.author.id))
 
             listing = await db.fetch_one(
                 """SELECT seller_id, title, bumped_at
@@ -621,7 +627,7 @@ class MarketplaceReviews(commands.Cog):
                 await ctx.send('❌ Listing not found or not active.')
                 return
 
-            if listing['seller_id'] != user['id']:
+            if listing['seller_id'] != user_id:
                 await ctx.send('❌ You can only bump your own listings.')
                 return
 
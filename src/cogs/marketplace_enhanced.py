@@ -10,7 +10,9 @@ from decimal import Decimal
 import nextcord
 from nextcord.ext import commands, tasks
 
-from src.database.database import db, get_user
+from src.database.database import db
+from src.database.identity_map import user_ids
+from src.database.lanes import BACKGROUND, in_lane
 from src.utils.embeds import error_embed, info_embed, success_embed
 from src.utils.marketplace.fraud_detection import fraud_detector
 from src.utils.safety import safe_send, safe_slash_command
@@ -81,7 +83,7 @@ class MarketplaceEnhanced(commands.Cog):
 
     async def watch_slash(self, interaction: nextcord.Interaction, listing_id: str):
         try:
-            user = await get_user(str(interaction.user.id))
+            user_id = await user_ids.resolve(str(interaction.user.id))
             listing = await db.fetch_one('SELECT title, price FROM marketplace_listings WHERE id = $1', listing_id)
 
             if not listing:
@@ -93,7 +95,7 @@ class MarketplaceEnhanced(commands.Cog):
 
             await db.execute(
                 'INSERT INTO marketplace_watchlist (user_id, listing_id) VALUES ($1, $2) ON CONFLICT DO NOTHING',
-                user['id'],
+                user_id,
                 listing_id,
             )
 
@@ -114,9 +116,9 @@ class MarketplaceEnhanced(commands.Cog):
 
     async def unwatch_slash(self, interaction: nextcord.Interaction, listing_id: str):
         try:
-            user = await get_user(str(interaction.user.id))
+            user_id = await user_ids.resolve(str(interaction.user.id))
             await db.execute(
-                'DELETE FROM marketplace_watchlist WHERE user_id = $1 AND listing_id = $2', user['id'], listing_id
+                'DELETE FROM marketplace_watchlist WHERE user_id = $1 AND listing_id = $2', user_id, listing_id
             )
 
             embed = await success_embed(
@@ -136,7 +138,7 @@ class MarketplaceEnhanced(commands.Cog):
 
     async def watchlist_slash(self, interaction: nextcord.Interaction):
         try:
-            user = await get_user(str(interaction.user.id))
+            user_id = await user_ids.resolve(str(interaction.user.id))
 
             items = await db.fetch_many(
                 """SELECT l.*, c.name as category_name, c.emoji
@@ -145,7 +147,7 @@ class MarketplaceEnhanced(commands.Cog):
                    JOIN marketplace_categories c ON l.category_id = c.id
                    WHERE w.user_id = $1
                    ORDER BY w.created_at DESC""",
-                user['id'],
+                user_id,
             )
 
             if not items:
@@ -181,7 +183,7 @@ class MarketplaceEnhanced(commands.Cog):
 
     async def offer_slash(self, interaction: nextcord.Interaction, listing_id: str, price: str, message: str = ''):
         try:
-            buyer = await get_user(str(interaction.user.id))
+            buyer_id = await user_ids.resolve(str(interaction.user.id))
 
             listing = await db.fetch_one(
                 """SELECT l.*, u.discord_id as seller_discord_id
@@ -230,7 +232,7 @@ class MarketplaceEnhanced(commands.Cog):
                 return
 
             is_clean, fraud_reason = await fraud_detector.check_offer(
-                listing_id, buyer['id'], listing['seller_id'], Decimal(str(offered_price))
+                listing_id, buyer_id, listing['seller_id'], Decimal(str(offered_price))
             )
 
             if not is_clean:
@@ -246,7 +248,7 @@ class MarketplaceEnhanced(commands.Cog):
                    (listing_id, buyer_id, offered_price, message, expires_at)
                    VALUES ($1, $2, $3, $4, $5)""",
                 listing_id,
-                buyer['id'],
+                buyer_id,
                 offered_price,
                 sanitize(message, max_length=500),
                 expires,
@@ -289,7 +291,7 @@ class MarketplaceEnhanced(commands.Cog):
 
     async def myoffers_slash(self, interaction: nextcord.Interaction):
         try:
-            user = await get_user(str(interaction.user.id))
+            user_id = await user_ids.resolve(str(interaction.user.id))
 
             received_offers = await db.fetch_many(
                 """SELECT o.*, l.title, l.price as original_price, u.discord_id as buyer_discord_id
@@ -298,7 +300,7 @@ class MarketplaceEnhanced(commands.Cog):
                    JOIN users u ON o.buyer_id = u.id
                    WHERE l.seller_id = $1 AND o.status = 'pending' AND o.expires_at > NOW()
                    ORDER BY o.created_at DESC""",
-                user['id'],
+                user_id,
             )
 
             sent_offers = await db.fetch_many(
@@ -307,7 +309,7 @@ class MarketplaceEnhanced(commands.Cog):
                    JOIN marketplace_listings l ON o.listing_id = l.id
                    WHERE o.buyer_id = $1 AND o.status = 'pending' AND o.expires_at > NOW()
                    ORDER BY o.created_at DESC""",
-                user['id'],
+                user_id,
             )
 
             embed = await info_embed(title='💰 Your Offers', contributor_source=__name__, user=interaction.user)
@@ -519,7 +521,7 @@ class MarketplaceEnhanced(commands.Cog):
     async def add_to_watchlist(self, ctx, listing_id: str):
         """Add an item to your watchlist"""
         try:
-            user = await get_user(str(ctx.author.id))
+            user_id = await user_ids.resolve(str(ctx.author.id))
             listing = await db.fetch_one('SELECT title, price FROM marketplace_listings WHERE id = $1', listing_id)
 
             if not listing:
@@ -528,7 +530,7 @@ class MarketplaceEnhanced(commands.Cog):
 
             await db.execute(
                 'INSERT INTO marketplace_watchlist (user_id, listing_id) VALUES ($1, $2) ON CONFLICT DO NOTHING',
-                user['id'],
+                user_id,
                 listing_id,
             )
 
@@ -542,9 +544,9 @@ class MarketplaceEnhanced(commands.Cog):
     async def remove_from_watchlist(self, ctx, listing_id: str):
         """Remove an item from your watchlist"""
         try:
-            user = await get_user(str(ctx.author.id))
+            user_id = await user_ids.resolve(str(ctx.author.id))
             await db.execute(
-                'DELETE FROM marketplace_watchlist WHERE user_id = $1 AND listing_id = $2', user['id'], listing_id
+                'DELETE FROM marketplace_watchlist WHERE user_id = $1 AND listing_id = $2', user_id, listing_id
             )
             await ctx.send('✅ Item removed from your watchlist.')
 
@@ -556,7 +558,7 @@ class MarketplaceEnhanced(commands.Cog):
     async def view_watchlist(self, ctx):
         """View all items you are watching"""
         try:
-            user = await get_user(str(ctx.author.id))
+            user_id = await user_ids.resolve(str(ctx.author.id))
 
             items = await db.fetch_many(
                 """SELECT l.*, c.name as category_name, c.emoji
@@ -565,7 +567,7 @@ class MarketplaceEnhanced(commands.Cog):
                    JOIN marketplace_categories c ON l.category_id = c.id
                    WHERE w.user_id = $1
                    ORDER BY w.created_at DESC""",
-                user['id'],
+                user_id,
             )
 
             if not items:
@@ -593,7 +595,7 @@ class MarketplaceEnhanced(commands.Cog):
     async def make_offer(self, ctx, listing_id: str, price: str, *, message: str = ''):
         """Make an offer on an item"""
         try:
-            buyer = await get_user(str(ctx.author.id))
+            buyer_id = await user_ids.resolve(str(ctx.author.id))
 
             listing = await db.fetch_one(
                 """SELECT l.*, u.discord_id as seller_discord_id
@@ -621,7 +623,7 @@ class MarketplaceEnhanced(commands.Cog):
                 return
 
             is_clean, fraud_reason = await fraud_detector.check_offer(
-                listing_id, buyer['id'], listing['seller_id'], Decimal(str(offered_price))
+                listing_id, buyer_id, listing['seller_id'], Decimal(str(offered_price))
             )
 
             if not is_clean:
@@ -634,7 +636,7 @@ class MarketplaceEnhanced(commands.Cog):
                    (listing_id, buyer_id, offered_price, message, expires_at)
                    VALUES ($1, $2, $3, $4, $5)""",
                 listing_id,
-                buyer['id'],
+                buyer_id,
                 offered_price,
                 sanitize(message, max_length=500),
                 expires,
@@ -666,7 +668,7 @@ class MarketplaceEnhanced(commands.Cog):
     async def view_offers(self, ctx):
         """View offers on your listings or offers you have made"""
         try:
-            user = await get_user(str(ctx.author.id))
+            user_id = await user_ids.resolve(str(ctx.author.id))
 
             received_offers = await db.fetch_many(
                 """SELECT o.*, l.title, l.price as original_price, u.discord_id as buyer_discord_id
@@ -675,7 +677,7 @@ class MarketplaceEnhanced(commands.Cog):
                    JOIN users u ON o.buyer_id = u.id
                    WHERE l.seller_id = $1 AND o.status = 'pending' AND o.expires_at > NOW()
                    ORDER BY o.created_at DESC""",
-                user['id'],
+                user_id,
             )
 
             sent_offers = await db.fetch_many(
@@ -684,7 +686,7 @@ class MarketplaceEnhanced(commands.Cog):
                    JOIN marketplace_listings l ON o.listing_id = l.id
                    WHERE o.buyer_id = $1 AND o.status = 'pending' AND o.expires_at > NOW()
                    ORDER BY o.created_at DESC""",
-                user['id'],
+                user_id,
             )
 
             embed = nextcord.Embed(title='💰 Your Offers', color=nextcord.Color.blue())
@@ -903,6 +905,7 @@ class MarketplaceEnhanced(commands.Cog):
     # ==================== BACKGROUND TASKS ====================
 
     @tasks.loop(hours=6)
+    @in_lane(BACKGROUND)
     async def check_price_drops(self):
         try:
             expiring = await db.fetch_many(
@@ -937,6 +940,7 @@ class MarketplaceEnhanced(commands.Cog):
         logger.info('Updated featured listings cache')
 
     @tasks.loop(hours=24)
+    @in_lane(BACKGROUND)
     async def check_expiring_listings(self):
         try:
             await db.execute(
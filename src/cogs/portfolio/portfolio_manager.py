@@ -5,7 +5,8 @@ import nextcord
 import validators
 from nextcord.ext import commands
 
-from src.database.database import db, get_or_create_user
+from src.database.database import db
+from src.database.identity_map import user_ids
 from src.utils.embeds import error_embed, info_embed, success_embed
 from src.utils.safety import safe_send, safe_slash_command
 
@@ -49,12 +50,12 @@ class PortfolioManager(commands.Cog):
             tag_list = [t.strip() for t in tags.split(',') if t.strip()] if tags else []
 
             project_id = f'proj-{int(datetime.utcnow().timestamp())}'
-            user = await get_or_create_user(str(interaction.user.id))
+            user_id = await user_ids.resolve(str(interaction.user.id))
 
             await db.execute(
                 'INSERT INTO portfolios (id, user_id, title, description, url, tags) VALUES ($1, $2, $3, $4, $5, $6)',
                 project_id,
-                user['id'],
+                user_id,
                 title,
                 description,
                 project_url,
@@ -88,8 +89,10 @@ class PortfolioManager(commands.Cog):
     @safe_slash_command(requires_db=True)
     async def portfolio_list_slash(self, interaction: nextcord.Interaction, member: nextcord.Member = None):
         target = member or interaction.user
-        user = await get_or_create_user(str(target.id))
-        rows = await db.fetch_many('SELECT * FROM portfolios WHERE user_id = $1 ORDER BY created_at DESC', user['id'])
+        user_id = await user_ids.lookup(str(target.id))
+        rows = []
+        if user_id is not None:
+            rows = await db.fetch_many('SELECT * FROM portfolios WHERE user_id = $1 ORDER BY created_at DESC', user_id)
 
         if not rows:
             msg = (
@@ -156,8 +159,8 @@ class PortfolioManager(commands.Cog):
     @portfolio.subcommand(name='delete', description='Delete a project from your portfolio')
     @safe_slash_command(requires_db=True)
     async def portfolio_delete_slash(self, interaction: nextcord.Interaction, project_id: str):
-        user = await get_or_create_user(str(interaction.user.id))
-        result = await db.execute('DELETE FROM portfolios WHERE id = $1 AND user_id = $2', project_id, user['id'])
+        user_id = await user_ids.resolve(str(interaction.user.id))
+        result = await db.execute('DELETE FROM portfolios WHERE id = $1 AND user_id = $2', project_id, user_id)
         if result == 'DELETE 1':
             embed = await success_embed(
                 title='Deleted',
@@ -270,12 +273,12 @@ class PortfolioManager(commands.Cog):
             tag_list = [t.strip() for t in tags_raw.split(',') if t.strip()]
 
             project_id = f'proj-{int(datetime.utcnow().timestamp())}'
-            user = await get_or_create_user(str(ctx.author.id))
+            user_id = await user_ids.resolve(str(ctx.author.id))
 
             await db.execute(
                 'INSERT INTO portfolios (id, user_id, title, description, url, tags) VALUES ($1, $2, $3, $4, $5, $6)',
                 project_id,
-                user['id'],
+                user_id,
                 title,
                 description,
                 url,
@@ -301,8 +304,10 @@ class PortfolioManager(commands.Cog):
     @portfolio_prefix.command(name='list')
     async def portfolio_list_prefix(self, ctx, member: nextcord.Member = None):
         target = member or ctx.author
-        user = await get_or_create_user(str(target.id))
-        rows = await db.fetch_many('SELECT * FROM portfolios WHERE user_id = $1 ORDER BY created_at DESC', user['id'])
+        user_id = await user_ids.lookup(str(target.id))
+        rows = []
+        if user_id is not None:
+            rows = await db.fetch_many('SELECT * FROM portfolios WHERE user_id = $1 ORDER BY created_at DESC', user_id)
 
         if not rows:
             msg = (
@@ -360,8 +365,8 @@ class PortfolioManager(commands.Cog):
 
     @portfolio_prefix.command(name='delete')
     async def portfolio_delete_prefix(self, ctx, project_id: str):
-        user = await get_or_create_user(str(ctx.author.id))
-        result = await db.execute('DELETE FROM portfolios WHERE id = $1 AND user_id = $2', project_id, user['id'])
+        user_id = await user_ids.resolve(str(ctx.author.id))
+        result = await db.execute('DELETE FROM portfolios WHERE id = $1 AND user_id = $2', project_id, user_id)
         if result == 'DELETE 1':
             await ctx.send(f'✅ Project `{project_id}` deleted.')
         else:
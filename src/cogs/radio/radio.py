@@ -21,7 +21,8 @@ from src.config.config import (
     RADIO_VOICE_CHANNEL_ID,
 )
 from src.core.runtime_state import runtime_state
-from src.database.database import db
+from src.database.lanes import BACKGROUND, in_lane
+from src.services.activity_details import add_detail_minutes
 from src.utils.embeds import error_embed, info_embed, success_embed
 from src.utils.guild_gate import owner_in_external_only
 from src.utils.safety import admin_only, safe_send, safe_slash_command
@@ -309,9 +310,11 @@ class RadioManager(commands.Cog):
     # ============================================================
 
     @tasks.loop(minutes=5)
+    @in_lane(BACKGROUND)
     async def track_radio_listeners(self):
         """Track who is listening to the radio and record their time."""
-        if not self._is_connected() or not runtime_state.db_available:
+        # No database check: during outages the writes go to the local outbox
+        if not self._is_connected():
             return
 
         if not self._voice_client or not self._voice_client.channel:
@@ -323,21 +326,11 @@ class RadioManager(commands.Cog):
             if not m.bot
         ]
 
-        for member in listeners:
-            try:
-                await db.execute(
-                    """
-                    INSERT INTO user_activity_details (user_id, activity_type, activity_name, duration_minutes, last_seen)
-                    VALUES ($1, 'radio', 'Radio Stream', 5, NOW())
-                    ON CONFLICT (user_id, activity_type, activity_name)
-                    DO UPDATE SET
-                        duration_minutes = user_activity_details.duration_minutes + 5,
-                        last_seen = NOW()
-                    """,
-                    str(member.id),
-                )
-            except Exception as exc:
-                logger.debug('Failed to track radio listener %s: %s', member, exc)
+        # One batched upsert for every listener
+        try:
+            await add_detail_minutes({(member.id, 'radio', 'Radio Stream'): 5 for member in listeners})
+        except Exception as exc:
+            logger.debug('Failed to track %d radio listeners: %s', len(listeners), exc)
 
     @track_radio_listeners.before_loop
     async def before_track_radio_listeners(self):
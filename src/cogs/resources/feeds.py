@@ -5,7 +5,8 @@ from nextcord.ext import commands, tasks
 
 from src.config.config import RSS_FEEDS
 from src.core.runtime_state import runtime_state
-from src.services.rss_service import RSSService
+from src.database.lanes import BACKGROUND, in_lane
+from src.services.rss_service import RSSService, feed_parser_pool
 from src.utils.embeds import error_embed, info_embed
 from src.utils.safety import safe_background_task, safe_send, safe_slash_command
 
@@ -24,17 +25,19 @@ class Feeds(commands.Cog):
 
     def cog_unload(self):
         self.feed_update.cancel()
+        feed_parser_pool.shutdown()
 
     @tasks.loop(minutes=15)
     @safe_background_task(name='feed_update')
+    @in_lane(BACKGROUND)
     async def feed_update(self):
         """Periodically check for new feed entries and post updates"""
         if not runtime_state.db_available:
             logger.debug('Skipping feed update: database unavailable')
             return
-        for category in RSS_FEEDS:
-            # We fetch only the new entries, as deduplication is now persistent via DB
-            entries = await self.rss_service.get_latest_new_entries(category, limit=3)
+        # Fetch every feed concurrently; only new entries come back, as deduplication is persistent via DB
+        new_entries = await self.rss_service.refresh_feeds(limit=3)
+        for category, entries in new_entries.items():
             if not entries:
                 continue
 
@@ -99,8 +102,8 @@ class Feeds(commands.Cog):
         # Just get some entries directly without marking them as deduplicated so users can view them repeatedly
         # We will bypass the `get_latest_new_entries` and just fetch
         entries = []
-        for url in RSS_FEEDS[category]:
-            feed_data = await self.rss_service.fetch_feed(url)
+        fetched = await self.rss_service.fetch_feeds(RSS_FEEDS[category], require_entries=True)
+        for feed_data in fetched.values():
             if feed_data:
                 entries.extend(feed_data['entries'])
 
@@ -8,33 +8,54 @@ multipliers, manages dynamic activity roles, and maintains a leaderboard.
 import logging
 import math
 import time
-from datetime import UTC, datetime, timedelta, timezone
+from datetime import UTC, date, datetime, timedelta, timezone
 
 import nextcord
 from nextcord.ext import commands, tasks
 
 from src.config.config import (
-    ACTIVITY_ROLE_INACTIVITY_DAYS,
-    ACTIVITY_ROLES,
-    CODING_APPS,
+    ACTIVITY_LOG_FLUSH_INTERVAL,
+    ACTIVITY_ROLE_EVAL_INTERVAL,
+    ACTIVITY_ROLE_RECONCILE_HOUR,
     INACTIVITY_CHECK_HOUR,
     INACTIVITY_CHECK_MINUTE,
     INACTIVITY_MONTH_DAYS,
     INACTIVITY_WEEK_DAYS,
     IST_UTC_OFFSET,
     LEADERBOARD_CHANNEL_ID,
+    LEADERBOARD_RECONCILE_INTERVAL,
     LEADERBOARD_TOP_N,
     LEADERBOARD_UPDATE_INTERVAL,
     LIVE_ROLE_ID,
     LOGS_CHANNEL_ID,
     MESSAGE_XP_COOLDOWN,
+    PRESENCE_CHECKPOINT_INTERVAL,
+    PRESENCE_FLUSH_INTERVAL,
     RPG_POINTS,
+    SESSION_RESUME_MAX_GAP,
+    XP_FLUSH_INTERVAL,
     XP_MULTIPLIERS,
 )
 from src.core.runtime_state import runtime_state
 from src.database.database import db
-from src.services import inactivity_service
+from src.database.identity_map import user_ids
+from src.database.lanes import BACKGROUND, in_lane
+from src.database.statements import statements
+from src.services import activity_log_maintenance, inactivity_service
+from src.services.activity_log_writer import activity_log_writer
+from src.services.activity_role_tracker import (
+    ACTIVITY_ROLE_NAMES,
+    activity_role_tracker,
+    inactivity_cutoff,
+    role_for_points,
+    target_role,
+)
+from src.services.leaderboard_service import LEADERBOARD_COLUMNS, leaderboard_cache
+from src.services.presence_pipeline import EMPTY_PRESENCE, presence_pipeline, snapshot_member
+from src.services.session_store import VOICE_SESSION, session_store, to_monotonic, utcnow
+from src.services.xp_accumulator import xp_accumulator
 from src.utils.embeds import alert_embed, error_embed, info_embed, success_embed
+from src.utils.expiring import ExpiringDict
 from src.utils.safety import admin_only, safe_send, safe_slash_command
 
 logger = logging.getLogger('VEKA.rpg')
@@ -43,15 +64,38 @@ logger = logging.getLogger('VEKA.rpg')
 # Helpers
 # ============================================================
 
-# Map role name strings to their Discord role names
-_ACTIVITY_ROLE_NAMES = {
-    'active_member': 'Active Member',
-    'active_plus': 'Active+',
-    'active_star': 'Active Star',
+# Activity role names, for matching against member roles
+_ACTIVITY_ROLE_NAME_SET = frozenset(ACTIVITY_ROLE_NAMES.values())
+
+# Period leaderboards: window length and the user_activity_log type behind each stat column
+_PERIOD_DAYS = {'week': 7, 'month': 30}
+_PERIOD_ACTIVITY_TYPES = {
+    'total_messages': 'message',
+    'total_voice_minutes': 'voice',
+    'total_commands': 'command',
 }
 
-# Sorted ascending by threshold so we can find the highest matching role
-_ACTIVITY_ROLE_THRESHOLDS = sorted(ACTIVITY_ROLES.items(), key=lambda kv: kv[1])
+# Column names cannot be bound parameters, so each stat column gets its own
+# registered statement instead of an f-string built per call
+_PERIOD_LEADERBOARD_SQL = statements.register(
+    'rpg.period_leaderboard',
+    """
+    SELECT user_id AS discord_id, SUM(points_sum) AS stat_val
+    FROM user_activity_daily
+    WHERE activity_type = $1
+      AND day > (NOW() AT TIME ZONE 'UTC')::DATE - $2::INT
+    GROUP BY user_id
+    ORDER BY stat_val DESC
+    LIMIT $3
+    """,
+)
+_STAT_LEADERBOARD_SQL = {
+    column: statements.register(
+        f'rpg.stat_leaderboard.{column}',
+        f'SELECT discord_id, {column} FROM users WHERE {column} > 0 ORDER BY {column} DESC LIMIT $1',
+    )
+    for column in LEADERBOARD_COLUMNS
+}
 
 
 def calculate_level(points: int) -> int:
@@ -90,52 +134,57 @@ class RPGManager(commands.Cog):
 
     def __init__(self, bot: commands.Bot):
         self.bot = bot
-        self._message_cooldowns: dict[int, float] = {}  # user_id -> last_message_time
+        # user_id -> last_message_time, forgotten once the cooldown has passed
+        self._message_cooldowns: ExpiringDict[int, float] = ExpiringDict(MESSAGE_XP_COOLDOWN)
         self._voice_join_times: dict[int, float] = {}  # user_id -> join_timestamp
         self._leaderboard_message: nextcord.Message | None = None
-        # Activity duration tracking (streaming / gaming / listening)
-        self._activity_start_times: dict[str, dict[int, float]] = {
-            'streaming': {},
-            'gaming': {},
-            'listening': {},
-        }
-        # Detailed activity tracking: (user_id, activity_type, activity_name) -> start_time
-        self._detailed_activity_start: dict[tuple[int, str, str], float] = {}
-        # Cache of active activities per user for diffing
-        self._user_active_activities: dict[int, dict[str, set[str]]] = {}
+        self._activity_roles_reconciled_on: date | None = None  # IST date of the last nightly full evaluation
+        # Persisted sessions are reconciled once before the first checkpoint may overwrite them
+        self._sessions_restored = False
+        self._voice_sessions_closed = False  # a voice session was credited since the last checkpoint
 
     async def cog_load(self):
         """Start background tasks."""
+        self.reconcile_leaderboard.start()
         self.update_leaderboard.start()
         self.evaluate_activity_roles.start()
         self.check_inactivity.start()
         self.flush_activity_details.start()
+        self.checkpoint_sessions.start()
+        self.flush_xp.start()
+        self.flush_activity_log.start()
+        self.maintain_activity_log.start()
         # Restore leaderboard message reference if channel is configured
         if LEADERBOARD_CHANNEL_ID:
             await self._restore_leaderboard_message()
 
     async def cog_unload(self):
         """Stop background tasks."""
+        self.reconcile_leaderboard.stop()
         self.update_leaderboard.stop()
         self.evaluate_activity_roles.stop()
         self.check_inactivity.stop()
         self.flush_activity_details.stop()
-        # Flush any remaining activity durations
-        await self._flush_all_detailed_activities()
+        self.checkpoint_sessions.stop()
+        self.flush_xp.stop()
+        self.flush_activity_log.stop()
+        self.maintain_activity_log.stop()
+        # Flush buffered XP, activity durations and activity log rows, persisting the
+        # sessions still open so the next start resumes them
+        await xp_accumulator.flush()
+        try:
+            await presence_pipeline.shutdown(self._open_voice_sessions() if self._sessions_restored else None)
+        except Exception as exc:
+            logger.warning('Failed to checkpoint activity sessions: %s', exc)
+        await activity_log_writer.flush()
 
     # ============================================================
     # DB helpers
     # ============================================================
 
     async def _ensure_user(self, discord_id: int) -> None:
-        """Ensure a user row exists."""
-        await db.execute(
-            """
-            INSERT INTO users (discord_id) VALUES ($1)
-            ON CONFLICT (discord_id) DO NOTHING
-            """,
-            str(discord_id),
-        )
+        """Ensure a user row exists (a cache hit once the user is known)."""
+        await user_ids.resolve(str(discord_id))
 
     async def _award_points(
         self,
@@ -146,15 +195,11 @@ class RPGManager(commands.Cog):
         channel_id: int = 0,
         quantity: int = 1,
     ) -> int:
-        """Award points to a user with role-based multipliers. Returns actual points awarded."""
-        try:
-            await self._ensure_user(user_id)
-
-            # Fetch user to check role for multiplier
-            user_row = await db.fetch_one('SELECT points FROM users WHERE discord_id = $1', str(user_id))
-            if not user_row:
-                return 0
+        """Award points to a user with role-based multipliers. Returns actual points awarded.
 
+        Points are buffered in the write-behind accumulator and persisted by ``flush_xp``.
+        """
+        try:
             member = self.bot.get_user(user_id)
             multiplier = 1.0
             if member:
@@ -166,69 +211,24 @@ class RPGManager(commands.Cog):
 
             actual_points = max(1, int(base_points * quantity * multiplier))
 
-            await db.execute(
-                """
-                UPDATE users
-                SET points = points + $1,
-                    experience = experience + $1,
-                    last_active = NOW(),
-                    inactive_week_notified = FALSE,
-                    inactive_month_notified = FALSE
-                WHERE discord_id = $2
-                """,
-                actual_points,
-                str(user_id),
-            )
-
-            # Update level
-            new_points = (user_row['points'] or 0) + actual_points
-            new_level = calculate_level(new_points)
-            await db.execute(
-                'UPDATE users SET level = $1 WHERE discord_id = $2',
-                new_level,
-                str(user_id),
-            )
-
-            # Update activity totals
-            if activity_type == 'message':
-                await db.execute(
-                    'UPDATE users SET total_messages = total_messages + $1 WHERE discord_id = $2',
-                    quantity,
-                    str(user_id),
-                )
-            elif activity_type == 'voice':
-                await db.execute(
-                    'UPDATE users SET total_voice_minutes = total_voice_minutes + $1 WHERE discord_id = $2',
-                    quantity,
-                    str(user_id),
-                )
-            elif activity_type == 'command':
-                await db.execute(
-                    'UPDATE users SET total_commands = total_commands + $1 WHERE discord_id = $2',
-                    quantity,
-                    str(user_id),
-                )
-
-            # Log activity
-            await db.execute(
-                """
-                INSERT INTO user_activity_log (user_id, activity_type, points_awarded, channel_id, guild_id)
-                VALUES ($1, $2, $3, $4, $5)
-                """,
-                str(user_id),
+            accepted = xp_accumulator.add(
+                user_id,
                 activity_type,
                 actual_points,
-                channel_id,
-                guild_id,
+                quantity=quantity,
+                guild_id=guild_id,
+                channel_id=channel_id,
             )
-
-            return actual_points
+            return actual_points if accepted else 0
         except Exception as exc:
             logger.warning('Failed to award %s points to user %s: %s', activity_type, user_id, exc)
             return 0
 
     async def _get_user_rank(self, user_id: int) -> int | None:
         """Get a user's rank (1-indexed) from the leaderboard."""
+        # Served from the in-memory rank index once it has been seeded
+        if leaderboard_cache.seeded:
+            return leaderboard_cache.standing(user_id, xp_accumulator.pending_for(user_id).points).rank
         try:
             rank = await db.fetchval(
                 """
@@ -243,6 +243,8 @@ class RPGManager(commands.Cog):
 
     async def _get_leaderboard_data(self) -> list[dict]:
         """Fetch top N users for the leaderboard."""
+        if leaderboard_cache.seeded:
+            return leaderboard_cache.top('points', LEADERBOARD_TOP_N)
         try:
             rows = await db.fetch(
                 """
@@ -331,47 +333,18 @@ class RPGManager(commands.Cog):
     async def _get_stat_leaderboard(self, column: str, period: str | None = None, limit: int = 10) -> list[dict]:
         """Fetch top N users for a given stat column, optionally filtered by period."""
         try:
-            if period == 'month':
-                rows = await db.fetch(
-                    """
-                    SELECT u.discord_id, SUM(a.points_awarded) AS stat_val
-                    FROM users u
-                    JOIN user_activity_log a ON a.user_id = u.discord_id
-                    WHERE a.activity_type = $1
-                      AND a.created_at >= NOW() - INTERVAL '30 days'
-                    GROUP BY u.discord_id
-                    ORDER BY stat_val DESC
-                    LIMIT $2
-                    """,
-                    column.replace('total_', '').replace('_minutes', ''),
-                    limit,
-                )
-            elif period == 'week':
+            if period in _PERIOD_DAYS:
+                # Served from the daily rollup maintained by the user_activity_log trigger
                 rows = await db.fetch(
-                    """
-                    SELECT u.discord_id, SUM(a.points_awarded) AS stat_val
-                    FROM users u
-                    JOIN user_activity_log a ON a.user_id = u.discord_id
-                    WHERE a.activity_type = $1
-                      AND a.created_at >= NOW() - INTERVAL '7 days'
-                    GROUP BY u.discord_id
-                    ORDER BY stat_val DESC
-                    LIMIT $2
-                    """,
-                    column.replace('total_', '').replace('_minutes', ''),
+                    _PERIOD_LEADERBOARD_SQL,
+                    _PERIOD_ACTIVITY_TYPES.get(column, column.replace('total_', '').replace('_minutes', '')),
+                    _PERIOD_DAYS[period],
                     limit,
                 )
+            elif leaderboard_cache.seeded and leaderboard_cache.has_column(column):
+                return leaderboard_cache.top(column, limit)
             else:
-                rows = await db.fetch(
-                    f"""
-                    SELECT discord_id, {column}
-                    FROM users
-                    WHERE {column} > 0
-                    ORDER BY {column} DESC
-                    LIMIT $1
-                    """,
-                    limit,
-                )
+                rows = await db.fetch(_STAT_LEADERBOARD_SQL[column], limit)
             return [dict(row) for row in rows]
         except Exception:
             return []
@@ -424,6 +397,7 @@ class RPGManager(commands.Cog):
         elif before is not None and after is None:
             join_time = self._voice_join_times.pop(user_id, None)
             if join_time:
+                self._voice_sessions_closed = True
                 minutes = int((time.monotonic() - join_time) / 60)
                 if minutes >= 1:
                     await self._award_points(
@@ -439,6 +413,7 @@ class RPGManager(commands.Cog):
         elif before is not None and after is not None and before.channel != after.channel:
             join_time = self._voice_join_times.pop(user_id, None)
             if join_time:
+                self._voice_sessions_closed = True
                 minutes = int((time.monotonic() - join_time) / 60)
                 if minutes >= 1:
                     await self._award_points(
@@ -467,14 +442,15 @@ class RPGManager(commands.Cog):
 
     @commands.Cog.listener()
     async def on_member_update(self, before: nextcord.Member, after: nextcord.Member):
-        """Track activity durations (streaming/gaming/listening) and live role."""
+        """Queue the presence for activity-duration tracking and update the live role."""
         if after.bot:
             return
 
+        # Coalesced and diffed off the dispatch path; see src/services/presence_pipeline.py
+        presence_pipeline.submit(after.id, snapshot_member(after))
+
         was_streaming = self._is_streaming(before)
         is_streaming = self._is_streaming(after)
-        is_gaming = self._has_activity_type(after, nextcord.ActivityType.playing)
-        is_listening = self._has_activity_type(after, nextcord.ActivityType.listening)
 
         # --- Live role (streaming start/stop) ---
         if LIVE_ROLE_ID and was_streaming != is_streaming:
@@ -496,33 +472,11 @@ class RPGManager(commands.Cog):
                 except Exception as exc:
                     logger.warning('Failed to update live role for %s: %s', after, exc)
 
-        # --- Activity duration tracking ---
-        await self._track_activity_duration(after, 'streaming', is_streaming)
-        await self._track_activity_duration(after, 'gaming', is_gaming)
-        await self._track_activity_duration(after, 'listening', is_listening)
-
-        # --- Detailed activity tracking (games, listening, coding) ---
-        try:
-            game_names = self._get_game_names(after)
-            streaming_games = self._get_streaming_game_names(after)
-            listening_details = self._get_listening_details(after)
-            coding_apps = self._get_coding_apps(after)
-
-            await self._track_detailed_activity(after, 'game', game_names)
-            await self._track_detailed_activity(after, 'streaming_game', streaming_games)
-            await self._track_detailed_activity(after, 'coding', coding_apps)
-
-            # For listening, track each song/artist as a separate entry
-            listening_names = set()
-            for detail in listening_details:
-                if 'song' in detail:
-                    listening_names.add(detail['song'])
-                if 'artist' in detail:
-                    listening_names.add(detail['artist'])
-                listening_names.add(detail.get('name', 'Unknown'))
-            await self._track_detailed_activity(after, 'listening', listening_names)
-        except Exception as exc:
-            logger.debug('Failed to track detailed activities for %s: %s', after, exc)
+    @commands.Cog.listener()
+    async def on_member_remove(self, member: nextcord.Member):
+        """Close a departed member's sessions; no further presence updates will arrive for them."""
+        if not member.bot:
+            presence_pipeline.submit(member.id, EMPTY_PRESENCE)
 
     @staticmethod
     def _is_streaming(member: nextcord.Member) -> bool:
@@ -538,152 +492,12 @@ class RPGManager(commands.Cog):
                 return activity.url
         return None
 
-    @staticmethod
-    def _has_activity_type(member: nextcord.Member, activity_type: nextcord.ActivityType) -> bool:
-        return any(a.type == activity_type for a in member.activities)
-
-    # ============================================================
-    # Activity detail extraction helpers
-    # ============================================================
-
-    @staticmethod
-    def _get_game_names(member: nextcord.Member) -> set[str]:
-        """Extract game names from Playing activities."""
-        games = set()
-        for activity in member.activities:
-            if activity.type == nextcord.ActivityType.playing and activity.name:
-                games.add(activity.name)
-        return games
-
-    @staticmethod
-    def _get_streaming_game_names(member: nextcord.Member) -> set[str]:
-        """Extract game names from activities when user is also streaming."""
-        games: set[str] = set()
-        is_streaming = any(a.type == nextcord.ActivityType.streaming for a in member.activities)
-        if not is_streaming:
-            return games
-        for activity in member.activities:
-            if activity.type == nextcord.ActivityType.playing and activity.name:
-                games.add(activity.name)
-        return games
-
-    @staticmethod
-    def _get_listening_details(member: nextcord.Member) -> list[dict]:
-        """Extract listening details from Spotify activity."""
-        details = []
-        for activity in member.activities:
-            if activity.type == nextcord.ActivityType.listening:
-                info = {'name': activity.name or 'Unknown'}
-                # Spotify activities have additional metadata
-                if hasattr(activity, 'details') and activity.details:
-                    info['song'] = activity.details
-                if hasattr(activity, 'state') and activity.state:
-                    info['artist'] = activity.state
-                if hasattr(activity, 'assets') and activity.assets:
-                    large_text = activity.assets.get('large_text')
-                    if large_text:
-                        info['album'] = large_text
-                details.append(info)
-        return details
-
-    @staticmethod
-    def _is_coding_activity(activity_name: str) -> bool:
-        """Check if an activity name matches a known coding app."""
-        name_lower = activity_name.lower()
-        return any(coding_app in name_lower for coding_app in CODING_APPS)
-
-    def _get_coding_apps(self, member: nextcord.Member) -> set[str]:
-        """Extract coding app names from activities."""
-        apps = set()
-        for activity in member.activities:
-            if activity.type == nextcord.ActivityType.playing and activity.name:
-                if self._is_coding_activity(activity.name):
-                    apps.add(activity.name)
-            elif activity.type == nextcord.ActivityType.custom and activity.name:
-                if self._is_coding_activity(activity.name):
-                    apps.add(activity.name)
-        return apps
-
-    async def _store_activity_detail(
-        self, user_id: int, activity_type: str, activity_name: str, minutes: int
-    ) -> None:
-        """Upsert activity detail to the database."""
-        if minutes < 1 or not activity_name:
-            return
-        try:
-            await db.execute(
-                """
-                INSERT INTO user_activity_details (user_id, activity_type, activity_name, duration_minutes, last_seen)
-                VALUES ($1, $2, $3, $4, NOW())
-                ON CONFLICT (user_id, activity_type, activity_name)
-                DO UPDATE SET
-                    duration_minutes = user_activity_details.duration_minutes + $4,
-                    last_seen = NOW()
-                """,
-                str(user_id),
-                activity_type,
-                activity_name,
-                minutes,
-            )
-        except Exception as exc:
-            logger.debug('Failed to store activity detail for %s: %s', user_id, exc)
-
-    async def _track_detailed_activity(
-        self, member: nextcord.Member, activity_type: str, activity_names: set[str]
-    ) -> None:
-        """Track start/stop of named activities and persist elapsed minutes."""
-        uid = member.id
-        now = time.monotonic()
-
-        # Get previously active activities of this type
-        prev = self._user_active_activities.get(uid, {}).get(activity_type, set())
-        curr = activity_names
-
-        # Activities that stopped
-        for name in prev - curr:
-            key = (uid, activity_type, name)
-            start = self._detailed_activity_start.pop(key, None)
-            if start:
-                minutes = int((now - start) / 60)
-                await self._store_activity_detail(uid, activity_type, name, minutes)
-
-        # Activities that started
-        for name in curr - prev:
-            key = (uid, activity_type, name)
-            self._detailed_activity_start[key] = now
-
-        # Update cache
-        if uid not in self._user_active_activities:
-            self._user_active_activities[uid] = {}
-        self._user_active_activities[uid][activity_type] = curr
-
-    async def _track_activity_duration(self, member: nextcord.Member, category: str, is_active: bool) -> None:
-        """Record start/stop of an activity and persist elapsed minutes."""
-        uid = member.id
-        bucket = self._activity_start_times[category]
-
-        if is_active and uid not in bucket:
-            bucket[uid] = time.monotonic()
-        elif not is_active and uid in bucket:
-            start = bucket.pop(uid)
-            minutes = int((time.monotonic() - start) / 60)
-            if minutes < 1:
-                return
-            column = f'total_{category}_minutes'
-            try:
-                await db.execute(
-                    f'UPDATE users SET {column} = {column} + $1 WHERE discord_id = $2',
-                    minutes,
-                    str(uid),
-                )
-            except Exception as exc:
-                logger.debug('Failed to update %s for %s: %s', column, member, exc)
-
     # ============================================================
     # Background tasks
     # ============================================================
 
     @tasks.loop(seconds=LEADERBOARD_UPDATE_INTERVAL)
+    @in_lane(BACKGROUND)
     async def update_leaderboard(self):
         """Periodically update the leaderboard embed."""
         if not LEADERBOARD_CHANNEL_ID or not runtime_state.db_available:
@@ -694,6 +508,10 @@ class RPGManager(commands.Cog):
             if channel is None:
                 channel = await self.bot.fetch_channel(LEADERBOARD_CHANNEL_ID)
 
+            # Seed the cache here if the database was down when the reconcile loop first ran
+            if not leaderboard_cache.seeded:
+                await leaderboard_cache.reconcile()
+
             embed = await self._build_leaderboard_embed()
             if not embed:
                 return
@@ -714,97 +532,102 @@ class RPGManager(commands.Cog):
     async def before_update_leaderboard(self):
         await self.bot.wait_until_ready()
 
-    @tasks.loop(hours=6)
-    async def evaluate_activity_roles(self):
-        """Evaluate and assign/remove activity roles based on activity."""
+    @tasks.loop(seconds=LEADERBOARD_RECONCILE_INTERVAL)
+    @in_lane(BACKGROUND)
+    async def reconcile_leaderboard(self):
+        """Seed, then periodically re-sync, the in-process leaderboard cache from the database."""
         if not runtime_state.db_available:
             return
-
         try:
-            # Get all members with points > 0
-            rows = await db.fetch(
-                """
-                SELECT discord_id, points, last_active FROM users
-                WHERE points > 0
-                """
-            )
-
-            now = datetime.now(UTC)
-            inactivity_cutoff = now - timedelta(days=ACTIVITY_ROLE_INACTIVITY_DAYS)
+            await leaderboard_cache.reconcile()
+        except Exception as exc:
+            logger.warning('Failed to reconcile leaderboard cache: %s', exc)
 
-            for row in rows:
-                user_id = int(row['discord_id'])
-                points = row.get('points', 0) or 0
-                last_active = row.get('last_active')
+    @reconcile_leaderboard.before_loop
+    async def before_reconcile_leaderboard(self):
+        await self.bot.wait_until_ready()
 
-                member = self.bot.get_guild(self.bot.guilds[0].id).get_member(user_id) if self.bot.guilds else None
-                if not member:
-                    continue
+    @tasks.loop(seconds=ACTIVITY_ROLE_EVAL_INTERVAL)
+    @in_lane(BACKGROUND)
+    async def evaluate_activity_roles(self):
+        """Evaluate activity roles for users whose role may have changed; full scan nightly."""
+        if not runtime_state.db_available:
+            return
 
-                # Determine the highest activity role the user qualifies for
-                target_role_name = None
-                for role_key, threshold in reversed(_ACTIVITY_ROLE_THRESHOLDS):
-                    if points >= threshold:
-                        target_role_name = _ACTIVITY_ROLE_NAMES[role_key]
-                        break
-
-                # Check inactivity — if last_active is older than cutoff, remove all activity roles
-                is_inactive = False
-                if last_active:
-                    if last_active.tzinfo is None:
-                        last_active = last_active.replace(tzinfo=UTC)
-                    if last_active < inactivity_cutoff:
-                        is_inactive = True
-                elif points > 0:
-                    # If no last_active but has points, check created_at as fallback
-                    is_inactive = True
-
-                if is_inactive:
-                    target_role_name = None
-
-                # Find the activity roles on the guild
-                guild = member.guild
-                current_activity_roles = []
-                for role_name in _ACTIVITY_ROLE_NAMES.values():
-                    discord_role = nextcord.utils.get(guild.roles, name=role_name)
-                    if discord_role and discord_role in member.roles:
-                        current_activity_roles.append(discord_role)
-
-                # Determine which role to keep/add
-                target_discord_role = None
-                if target_role_name:
-                    target_discord_role = nextcord.utils.get(guild.roles, name=target_role_name)
-
-                # Remove roles that shouldn't be there
-                for role in current_activity_roles:
-                    if role != target_discord_role:
-                        try:
-                            await member.remove_roles(role, reason='Activity role update')
-                        except Exception as exc:
-                            logger.debug('Failed to remove role %s from %s: %s', role.name, member, exc)
-
-                # Add the target role if not already present
-                if target_discord_role and target_discord_role not in current_activity_roles:
-                    try:
-                        await member.add_roles(target_discord_role, reason='Activity role update')
-                    except Exception as exc:
-                        logger.debug('Failed to add role %s to %s: %s', target_discord_role.name, member, exc)
+        now = datetime.now(timezone(timedelta(hours=IST_UTC_OFFSET)))
+        full = not activity_role_tracker.seeded or (
+            now.hour == ACTIVITY_ROLE_RECONCILE_HOUR and self._activity_roles_reconciled_on != now.date()
+        )
 
-                # Update tracking table
-                await db.execute(
+        try:
+            cutoff = inactivity_cutoff()
+            if full:
+                # Reconciliation: everyone with points, also catches roles edited by hand
+                rows = await db.fetch('SELECT discord_id, points, last_active FROM users WHERE points > 0')
+                activity_role_tracker.reset_recorded()
+            else:
+                candidates = activity_role_tracker.take_dirty()
+                candidates.update(await activity_role_tracker.aged_out(cutoff))
+                if not candidates:
+                    activity_role_tracker.finish_run(cutoff, 0, full=False)
+                    return
+                rows = await db.fetch(
                     """
-                    INSERT INTO user_rpg_roles (user_id, active_role, last_evaluated)
-                    VALUES ($1, $2, NOW())
-                    ON CONFLICT (user_id) DO UPDATE SET active_role = $2, last_evaluated = NOW()
+                    SELECT discord_id, points, last_active FROM users
+                    WHERE discord_id = ANY($1::VARCHAR[]) AND points > 0
                     """,
-                    str(user_id),
-                    target_role_name or '',
+                    list(candidates),
                 )
 
-            logger.info('Activity role evaluation complete')
+            evaluated = await self._apply_activity_roles(rows, cutoff)
+            activity_role_tracker.finish_run(cutoff, len(evaluated), full=full)
+            if full:
+                self._activity_roles_reconciled_on = now.date()
+                logger.info('Activity role reconciliation complete (%d members)', len(evaluated))
+            else:
+                logger.debug('Incremental activity role evaluation complete (%d members)', len(evaluated))
         except Exception as exc:
             logger.error('Activity role evaluation failed: %s', exc, exc_info=True)
 
+    async def _apply_activity_roles(self, rows, cutoff: datetime) -> dict[str, str | None]:
+        """Sync the activity roles of ``rows`` (discord_id, points, last_active) and record them in one upsert."""
+        guild = self.bot.guilds[0] if self.bot.guilds else None
+        if guild is None:
+            return {}
+
+        # Resolve the activity roles once per run
+        role_index = {role.name: role for role in guild.roles if role.name in _ACTIVITY_ROLE_NAME_SET}
+        evaluated: dict[str, str | None] = {}
+        for row in rows:
+            member = guild.get_member(int(row['discord_id']))
+            if not member:
+                continue
+
+            target_role_name = target_role(row['points'] or 0, row['last_active'], cutoff)
+            target_discord_role = role_index.get(target_role_name) if target_role_name else None
+            current_activity_roles = [role for role in member.roles if role.name in role_index]
+
+            # Remove roles that shouldn't be there
+            for role in current_activity_roles:
+                if role != target_discord_role:
+                    try:
+                        await member.remove_roles(role, reason='Activity role update')
+                    except Exception as exc:
+                        logger.debug('Failed to remove role %s from %s: %s', role.name, member, exc)
+
+            # Add the target role if not already present
+            if target_discord_role and target_discord_role not in current_activity_roles:
+                try:
+                    await member.add_roles(target_discord_role, reason='Activity role update')
+                except Exception as exc:
+                    logger.debug('Failed to add role %s to %s: %s', target_discord_role.name, member, exc)
+
+            evaluated[row['discord_id']] = target_role_name
+
+        # Update tracking table
+        await activity_role_tracker.record(evaluated)
+        return evaluated
+
     @evaluate_activity_roles.before_loop
     async def before_evaluate_activity_roles(self):
         await self.bot.wait_until_ready()
@@ -814,6 +637,7 @@ class RPGManager(commands.Cog):
     # ------------------------------------------------------------
 
     @tasks.loop(minutes=1)
+    @in_lane(BACKGROUND)
     async def check_inactivity(self):
         """Run inactivity check once per day at the configured IST hour."""
         now = datetime.now(timezone(timedelta(hours=IST_UTC_OFFSET)))
@@ -894,32 +718,186 @@ class RPGManager(commands.Cog):
         await self.bot.wait_until_ready()
 
     # ------------------------------------------------------------
-    # Activity detail flushing — every 5 minutes
+    # Activity duration flushing (presence pipeline)
     # ------------------------------------------------------------
 
-    @tasks.loop(minutes=5)
+    @tasks.loop(seconds=PRESENCE_FLUSH_INTERVAL)
+    @in_lane(BACKGROUND)
     async def flush_activity_details(self):
-        """Periodically flush in-memory activity durations to the database."""
-        await self._flush_all_detailed_activities()
+        """Write the presence pipeline's buffered activity durations in batches."""
+        try:
+            await presence_pipeline.flush()
+        except Exception as exc:
+            logger.warning('Failed to flush activity durations: %s', exc)
 
-    async def _flush_all_detailed_activities(self) -> None:
-        """Flush all tracked detailed activity durations to the database."""
-        now = time.monotonic()
-        keys_to_flush = list(self._detailed_activity_start.keys())
+    @flush_activity_details.before_loop
+    async def before_flush_activity_details(self):
+        await self.bot.wait_until_ready()
+
+    # ------------------------------------------------------------
+    # In-flight session checkpointing
+    # ------------------------------------------------------------
+
+    @tasks.loop(seconds=PRESENCE_CHECKPOINT_INTERVAL)
+    @in_lane(BACKGROUND)
+    async def checkpoint_sessions(self):
+        """Bank the minutes of running sessions and persist the sessions still open, in one transaction."""
+        if not self._sessions_restored:
+            await self._restore_sessions()
+            if not self._sessions_restored:
+                return
+        try:
+            await xp_accumulator.flush()
+        except Exception as exc:
+            logger.warning('Failed to flush XP deltas: %s', exc)
+            return
+        await self._save_sessions()
 
-        for key in keys_to_flush:
-            start = self._detailed_activity_start.get(key)
-            if start is None:
+    @checkpoint_sessions.before_loop
+    async def before_checkpoint_sessions(self):
+        await self.bot.wait_until_ready()
+
+    def _open_voice_sessions(self) -> list[tuple[int, str, str, float]]:
+        return [(user_id, VOICE_SESSION, VOICE_SESSION, joined) for user_id, joined in self._voice_join_times.items()]
+
+    async def _save_sessions(self) -> None:
+        """
+        Bank running presence minutes and replace the persisted checkpoint with
+        the open presence and voice sessions (``PresencePipeline.checkpoint``).
+        Buffered XP must be flushed first, so credited voice sessions are only
+        dropped from the checkpoint once their points are stored.
+        """
+        self._voice_sessions_closed = False
+        try:
+            await presence_pipeline.checkpoint(self._open_voice_sessions())
+        except Exception as exc:
+            self._voice_sessions_closed = True
+            logger.warning('Failed to checkpoint activity sessions: %s', exc)
+
+    async def _restore_sessions(self) -> None:
+        """
+        Reconcile the persisted checkpoint with live presence and voice state.
+
+        Sessions the member is still in continue from their persisted start if
+        the checkpoint is at most ``SESSION_RESUME_MAX_GAP`` old. Presence
+        sessions that ended while the bot was down need nothing more: their
+        minutes up to the checkpoint were already banked. Voice minutes are
+        only credited when a session ends, so a voice session that ended (or
+        is too old to resume) is credited up to its checkpoint.
+        """
+        guild = self.bot.guilds[0] if self.bot.guilds else None
+        if guild is None:
+            return
+        try:
+            rows = await session_store.load()
+        except Exception as exc:
+            logger.warning('Could not load persisted activity sessions, will retry: %s', exc)
+            return
+
+        now_monotonic, now = time.monotonic(), utcnow()
+        resume_after = now - timedelta(seconds=SESSION_RESUME_MAX_GAP)
+        presence_started: dict[int, dict[tuple[str, str], float]] = {}
+        voice_rows = {}
+        for row in rows:
+            user_id = int(row['user_id'])
+            if row['activity_type'] == VOICE_SESSION:
+                voice_rows[user_id] = row
+            elif row['checkpointed_at'] >= resume_after:
+                started = to_monotonic(row['started_at'], now_monotonic, now)
+                presence_started.setdefault(user_id, {})[(row['activity_type'], row['activity_name'])] = started
+
+        # Open sessions for what members are doing now, including those who
+        # were already playing or connected when the bot started
+        presence_pipeline.drain()
+        resumed_voice = set()
+        for member in guild.members:
+            if member.bot:
+                continue
+            presence_pipeline.resume(
+                member.id, snapshot_member(member), presence_started.get(member.id, {}), now_monotonic
+            )
+            if member.voice is None or member.voice.channel is None or member.id in self._voice_join_times:
                 continue
-            uid, activity_type, activity_name = key
-            minutes = int((now - start) / 60)
+            row = voice_rows.get(member.id)
+            if row is not None and row['checkpointed_at'] >= resume_after:
+                self._voice_join_times[member.id] = to_monotonic(row['started_at'], now_monotonic, now)
+                resumed_voice.add(member.id)
+            else:
+                self._voice_join_times[member.id] = now_monotonic
+
+        for user_id, row in voice_rows.items():
+            if user_id in resumed_voice:
+                continue
+            minutes = int((row['checkpointed_at'] - row['started_at']).total_seconds() / 60)
             if minutes >= 1:
-                await self._store_activity_detail(uid, activity_type, activity_name, minutes)
-                # Reset start time, keeping tracking active
-                self._detailed_activity_start[key] = now
+                await self._award_points(
+                    user_id,
+                    'voice',
+                    RPG_POINTS['voice_per_minute'],
+                    guild_id=guild.id,
+                    quantity=min(minutes, 60),
+                )
 
-    @flush_activity_details.before_loop
-    async def before_flush_activity_details(self):
+        self._sessions_restored = True
+        logger.info(
+            'Restored activity sessions: %d persisted, %d presence users resumed, %d voice resumed',
+            len(rows),
+            len(presence_started),
+            len(resumed_voice),
+        )
+
+    # ------------------------------------------------------------
+    # Write-behind XP flushing
+    # ------------------------------------------------------------
+
+    @tasks.loop(seconds=XP_FLUSH_INTERVAL)
+    @in_lane(BACKGROUND)
+    async def flush_xp(self):
+        """Persist buffered XP deltas as one set-based upsert."""
+        try:
+            await xp_accumulator.flush()
+        except Exception as exc:
+            logger.warning('Failed to flush XP deltas: %s', exc)
+            return
+        # Drop credited voice sessions from the checkpoint right away, so a
+        # restart cannot credit them a second time
+        if self._voice_sessions_closed and self._sessions_restored:
+            await self._save_sessions()
+
+    @flush_xp.before_loop
+    async def before_flush_xp(self):
+        await self.bot.wait_until_ready()
+
+    @tasks.loop(seconds=ACTIVITY_LOG_FLUSH_INTERVAL)
+    @in_lane(BACKGROUND)
+    async def flush_activity_log(self):
+        """Stream buffered activity log rows to the database with COPY."""
+        try:
+            await activity_log_writer.flush()
+        except Exception as exc:
+            logger.warning('Failed to flush activity log rows: %s', exc)
+
+    @flush_activity_log.before_loop
+    async def before_flush_activity_log(self):
+        await self.bot.wait_until_ready()
+
+    # ------------------------------------------------------------
+    # Activity log partition maintenance — daily
+    # ------------------------------------------------------------
+
+    @tasks.loop(hours=24)
+    @in_lane(BACKGROUND)
+    async def maintain_activity_log(self):
+        """Create upcoming monthly partitions and drop those past retention."""
+        if not runtime_state.db_available:
+            return
+        try:
+            await activity_log_maintenance.run_maintenance()
+        except Exception as exc:
+            logger.error('Activity log maintenance failed: %s', exc, exc_info=True)
+
+    @maintain_activity_log.before_loop
+    async def before_maintain_activity_log(self):
         await self.bot.wait_until_ready()
 
     # ============================================================
@@ -955,13 +933,20 @@ class RPGManager(commands.Cog):
             await safe_send(interaction, embed=embed, ephemeral=True)
             return
 
-        points = row['points'] if row else 0
-        level = row['level'] if row else calculate_level(points or 0)
+        # Overlay XP that is still buffered in the accumulator
+        pending = xp_accumulator.pending_for(target.id)
+        points = ((row['points'] if row else 0) or 0) + pending.points
+        level = row['level'] if row and not pending.points else calculate_level(points)
         next_level_pts = points_to_next_level(points or 0)
         rank = await self._get_user_rank(target.id)
         progress = _progress_bar(points or 0)
 
         rank_text = f'#{rank}' if rank else 'Unranked'
+        if leaderboard_cache.seeded:
+            standing = leaderboard_cache.standing(target.id, pending.points)
+            rank_text += f' (top {max(0.1, 100 - standing.percentile):.1f}%)'
+            if standing.points_to_next is not None:
+                rank_text += f' — {standing.points_to_next:,} XP to pass the next member'
 
         description = (
             f'**{target.display_name}**\n\n'
@@ -1033,9 +1018,10 @@ class RPGManager(commands.Cog):
                 str(interaction.user.id),
             )
             if user_row:
-                user_level = user_row['level'] or calculate_level(user_row['points'] or 0)
+                user_points = (user_row['points'] or 0) + xp_accumulator.pending_for(interaction.user.id).points
+                user_level = calculate_level(user_points)
                 rank_text = f'#{user_rank}' if user_rank else 'Unranked'
-                lines.append(f'\n**Your Rank**: {rank_text} — Level {user_level} | {user_row["points"] or 0:,} XP')
+                lines.append(f'\n**Your Rank**: {rank_text} — Level {user_level} | {user_points:,} XP')
 
             description = '\n'.join(lines)
 
@@ -1178,12 +1164,16 @@ class RPGManager(commands.Cog):
             await safe_send(interaction, embed=embed, ephemeral=True)
             return
 
-        points = row['points'] or 0
-        level = row['level'] or calculate_level(points)
-        messages = row['total_messages'] or 0
-        voice_min = row['total_voice_minutes'] or 0
-        commands_count = row['total_commands'] or 0
+        # Overlay activity that is still buffered in the accumulator
+        pending = xp_accumulator.pending_for(target.id)
+        points = (row['points'] or 0) + pending.points
+        level = calculate_level(points) if pending.points else row['level'] or calculate_level(points)
+        messages = (row['total_messages'] or 0) + pending.messages
+        voice_min = (row['total_voice_minutes'] or 0) + pending.voice_minutes
+        commands_count = (row['total_commands'] or 0) + pending.commands
         last_active = row.get('last_active')
+        if pending.last_active and (last_active is None or pending.last_active > last_active):
+            last_active = pending.last_active
 
         last_active_text = 'Never'
         if last_active:
@@ -1199,11 +1189,7 @@ class RPGManager(commands.Cog):
             else:
                 last_active_text = f'{delta.days}d ago'
 
-        activity_role = 'None'
-        for role_key, threshold in reversed(_ACTIVITY_ROLE_THRESHOLDS):
-            if points >= threshold:
-                activity_role = _ACTIVITY_ROLE_NAMES[role_key]
-                break
+        activity_role = role_for_points(points) or 'None'
 
         next_level_pts = points_to_next_level(points)
         progress = _progress_bar(points)
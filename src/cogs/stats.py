@@ -54,12 +54,12 @@ class Stats(commands.Cog):
     ) -> list[dict]:
         """Get top activity names aggregated across all users by total duration."""
         try:
+            # activity_name_totals is kept up by a trigger on user_activity_details
             rows = await db.fetch(
                 """
-                SELECT activity_name, SUM(duration_minutes) AS total_minutes
-                FROM user_activity_details
-                WHERE activity_type = $1
-                GROUP BY activity_name
+                SELECT activity_name, total_minutes
+                FROM activity_name_totals
+                WHERE activity_type = $1 AND total_minutes > 0
                 ORDER BY total_minutes DESC
                 LIMIT $2
                 """,
@@ -148,29 +148,34 @@ class Stats(commands.Cog):
             logger.debug('Failed to fetch top listeners: %s', exc)
             return []
 
-    async def _get_top_radio_listeners(self, limit: int = 10) -> list[dict]:
-        """Get top radio listeners from activity details."""
-        return await self._get_top_activity_details('radio', limit)
-
-    async def _get_top_coders(self, limit: int = 10) -> list[dict]:
-        """Get top coders by total coding minutes."""
+    async def _get_top_users_for_activity(self, activity_type: str, limit: int = 10) -> list[dict]:
+        """Get top users for an activity type by total duration across all activity names."""
         try:
+            # user_activity_type_totals is kept up by a trigger on user_activity_details
             rows = await db.fetch(
                 """
-                SELECT user_id, SUM(duration_minutes) AS total_minutes
-                FROM user_activity_details
-                WHERE activity_type = 'coding'
-                GROUP BY user_id
+                SELECT user_id, total_minutes
+                FROM user_activity_type_totals
+                WHERE activity_type = $1 AND total_minutes > 0
                 ORDER BY total_minutes DESC
-                LIMIT $1
+                LIMIT $2
                 """,
+                activity_type,
                 limit,
             )
             return [dict(row) for row in rows]
         except Exception as exc:
-            logger.debug('Failed to fetch top coders: %s', exc)
+            logger.debug('Failed to fetch top users for %s: %s', activity_type, exc)
             return []
 
+    async def _get_top_radio_listeners(self, limit: int = 10) -> list[dict]:
+        """Get top radio listeners by total radio minutes."""
+        return await self._get_top_users_for_activity('radio', limit)
+
+    async def _get_top_coders(self, limit: int = 10) -> list[dict]:
+        """Get top coders by total coding minutes."""
+        return await self._get_top_users_for_activity('coding', limit)
+
     # ============================================================
     # Formatting helpers
     # ============================================================
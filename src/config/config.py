@@ -33,6 +33,11 @@ STAFF_CHANNEL_ID = 1091908318324334704
 PUBLIC_BOT_COMMANDS_CHANNEL_ID = 1385610318889222226
 LOGS_CHANNEL_ID = 1329192112410857563
 
+# Embed footer state cache
+FOOTER_CACHE_SIZE = 5000  # users whose footer state is kept in memory
+FOOTER_CACHE_TTL = 3600  # seconds before a clean entry is reloaded from the database
+FOOTER_FLUSH_INTERVAL = 10  # seconds between the first footer change and its batched write
+
 # Notification settings
 NOTIFICATION_SQUAD_ROLE_NAME = 'notification squad'
 DAILY_BUMP_HOUR = 18  # 6 PM
@@ -54,6 +59,22 @@ POSTGRES_PASSWORD = os.getenv('POSTGRES_PASSWORD', 'example')
 DATABASE_URL = os.getenv('DATABASE_URL') or (
     f'postgresql://{POSTGRES_USER}:{POSTGRES_PASSWORD}@{POSTGRES_HOST}:{POSTGRES_PORT}/{POSTGRES_DB}'
 )
+DB_SLOW_QUERY_MS = int(os.getenv('DB_SLOW_QUERY_MS', '500'))  # queries at or above this are logged as slow
+DB_INTERACTIVE_POOL_MIN = 4  # connection slots the interactive (command) lane starts with
+DB_INTERACTIVE_POOL_MAX = 10  # and may grow to
+DB_BACKGROUND_POOL_MIN = 1  # same for the background lane (loops, scans, aggregations)
+DB_BACKGROUND_POOL_MAX = 4
+DB_LANE_GROW_WAIT_MS = 20  # average slot wait per window that makes a lane grow
+DB_LANE_REBALANCE_INTERVAL = 15  # seconds per lane sizing window
+DB_STATEMENT_CACHE_SIZE = int(os.getenv('DB_STATEMENT_CACHE_SIZE', '256'))  # asyncpg per-connection LRU of ad-hoc statements
+DB_BREAKER_FAILURE_THRESHOLD = 3  # consecutive connection failures that open the circuit
+DB_BREAKER_RESET_TIMEOUT = 30  # seconds an open circuit fails fast before probing again
+DB_BREAKER_HALF_OPEN_PROBES = 2  # concurrent probes allowed half-open (and successes needed to close)
+OUTBOX_PATH = os.getenv('OUTBOX_PATH', 'data/outbox.sqlite3')  # local spill file for writes during outages
+OUTBOX_MAX_BYTES = int(os.getenv('OUTBOX_MAX_BYTES', str(50 * 1024 * 1024)))  # disk budget; newer writes dropped past it
+OUTBOX_REPLAY_BATCH = 200  # outbox entries replayed per transaction after recovery
+USER_ID_CACHE_SIZE = 50000  # discord_id -> users.id identity map entries (prefilled at startup)
+USER_ID_NEGATIVE_TTL = 60  # seconds a 'no such user' lookup stays cached
 
 # Mentorship Configuration
 MENTORSHIP_CATEGORIES: list[str] = ['programming', 'design', 'career', 'devops', 'data_science', 'other']
@@ -75,7 +96,21 @@ RSS_FEEDS = {
     'dev_blogs': ['https://dev.to/feed', 'https://medium.com/feed/tag/programming', 'https://blog.github.com/all.atom'],
 }
 
-# API Rate Limits (requests per minute)
+# Shared HTTP client (RSS feeds and other outbound requests)
+HTTP_POOL_LIMIT = 100  # total pooled connections
+HTTP_POOL_LIMIT_PER_HOST = 4  # concurrent connections per host
+HTTP_DNS_CACHE_TTL = 300  # seconds DNS lookups are cached
+HTTP_USER_AGENT = 'VEKA-DiscordBot/1.0'
+RSS_FETCH_TIMEOUT = 10  # seconds per feed request
+RSS_FETCH_CONCURRENCY = 8  # feeds fetched in parallel during a refresh
+RSS_SEEN_CACHE_SIZE = 5000  # (feed_url, entry_id) keys remembered in-process to skip DB dedup
+RSS_PARSE_WORKERS = int(os.getenv('RSS_PARSE_WORKERS', '2'))  # feed parser processes; 0 parses in a thread
+
+# Event loop lag monitoring
+LOOP_LAG_INTERVAL = 0.5  # seconds between loop lag samples
+LOOP_LAG_WARN_MS = 250  # log a warning when one sample exceeds this
+
+# API Rate Limits (requests per minute; rss_fetch is applied per feed host)
 RATE_LIMITS = {'rss_fetch': 5, 'github_api': 60}
 
 # --- Radio Configuration ---
@@ -91,7 +126,22 @@ _leaderboard_channel = os.getenv('LEADERBOARD_CHANNEL_ID', '')
 LEADERBOARD_CHANNEL_ID = int(_leaderboard_channel) if _leaderboard_channel.strip().isdigit() else None
 LEADERBOARD_UPDATE_INTERVAL = 1800  # seconds (30 minutes)
 LEADERBOARD_TOP_N = 10
+LEADERBOARD_CACHE_SIZE = 100  # users kept per stat column in the in-process top-K cache
+LEADERBOARD_RECONCILE_INTERVAL = 3600  # seconds between cache reconciliations against the database
 MESSAGE_XP_COOLDOWN = 10  # seconds between message XP awards
+XP_FLUSH_INTERVAL = 15  # seconds between write-behind XP flushes
+XP_ACCUMULATOR_MAX_USERS = 10000  # distinct users buffered before new events are dropped
+ACTIVITY_LOG_FLUSH_INTERVAL = 30  # seconds between time-based user_activity_log COPY flushes
+ACTIVITY_LOG_BATCH_SIZE = 500  # buffered rows that trigger an immediate COPY flush
+ACTIVITY_LOG_MAX_BUFFERED = 50000  # buffered rows kept during an outage before the oldest are dropped
+ACTIVITY_LOG_MAX_BACKOFF = 60  # max seconds between COPY retries while the database is down
+ACTIVITY_LOG_PARTITIONS_AHEAD = 2  # monthly user_activity_log partitions created ahead of time
+ACTIVITY_LOG_RETENTION_MONTHS = 6  # months of raw activity log (and daily rollups) kept
+PRESENCE_COALESCE_WINDOW = 2.0  # seconds presence updates are coalesced per user before diffing
+PRESENCE_FLUSH_INTERVAL = 30  # seconds between batched activity-duration writes
+PRESENCE_CHECKPOINT_INTERVAL = 60  # seconds between banking running activity sessions and persisting open ones
+SESSION_RESUME_MAX_GAP = 900  # seconds since the last checkpoint within which a restart resumes open sessions
+PRESENCE_MAX_BUFFERED = 50000  # duration rows buffered (e.g. during an outage) before new ones are dropped
 
 RPG_POINTS: dict[str, int] = {
     'message': 1,
@@ -112,6 +162,8 @@ ACTIVITY_ROLES: dict[str, int] = {
     'active_star': 2000,  # role name: 'Active Star'
 }
 ACTIVITY_ROLE_INACTIVITY_DAYS = 14
+ACTIVITY_ROLE_EVAL_INTERVAL = 600  # seconds between incremental (dirty-set) activity role evaluations
+ACTIVITY_ROLE_RECONCILE_HOUR = 4  # IST hour (24h) of the nightly full activity role reconciliation
 
 # --- Main Server Configuration ---
 MAIN_GUILD_ID = 1088553066334273537
@@ -6,10 +6,14 @@ import nextcord
 from dotenv import load_dotenv
 from nextcord.ext import commands
 
-from src.config.config import BOT_PREFIX, DISCORD_TOKEN
+from src.config.config import BOT_PREFIX, DB_LANE_REBALANCE_INTERVAL, DISCORD_TOKEN
 from src.core.runtime_state import runtime_state
 from src.database.database import db
+from src.database.identity_map import user_ids
+from src.services.http_client import http_client
+from src.utils.footer import footer_state_cache
 from src.utils.logger import get_logger, setup_logging
+from src.utils.loop_lag import loop_lag_monitor
 from src.utils.safety import (
     DatabaseUnavailableError,
     ExternalRequestError,
@@ -59,6 +63,11 @@ def build_bot() -> commands.Bot:
 
 
 async def initialize_database() -> None:
+    try:
+        await db.outbox.open()
+    except Exception as exc:
+        logger.error('Write outbox unavailable: %s', exc, exc_info=True)
+
     try:
         await db.connect()
         runtime_state.db_available = True
@@ -75,6 +84,16 @@ async def initialize_database() -> None:
     except Exception as exc:
         logger.error('Database migrations failed (DB remains available): %s', exc, exc_info=True)
         runtime_state.degraded_features.append('migrations')
+        return
+
+    # Writes spilled during an outage before the last shutdown
+    db.outbox.start_replay(db)
+
+    try:
+        prefilled = await user_ids.prefill()
+        logger.info('Prefilled %d user ids', prefilled)
+    except Exception as exc:
+        logger.warning('User id prefill failed: %s', exc)
 
 
 def load_extensions(bot: commands.Bot, extensions: list[str]) -> None:
@@ -103,6 +122,8 @@ def configure_bot_events(bot: commands.Bot) -> None:
             await db.ping()
 
             # --- Ping succeeded ---
+            # An open circuit starts letting a few probe queries through
+            db.breaker.on_health_check(True)
             if not was_available:
                 # Recovering from outage — require N consecutive healthy pings
                 healthy_count = runtime_state.alert_state_cache.get('healthy_count', 0) + 1
@@ -110,6 +131,8 @@ def configure_bot_events(bot: commands.Bot) -> None:
 
                 if healthy_count >= CONSECUTIVE_HEALTHY_REQUIRED:
                     runtime_state.db_available = True
+                    db.breaker.reset()
+                    db.outbox.start_replay(db)
                     runtime_state.last_recovery_time = datetime.now(UTC)
                     runtime_state.alert_state_cache.pop('healthy_count', None)
                     if hasattr(bot, 'notifier'):
@@ -131,6 +154,8 @@ def configure_bot_events(bot: commands.Bot) -> None:
             else:
                 # Already healthy — reset counter
                 runtime_state.alert_state_cache.pop('healthy_count', None)
+                # Drain writes spilled during a short blip (or a paused replay)
+                db.outbox.start_replay(db)
 
         except DatabaseUnavailableError:
             # --- Ping failed ---
@@ -140,10 +165,12 @@ def configure_bot_events(bot: commands.Bot) -> None:
             try:
                 await db.reconnect()
                 await db.ping()  # retry on fresh pool
+                db.breaker.on_health_check(True)
                 logger.info('Database recovered immediately via reconnect.')
                 return  # transient blip, no alert
-            except DatabaseUnavailableError:
-                pass  # still down
+            except Exception:
+                # Still down (reconnect can also fail with raw connect errors): keep (or start) failing fast until the next check
+                db.breaker.on_health_check(False)
 
             if was_available:
                 runtime_state.db_available = False
@@ -157,6 +184,11 @@ def configure_bot_events(bot: commands.Bot) -> None:
                     )
                 logger.error('Database connection lost. Operating in degraded mode.')
 
+    @tasks.loop(seconds=DB_LANE_REBALANCE_INTERVAL)
+    async def db_lane_rebalance():
+        # Grow lanes whose queries waited for a connection slot, shrink idle ones
+        db.rebalance_lanes()
+
     @bot.event
     async def on_ready():
         if getattr(bot, '_veka_ready', False):
@@ -176,6 +208,8 @@ def configure_bot_events(bot: commands.Bot) -> None:
         await bot.notifier.send_startup_summary()  # type: ignore[attr-defined]
 
         db_health_check.start()
+        db_lane_rebalance.start()
+        loop_lag_monitor.start()
 
         logger.info(f'{bot.user} is ready. DB available={runtime_state.db_available}')
 
@@ -186,11 +220,17 @@ def configure_bot_events(bot: commands.Bot) -> None:
 
     @bot.event
     async def on_disconnect():
+        # Write back footer state changed since the last batched flush before the pool goes away
+        await footer_state_cache.flush()
         try:
             await db.close()
             logger.info('Database connection closed on disconnect')
         except Exception as exc:
             logger.error(f'Error closing database on disconnect: {exc}')
+        try:
+            await http_client.close()
+        except Exception as exc:
+            logger.error(f'Error closing shared HTTP session on disconnect: {exc}')
 
     @bot.event
     async def on_command_error(ctx, error):
@@ -47,5 +47,10 @@ class RuntimeState:
     last_recovery_time: datetime | None = None
     alert_state_cache: dict = field(default_factory=dict)
 
+    # Event loop lag (see src/utils/loop_lag.py)
+    loop_lag_ms: float = 0.0
+    loop_lag_avg_ms: float = 0.0
+    loop_lag_max_ms: float = 0.0
+
 
 runtime_state = RuntimeState()
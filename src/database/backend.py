@@ -0,0 +1,29 @@
+"""
+The query surface cogs and services depend on.
+
+``Database`` (pooled) and ``UnitOfWork`` (one pinned connection) both satisfy
+``DatabaseBackend``; helpers that accept an optional executor (``conn=``)
+should be typed against this protocol rather than a concrete class, so the
+same code runs against either, or against any other backend that provides
+these methods (see ``src/database/ephemeral.py`` for running everything
+against a throwaway local PostgreSQL).
+"""
+
+from __future__ import annotations
+
+from typing import Any, Protocol, runtime_checkable
+
+
+@runtime_checkable
+class DatabaseBackend(Protocol):
+    async def fetch_one(self, query: str, *args: Any) -> Any: ...
+
+    async def fetchrow(self, query: str, *args: Any) -> Any: ...
+
+    async def fetch(self, query: str, *args: Any) -> list[Any]: ...
+
+    async def fetchval(self, query: str, *args: Any) -> Any: ...
+
+    async def execute(self, query: str, *args: Any) -> str: ...
+
+    async def execute_many(self, query: str, args_list: list[tuple[Any, ...]]) -> None: ...
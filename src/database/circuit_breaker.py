@@ -0,0 +1,134 @@
+"""
+Circuit breaker for the Database wrapper.
+
+While PostgreSQL is down every caller would otherwise wait on a pool acquire /
+connect timeout, piling up pending tasks (XP awards, footers, feed dedupe).
+The breaker short-circuits those calls instead:
+
+- ``closed``: calls go through; ``failure_threshold`` consecutive connection
+  failures open the circuit.
+- ``open``: calls raise ``CircuitOpenError`` immediately. After
+  ``reset_timeout`` seconds, or as soon as the health check sees a successful
+  ping, the circuit moves to half-open.
+- ``half_open``: at most ``max_probes`` calls run concurrently as probes; the
+  rest are still rejected. ``max_probes`` successful probes close the circuit,
+  any failed probe opens it again.
+
+Only connection-level failures count; a query error means the server answered.
+"""
+
+from __future__ import annotations
+
+import logging
+import time
+
+from src.config.config import DB_BREAKER_FAILURE_THRESHOLD, DB_BREAKER_HALF_OPEN_PROBES, DB_BREAKER_RESET_TIMEOUT
+from src.utils.safety import DatabaseUnavailableError
+
+logger = logging.getLogger('VEKA.database')
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitOpenError(DatabaseUnavailableError):
+    """Raised without touching the pool while the circuit is open."""
+
+
+class CircuitBreaker:
+    """Closed/open/half-open breaker guarding pool acquisitions."""
+
+    def __init__(
+        self,
+        failure_threshold: int = DB_BREAKER_FAILURE_THRESHOLD,
+        reset_timeout: float = DB_BREAKER_RESET_TIMEOUT,
+        max_probes: int = DB_BREAKER_HALF_OPEN_PROBES,
+    ):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.max_probes = max_probes
+
+        self.state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probes_in_flight = 0
+        self._probe_successes = 0
+        self.stats: dict[str, int] = {'opened': 0, 'rejected': 0, 'probes': 0}
+
+    def before_call(self) -> bool:
+        """
+        Admit or reject a call. Returns True when the call is a half-open probe,
+        whose outcome must be reported back via ``record``.
+        """
+        if self.state == CLOSED:
+            return False
+
+        if self.state == OPEN:
+            if time.monotonic() - self._opened_at < self.reset_timeout:
+                self.stats['rejected'] += 1
+                raise CircuitOpenError('Database unavailable (circuit open)')
+            self._transition(HALF_OPEN)
+
+        if self._probes_in_flight >= self.max_probes:
+            self.stats['rejected'] += 1
+            raise CircuitOpenError('Database unavailable (circuit half-open, probe limit reached)')
+        self._probes_in_flight += 1
+        self.stats['probes'] += 1
+        return True
+
+    def record(self, reachable: bool | None, probe: bool = False) -> None:
+        """
+        Report a call outcome: ``True`` if the server answered (even with a query
+        error), ``False`` on a connection failure, ``None`` if the call was
+        abandoned (cancelled) before either happened.
+        """
+        if probe:
+            self._probes_in_flight = max(0, self._probes_in_flight - 1)
+        if reachable is None:
+            return
+
+        if self.state == CLOSED:
+            self._failures = 0 if reachable else self._failures + 1
+            if self._failures >= self.failure_threshold:
+                self._transition(OPEN)
+        elif self.state == HALF_OPEN and probe:
+            if not reachable:
+                self._transition(OPEN)
+            else:
+                self._probe_successes += 1
+                if self._probe_successes >= self.max_probes:
+                    self._transition(CLOSED)
+
+    def on_health_check(self, healthy: bool) -> None:
+        """Feed in the periodic ping result: a failed ping opens, a good one starts probing."""
+        if not healthy:
+            if self.state != OPEN:
+                self._transition(OPEN)
+            else:
+                # Still down: push the next half-open attempt out again
+                self._opened_at = time.monotonic()
+        elif self.state == OPEN:
+            self._transition(HALF_OPEN)
+
+    def reset(self) -> None:
+        """Force the circuit closed (e.g. after a fresh pool was established)."""
+        if self.state != CLOSED:
+            self._transition(CLOSED)
+
+    def _transition(self, state: str) -> None:
+        previous, self.state = self.state, state
+        self._failures = 0
+        self._probe_successes = 0
+        if state == OPEN:
+            self._opened_at = time.monotonic()
+            self.stats['opened'] += 1
+            logger.warning('Database circuit %s -> open; failing fast for %.0fs', previous, self.reset_timeout)
+        elif state == HALF_OPEN:
+            logger.info('Database circuit half-open; allowing up to %d probe(s)', self.max_probes)
+        else:
+            self._probes_in_flight = 0
+            logger.info('Database circuit closed')
+
+    def snapshot(self) -> dict:
+        return {'state': self.state, **self.stats}
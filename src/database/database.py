@@ -1,40 +1,171 @@
 import logging
+import time
 import urllib.parse
+from abc import ABC, abstractmethod
+from collections.abc import AsyncIterator, Awaitable, Callable
+from contextlib import AbstractAsyncContextManager, AbstractContextManager, asynccontextmanager
 from typing import Any
 
 import asyncpg
 
-from src.config.config import DATABASE_URL
+from src.config.config import (
+    DATABASE_URL,
+    DB_BACKGROUND_POOL_MAX,
+    DB_BACKGROUND_POOL_MIN,
+    DB_INTERACTIVE_POOL_MAX,
+    DB_INTERACTIVE_POOL_MIN,
+    DB_STATEMENT_CACHE_SIZE,
+)
 from src.core.runtime_state import runtime_state
-from src.database.migrations import MIGRATIONS_TABLE, list_migration_files
+from src.database.circuit_breaker import CLOSED, CircuitBreaker
+from src.database.instrumentation import caller_module, query_stats
+from src.database.lanes import BACKGROUND, INTERACTIVE, PoolLane, current_lane, use_lane
+from src.database.migrations import apply_migrations
+from src.database.outbox import Outbox, is_connection_failure
+from src.database.statements import PreparedConnection, run_statement, statements
 from src.utils.safety import DatabaseUnavailableError
 
 logger = logging.getLogger('VEKA.database')
 
 
-class Database:
+def _status_row_count(status: Any) -> int:
+    """Row count from a command status such as ``UPDATE 3`` or ``COPY 500``."""
+    try:
+        return int(str(status).rsplit(' ', 1)[-1])
+    except ValueError:
+        return 0
+
+
+class QueryMethods(ABC):
+    """
+    The fetch/execute surface shared by ``Database`` (pooled) and ``UnitOfWork``
+    (one pinned connection); implements ``src.database.backend.DatabaseBackend``.
+    """
+
+    @abstractmethod
+    async def _run(
+        self,
+        query: str,
+        operation: Callable[[asyncpg.Connection], Awaitable[Any]],
+        *,
+        describe: Callable[[], str],
+        row_count: Callable[[Any], int],
+    ) -> Any:
+        """Run ``operation`` on a connection, with timing, logging and error mapping."""
+
+    async def fetch_one(self, query: str, *args: Any) -> asyncpg.Record | None:
+        return await self._run(
+            query,
+            lambda connection: run_statement(connection, query, 'fetchrow', *args),
+            describe=lambda: f'query={query} | args={args}',
+            row_count=lambda row: 0 if row is None else 1,
+        )
+
+    async def fetchrow(self, query: str, *args: Any) -> asyncpg.Record | None:
+        return await self.fetch_one(query, *args)
+
+    async def fetch(self, query: str, *args: Any):
+        return await self._run(
+            query,
+            lambda connection: run_statement(connection, query, 'fetch', *args),
+            describe=lambda: f'query={query} | args={args}',
+            row_count=len,
+        )
+
+    async def fetch_many(self, query: str, *args: Any):
+        return await self.fetch(query, *args)
+
+    async def fetchval(self, query: str, *args: Any) -> Any:
+        return await self._run(
+            query,
+            lambda connection: run_statement(connection, query, 'fetchval', *args),
+            describe=lambda: f'query={query} | args={args}',
+            row_count=lambda value: 0 if value is None else 1,
+        )
+
+    async def execute(self, query: str, *args: Any) -> str:
+        return await self._run(
+            query,
+            lambda connection: run_statement(connection, query, 'execute', *args),
+            describe=lambda: f'query={query} | args={args}',
+            row_count=_status_row_count,
+        )
+
+    async def execute_many(self, query: str, args_list: list[tuple[Any, ...]]) -> None:
+        await self._run(
+            query,
+            lambda connection: run_statement(connection, query, 'executemany', args_list),
+            describe=lambda: f'query={query} | args_list={args_list}',
+            row_count=lambda _result: len(args_list),
+        )
+
+    async def copy_records(self, table: str, records: list[tuple[Any, ...]], columns: list[str]) -> str:
+        """Bulk-load rows into a table with COPY (``copy_records_to_table``)."""
+        return await self._run(
+            f'COPY {table} ({", ".join(columns)}) FROM STDIN',
+            lambda connection: connection.copy_records_to_table(table, records=records, columns=columns),
+            describe=lambda: f'copy table={table} | rows={len(records)}',
+            row_count=_status_row_count,
+        )
+
+
+class UnitOfWork(QueryMethods):
+    """
+    Queries pinned to a single pooled connection, optionally inside a transaction.
+
+    Obtain one with ``db.unit_of_work()`` or ``db.transaction()``; it exposes the
+    same methods as ``Database`` and costs one pool acquisition for the whole flow.
+    """
+
+    def __init__(self, database: 'Database', connection: asyncpg.Connection):
+        self._database = database
+        self.connection = connection
+
+    async def _run(self, query, operation, *, describe, row_count) -> Any:
+        return await self._database._run(
+            query, operation, describe=describe, row_count=row_count, connection=self.connection
+        )
+
+
+class Database(QueryMethods):
     """PostgreSQL database connection manager using asyncpg."""
 
     def __init__(self) -> None:
         self.pool: asyncpg.Pool | None = None
-
-    async def connect(self) -> None:
+        # Pool acquisitions since startup (one per query, or one per unit of work)
+        self.acquisitions = 0
+        # Fails calls fast while the database is known to be down
+        self.breaker = CircuitBreaker()
+        # Local spill file for opted-in writes made while the database is unreachable
+        self.outbox = Outbox()
+        # Per-lane caps on pooled connections; see src/database/lanes.py
+        self.lanes: dict[str, PoolLane] = {
+            INTERACTIVE: PoolLane(INTERACTIVE, DB_INTERACTIVE_POOL_MIN, DB_INTERACTIVE_POOL_MAX),
+            BACKGROUND: PoolLane(BACKGROUND, DB_BACKGROUND_POOL_MIN, DB_BACKGROUND_POOL_MAX),
+        }
+
+    async def connect(self, dsn: str | None = None) -> None:
+        """Create the pool for ``dsn`` (default ``DATABASE_URL``)."""
         if self.pool is not None:
             return
 
         # Strip libpq-only keepalive params — asyncpg passes unknown DSN query
         # params as PostgreSQL server_settings, causing the server to reject them.
         _libpq_params = {'keepalives', 'tcp_keepalives_idle', 'tcp_keepalives_interval', 'tcp_keepalives_count'}
-        parsed = urllib.parse.urlparse(DATABASE_URL)
+        parsed = urllib.parse.urlparse(dsn or DATABASE_URL)
         query = {k: v for k, v in urllib.parse.parse_qsl(parsed.query) if k not in _libpq_params}
         parsed = parsed._replace(query=urllib.parse.urlencode(query))
-        dsn = urllib.parse.urlunparse(parsed)
-
         self.pool = await asyncpg.create_pool(
-            dsn,
+            urllib.parse.urlunparse(parsed),
             min_size=1,
-            max_size=10,
+            # Every lane can reach its maximum at once; the lanes enforce the split
+            max_size=sum(lane.max_size for lane in self.lanes.values()),
             max_inactive_connection_lifetime=60.0,
+            # Registered hot statements are prepared once per connection (src/database/statements.py);
+            # the LRU below only holds ad-hoc query texts
+            connection_class=PreparedConnection,
+            init=statements.prepare_all,
+            statement_cache_size=DB_STATEMENT_CACHE_SIZE,
         )
         logger.info('Database connection pool established')
 
@@ -74,136 +205,210 @@ class Database:
             logger.error('Database ping failed: %s', exc, exc_info=True)
             raise DatabaseUnavailableError('Database ping error') from exc
 
-    async def fetch_one(self, query: str, *args: Any) -> asyncpg.Record | None:
-        if self.pool is None:
-            runtime_state.db_available = False
-            raise DatabaseUnavailableError('Database pool is not initialized')
-
+    async def _run(
+        self,
+        query: str,
+        operation: Callable[[asyncpg.Connection], Awaitable[Any]],
+        *,
+        describe: Callable[[], str],
+        row_count: Callable[[Any], int],
+        connection: asyncpg.Connection | None = None,
+    ) -> Any:
+        """
+        Run ``operation`` on a pooled connection (or the given pinned one) and
+        record timings under the query fingerprint. Pool acquisitions go
+        through the circuit breaker, so while it is open this raises
+        ``CircuitOpenError`` without waiting on the pool.
+        """
+        if connection is None:
+            if self.pool is None:
+                runtime_state.db_available = False
+                raise DatabaseUnavailableError('Database pool is not initialized')
+            probe = self.breaker.before_call()
+        else:
+            probe = False
+
+        source = caller_module()
+        started = time.perf_counter()
+        acquired = started
+        reachable: bool | None = None
         try:
-            async with self.pool.acquire() as connection:
-                return await connection.fetchrow(query, *args)
-        except (asyncpg.ConnectionFailureError, asyncpg.InterfaceError) as exc:
+            if connection is not None:
+                result = await operation(connection)
+            else:
+                self.acquisitions += 1
+                lane = self.lanes[current_lane.get()]
+                await lane.acquire()
+                held_from = time.perf_counter()
+                try:
+                    async with self.pool.acquire() as pooled:  # type: ignore[union-attr]
+                        acquired = time.perf_counter()
+                        result = await operation(pooled)
+                finally:
+                    lane.release(time.perf_counter() - held_from)
+            reachable = True
+        except (asyncpg.ConnectionFailureError, asyncpg.InterfaceError, OSError) as exc:
+            reachable = False
+            self._record(query, started, acquired, source=source, error=True)
             runtime_state.db_available = False
             runtime_state.last_db_error = f'{type(exc).__name__}: {exc}'
-            logger.error('Database connection error: %s | query=%s | args=%s', exc, query, args, exc_info=True)
+            logger.error('Database connection error: %s | %s', exc, describe(), exc_info=True)
             raise DatabaseUnavailableError('Database unavailable') from exc
         except asyncpg.PostgresError as exc:
+            reachable = True
+            self._record(query, started, acquired, source=source, error=True)
             runtime_state.last_db_error = f'{type(exc).__name__}: {exc}'
-            logger.error('Database query error: %s | query=%s | args=%s', exc, query, args, exc_info=True)
+            logger.error('Database query error: %s | %s', exc, describe(), exc_info=True)
             raise DatabaseUnavailableError('Database query failed') from exc
+        finally:
+            self.breaker.record(reachable, probe)
 
-    async def fetchrow(self, query: str, *args: Any) -> asyncpg.Record | None:
-        return await self.fetch_one(query, *args)
+        self._record(query, started, acquired, rows=row_count(result), source=source)
+        return result
 
-    async def fetch(self, query: str, *args: Any):
-        if self.pool is None:
-            runtime_state.db_available = False
-            raise DatabaseUnavailableError('Database pool is not initialized')
+    @property
+    def deferring_writes(self) -> bool:
+        """True while outbox writes go to the local spill file (circuit not closed, or a backlog to replay)."""
+        return self.breaker.state != CLOSED or self.outbox.pending > 0
 
+    async def execute(self, query: str, *args: Any, outbox: bool = False) -> str:
+        """
+        Execute a statement. With ``outbox=True`` the write is spilled to the local
+        outbox instead of failing while the database is unreachable, and replayed
+        (in order, exactly once) after recovery. Only opt in writes that stay
+        correct when applied later.
+        """
+        if outbox and self.deferring_writes:
+            return await self._spill(query, args, many=False)
         try:
-            async with self.pool.acquire() as connection:
-                return await connection.fetch(query, *args)
-        except (asyncpg.ConnectionFailureError, asyncpg.InterfaceError) as exc:
-            runtime_state.db_available = False
-            runtime_state.last_db_error = f'{type(exc).__name__}: {exc}'
-            logger.error('Database connection error: %s | query=%s | args=%s', exc, query, args, exc_info=True)
-            raise DatabaseUnavailableError('Database unavailable') from exc
-        except asyncpg.PostgresError as exc:
-            runtime_state.last_db_error = f'{type(exc).__name__}: {exc}'
-            logger.error('Database query error: %s | query=%s | args=%s', exc, query, args, exc_info=True)
-            raise DatabaseUnavailableError('Database query failed') from exc
+            return await super().execute(query, *args)
+        except DatabaseUnavailableError as exc:
+            if not outbox or not is_connection_failure(exc):
+                raise
+            return await self._spill(query, args, many=False)
+
+    async def execute_many(self, query: str, args_list: list[tuple[Any, ...]], outbox: bool = False) -> None:
+        """``executemany``; see ``execute`` for ``outbox``."""
+        if outbox and self.deferring_writes:
+            await self._spill(query, args_list, many=True)
+            return
+        try:
+            await super().execute_many(query, args_list)
+        except DatabaseUnavailableError as exc:
+            if not outbox or not is_connection_failure(exc):
+                raise
+            await self._spill(query, args_list, many=True)
+
+    async def _spill(self, query: str, args: Any, *, many: bool) -> str:
+        if not await self.outbox.append(query, args, many=many):
+            raise DatabaseUnavailableError('Database unavailable (write outbox full)')
+        return 'OUTBOX 1'
+
+    @staticmethod
+    def _record(
+        query: str, started: float, acquired: float, *, rows: int = 0, source: str, error: bool = False
+    ) -> None:
+        finished = time.perf_counter()
+        query_stats.record(
+            query,
+            acquire_s=acquired - started,
+            execute_s=finished - acquired,
+            rows=rows,
+            source=source,
+            error=error,
+        )
 
-    async def fetch_many(self, query: str, *args: Any):
-        return await self.fetch(query, *args)
+    @asynccontextmanager
+    async def unit_of_work(self, transactional: bool = False) -> AsyncIterator[UnitOfWork]:
+        """
+        Pin one pooled connection for a multi-step flow.
 
-    async def fetchval(self, query: str, *args: Any) -> Any:
+        With ``transactional=True`` the flow runs in a transaction that commits
+        when the block exits normally and rolls back if it raises.
+        """
         if self.pool is None:
             runtime_state.db_available = False
             raise DatabaseUnavailableError('Database pool is not initialized')
 
+        probe = self.breaker.before_call()
+        self.acquisitions += 1
+        lane = self.lanes[current_lane.get()]
         try:
-            async with self.pool.acquire() as connection:
-                return await connection.fetchval(query, *args)
-        except (asyncpg.ConnectionFailureError, asyncpg.InterfaceError) as exc:
-            runtime_state.db_available = False
-            runtime_state.last_db_error = f'{type(exc).__name__}: {exc}'
-            logger.error('Database connection error: %s | query=%s | args=%s', exc, query, args, exc_info=True)
-            raise DatabaseUnavailableError('Database unavailable') from exc
-        except asyncpg.PostgresError as exc:
-            runtime_state.last_db_error = f'{type(exc).__name__}: {exc}'
-            logger.error('Database query error: %s | query=%s | args=%s', exc, query, args, exc_info=True)
-            raise DatabaseUnavailableError('Database query failed') from exc
-
-    async def execute(self, query: str, *args: Any) -> str:
-        if self.pool is None:
-            runtime_state.db_available = False
-            raise DatabaseUnavailableError('Database pool is not initialized')
-
+            await lane.acquire()
+        except BaseException:
+            self.breaker.record(None, probe)
+            raise
+        held_from = time.perf_counter()
         try:
-            async with self.pool.acquire() as connection:
-                return await connection.execute(query, *args)
-        except (asyncpg.ConnectionFailureError, asyncpg.InterfaceError) as exc:
+            connection = await self.pool.acquire()
+        except (asyncpg.ConnectionFailureError, asyncpg.InterfaceError, OSError) as exc:
+            lane.release(time.perf_counter() - held_from)
+            self.breaker.record(False, probe)
             runtime_state.db_available = False
             runtime_state.last_db_error = f'{type(exc).__name__}: {exc}'
-            logger.error('Database connection error: %s | query=%s | args=%s', exc, query, args, exc_info=True)
+            logger.error('Database connection error: %s | unit of work acquire', exc, exc_info=True)
             raise DatabaseUnavailableError('Database unavailable') from exc
-        except asyncpg.PostgresError as exc:
-            runtime_state.last_db_error = f'{type(exc).__name__}: {exc}'
-            logger.error('Database query error: %s | query=%s | args=%s', exc, query, args, exc_info=True)
-            raise DatabaseUnavailableError('Database query failed') from exc
-
-    async def execute_many(self, query: str, args_list: list[tuple[Any, ...]]) -> None:
-        if self.pool is None:
-            runtime_state.db_available = False
-            raise DatabaseUnavailableError('Database pool is not initialized')
+        except BaseException:
+            lane.release(time.perf_counter() - held_from)
+            self.breaker.record(None, probe)
+            raise
+        self.breaker.record(True, probe)
 
         try:
-            async with self.pool.acquire() as connection:
-                await connection.executemany(query, args_list)
-        except (asyncpg.ConnectionFailureError, asyncpg.InterfaceError) as exc:
+            if transactional:
+                async with connection.transaction():
+                    yield UnitOfWork(self, connection)
+            else:
+                yield UnitOfWork(self, connection)
+        except (asyncpg.ConnectionFailureError, asyncpg.InterfaceError, OSError) as exc:
             runtime_state.db_available = False
             runtime_state.last_db_error = f'{type(exc).__name__}: {exc}'
-            logger.error(
-                'Database connection error: %s | query=%s | args_list=%s', exc, query, args_list, exc_info=True
-            )
+            logger.error('Database connection error: %s | transaction commit', exc, exc_info=True)
             raise DatabaseUnavailableError('Database unavailable') from exc
         except asyncpg.PostgresError as exc:
             runtime_state.last_db_error = f'{type(exc).__name__}: {exc}'
-            logger.error('Database query error: %s | query=%s | args_list=%s', exc, query, args_list, exc_info=True)
-            raise DatabaseUnavailableError('Database query failed') from exc
+            logger.error('Database query error: %s | transaction commit', exc, exc_info=True)
+            raise DatabaseUnavailableError('Database transaction failed') from exc
+        finally:
+            await self.pool.release(connection)
+            lane.release(time.perf_counter() - held_from)
+
+    def transaction(self) -> AbstractAsyncContextManager[UnitOfWork]:
+        """``async with db.transaction() as tx:`` — a transactional unit of work."""
+        return self.unit_of_work(transactional=True)
+
+    def lane(self, name: str) -> AbstractContextManager[None]:
+        """``with db.lane(BACKGROUND):`` — run the queries in the block in another lane."""
+        if name not in self.lanes:
+            raise ValueError(f'Unknown database lane: {name}')
+        return use_lane(name)
+
+    def rebalance_lanes(self) -> None:
+        """Close each lane's sizing window, growing or shrinking its connection limit."""
+        for lane in self.lanes.values():
+            lane.rebalance()
+
+    def get_lane_stats(self) -> list[dict]:
+        return [lane.snapshot() for lane in self.lanes.values()]
+
+    def get_query_stats(self, limit: int = 5, key: str = 'total_ms') -> list[dict]:
+        """Top query fingerprints by ``key``; see ``src.database.instrumentation.QueryStats``."""
+        return query_stats.top(limit, key)
 
     async def run_migrations(self) -> None:
         if self.pool is None:
             runtime_state.db_available = False
             raise DatabaseUnavailableError('Database pool is not initialized')
 
-        migration_files = list_migration_files()
-        if not migration_files:
-            logger.info('No migration files found')
-            return
-
+        started = time.perf_counter()
         async with self.pool.acquire() as connection:
-            await connection.execute(
-                f'CREATE TABLE IF NOT EXISTS {MIGRATIONS_TABLE} ('
-                'filename TEXT PRIMARY KEY, applied_at TIMESTAMP DEFAULT NOW()'
-                ')'
-            )
-            existing = {row['filename'] for row in await connection.fetch(f'SELECT filename FROM {MIGRATIONS_TABLE}')}
-
-            for migration_path in migration_files:
-                migration_name = migration_path.name
-                if migration_name in existing:
-                    continue
-
-                sql = migration_path.read_text()
-                async with connection.transaction():
-                    logger.info('Applying migration: %s', migration_name)
-                    await connection.execute(sql)
-                    await connection.execute(
-                        f'INSERT INTO {MIGRATIONS_TABLE} (filename) VALUES ($1)',
-                        migration_name,
-                    )
-                    logger.info('Applied migration: %s', migration_name)
+            report = await apply_migrations(connection)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+
+        if report.fast_path:
+            logger.info('Schema up to date (manifest digest matched) in %.1fms', elapsed_ms)
+        else:
+            logger.info('Migrations checked in %.1fms: %d applied', elapsed_ms, len(report.applied))
 
 
 # Global database instance
@@ -211,30 +416,6 @@ class Database:
 db = Database()
 
 
-async def get_user(discord_id: str):
-    user = await db.fetch_one('SELECT * FROM users WHERE discord_id = $1', discord_id)
-    if user:
-        return user
-
-    return await create_user(discord_id)
-
-
-async def create_user(discord_id: str):
-    return await db.fetch_one(
-        """
-        INSERT INTO users (discord_id)
-        VALUES ($1)
-        ON CONFLICT (discord_id) DO UPDATE SET updated_at = NOW()
-        RETURNING *
-        """,
-        discord_id,
-    )
-
-
-async def get_or_create_user(discord_id: str):
-    return await get_user(discord_id)
-
-
 async def update_user_points(discord_id: str, points: int) -> None:
     await db.execute(
         'UPDATE users SET points = points + $1 WHERE discord_id = $2',
@@ -0,0 +1,182 @@
+"""
+Throwaway local PostgreSQL for benchmarks and offline runs.
+
+``EphemeralPostgres`` runs ``initdb`` into a temporary directory and starts a
+private server listening only on a Unix socket in that directory, with
+durability turned off (``fsync``, ``synchronous_commit``, ``full_page_writes``).
+Nothing touches the network or an existing cluster, and everything is deleted
+on exit. The real server keeps the SQL dialect, migrations, triggers and
+partitions identical to production, which a translation layer onto another
+engine could not.
+
+Needs the PostgreSQL server binaries (``initdb``, ``pg_ctl``). They are looked
+up in ``$PG_BIN``, then ``pg_config --bindir``, then ``PATH`` and the Debian
+``/usr/lib/postgresql/<version>/bin`` layout. PostgreSQL refuses to run as root,
+so run this as a regular user.
+
+Usage::
+
+    async with offline_database():          # global ``db`` connected and migrated
+        await cog_or_service_under_load()
+
+    python -m src.database.ephemeral        # start one, print its DSN, stop on Ctrl-C
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import shutil
+import subprocess
+import tempfile
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from pathlib import Path
+
+import asyncpg
+
+from src.database.database import db
+
+logger = logging.getLogger('VEKA.database')
+
+_DATABASE_NAME = 'veka_bot'
+_SUPERUSER = 'veka'
+# Durability off: the cluster is discarded on exit anyway
+_SERVER_OPTIONS = (
+    "-c listen_addresses='' -c fsync=off -c synchronous_commit=off -c full_page_writes=off "
+    '-c max_connections=100 -k {socket_dir}'
+)
+
+
+def find_postgres_bin() -> Path:
+    """Directory holding ``initdb`` and ``pg_ctl``."""
+    candidates: list[Path] = []
+    if os.environ.get('PG_BIN'):
+        candidates.append(Path(os.environ['PG_BIN']))
+    pg_config = shutil.which('pg_config')
+    if pg_config:
+        result = subprocess.run([pg_config, '--bindir'], capture_output=True, text=True, check=False)
+        if result.returncode == 0:
+            candidates.append(Path(result.stdout.strip()))
+    initdb = shutil.which('initdb')
+    if initdb:
+        candidates.append(Path(initdb).parent)
+    candidates.extend(sorted(Path('/usr/lib/postgresql').glob('*/bin'), reverse=True))
+
+    for candidate in candidates:
+        if (candidate / 'initdb').exists() and (candidate / 'pg_ctl').exists():
+            return candidate
+    raise RuntimeError('PostgreSQL server binaries (initdb, pg_ctl) not found; install them or set PG_BIN')
+
+
+class EphemeralPostgres:
+    """A private PostgreSQL cluster in a temporary directory, reachable only over its Unix socket."""
+
+    def __init__(self, bin_dir: Path | None = None):
+        self.bin_dir = bin_dir
+        self.root: Path | None = None
+        self.dsn = ''
+
+    @property
+    def _data_dir(self) -> Path:
+        return self.root / 'data'  # type: ignore[operator]
+
+    async def _run(self, *command: str) -> None:
+        process = await asyncio.create_subprocess_exec(
+            *command, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.STDOUT
+        )
+        output, _ = await process.communicate()
+        if process.returncode != 0:
+            raise RuntimeError(f'{Path(command[0]).name} failed ({process.returncode}): {output.decode().strip()}')
+
+    async def start(self) -> str:
+        """Create and start the cluster; returns a DSN for the ``veka_bot`` database."""
+        if os.name == 'posix' and os.geteuid() == 0:
+            raise RuntimeError('PostgreSQL cannot run as root; start the ephemeral database as a regular user')
+        bin_dir = self.bin_dir or find_postgres_bin()
+        self.root = Path(tempfile.mkdtemp(prefix='veka-pg-'))
+        try:
+            await self._run(
+                str(bin_dir / 'initdb'),
+                '-D',
+                str(self._data_dir),
+                '-U',
+                _SUPERUSER,
+                '--auth=trust',
+                '--encoding=UTF8',
+                '--no-sync',
+            )
+            await self._run(
+                str(bin_dir / 'pg_ctl'),
+                '-D',
+                str(self._data_dir),
+                '-l',
+                str(self.root / 'server.log'),
+                '-o',
+                _SERVER_OPTIONS.format(socket_dir=self.root),
+                '-w',
+                'start',
+            )
+            admin_dsn = f'postgresql://{_SUPERUSER}@/postgres?host={self.root}'
+            connection = await asyncpg.connect(admin_dsn)
+            try:
+                await connection.execute(f'CREATE DATABASE {_DATABASE_NAME}')
+            finally:
+                await connection.close()
+        except BaseException:
+            await self.stop()
+            raise
+
+        self.dsn = f'postgresql://{_SUPERUSER}@/{_DATABASE_NAME}?host={self.root}'
+        logger.info('Ephemeral PostgreSQL started in %s', self.root)
+        return self.dsn
+
+    async def stop(self) -> None:
+        """Stop the server (fast shutdown) and delete the cluster."""
+        if self.root is None:
+            return
+        if (self._data_dir / 'postmaster.pid').exists():
+            bin_dir = self.bin_dir or find_postgres_bin()
+            try:
+                await self._run(str(bin_dir / 'pg_ctl'), '-D', str(self._data_dir), '-m', 'fast', '-w', 'stop')
+            except RuntimeError as exc:
+                logger.warning('Ephemeral PostgreSQL did not stop cleanly: %s', exc)
+        shutil.rmtree(self.root, ignore_errors=True)
+        self.root = None
+        self.dsn = ''
+
+    async def __aenter__(self) -> EphemeralPostgres:
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc_info: object) -> None:
+        await self.stop()
+
+
+@asynccontextmanager
+async def offline_database(migrate: bool = True) -> AsyncIterator[EphemeralPostgres]:
+    """Point the global ``db`` at a fresh ephemeral cluster (migrated by default) for the block."""
+    async with EphemeralPostgres() as server:
+        await db.connect(server.dsn)
+        try:
+            if migrate:
+                await db.run_migrations()
+            yield server
+        finally:
+            await db.close()
+
+
+async def _serve() -> None:
+    async with offline_database() as server:
+        print(f'DATABASE_URL={server.dsn}')
+        print('Migrated and ready; press Ctrl-C to stop and delete it.')
+        await asyncio.Event().wait()
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    try:
+        asyncio.run(_serve())
+    except KeyboardInterrupt:
+        pass
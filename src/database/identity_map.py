@@ -0,0 +1,200 @@
+"""
+Process-wide identity map for ``users.discord_id`` -> ``users.id``.
+
+Almost every service needs the internal user id before it can touch its own
+tables, and that id never changes once a user row exists. This map serves it
+from a bounded LRU instead of a round trip per command:
+
+- ``resolve`` returns the id, creating the user if needed. Concurrent misses
+  for the same discord_id share one query.
+- ``lookup`` returns the id or ``None`` without creating anything. Misses are
+  remembered for ``negative_ttl`` seconds, so repeated views of members who
+  never interacted with the bot stay off the database too.
+- ``prefill`` bulk-loads ids (the most recently active users by default).
+
+Inside a unit of work (``conn=``) newly created ids are not cached, because the
+transaction may still roll back.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import time
+from collections import OrderedDict
+from collections.abc import Iterable
+
+from src.config.config import USER_ID_CACHE_SIZE, USER_ID_NEGATIVE_TTL
+from src.database.backend import DatabaseBackend
+from src.database.database import db
+from src.database.statements import statements
+
+_SELECT_ID_SQL = statements.register('users.select_id', 'SELECT id FROM users WHERE discord_id = $1')
+_RESOLVE_SQL = statements.register(
+    'users.resolve_id',
+    """
+    WITH existing AS (
+        SELECT id FROM users WHERE discord_id = $1
+    ), inserted AS (
+        INSERT INTO users (discord_id)
+        SELECT $1 WHERE NOT EXISTS (SELECT 1 FROM existing)
+        ON CONFLICT (discord_id) DO NOTHING
+        RETURNING id
+    )
+    SELECT id FROM existing UNION ALL SELECT id FROM inserted
+""",
+)
+
+
+class UserIdentityMap:
+    """Bounded LRU of discord_id -> users.id with negative caching and coalesced loads."""
+
+    def __init__(self, capacity: int = USER_ID_CACHE_SIZE, negative_ttl: float = USER_ID_NEGATIVE_TTL):
+        self.capacity = capacity
+        self.negative_ttl = negative_ttl
+        self._ids: OrderedDict[str, int] = OrderedDict()
+        # discord_id -> monotonic expiry of a cached "no such user"
+        self._missing: OrderedDict[str, float] = OrderedDict()
+        self._loads: dict[str, asyncio.Task] = {}
+        self.stats: dict[str, int] = {
+            'hits': 0,
+            'negative_hits': 0,
+            'misses': 0,
+            'coalesced': 0,
+            'prefilled': 0,
+            'evictions': 0,
+        }
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def get(self, discord_id: str) -> int | None:
+        """Cached id, or None (no database access)."""
+        user_id = self._ids.get(discord_id)
+        if user_id is not None:
+            self._ids.move_to_end(discord_id)
+        return user_id
+
+    def remember(self, discord_id: str, user_id: int) -> None:
+        self._missing.pop(discord_id, None)
+        self._ids[discord_id] = user_id
+        self._ids.move_to_end(discord_id)
+        if len(self._ids) > self.capacity:
+            self._ids.popitem(last=False)
+            self.stats['evictions'] += 1
+
+    def forget_missing(self, discord_ids: Iterable[str]) -> None:
+        """Drop negative entries for users that were just created elsewhere."""
+        if self._missing:
+            for discord_id in discord_ids:
+                self._missing.pop(discord_id, None)
+
+    def _known_missing(self, discord_id: str) -> bool:
+        expires = self._missing.get(discord_id)
+        if expires is None:
+            return False
+        if expires > time.monotonic():
+            return True
+        del self._missing[discord_id]
+        return False
+
+    def _remember_missing(self, discord_id: str) -> None:
+        self._missing[discord_id] = time.monotonic() + self.negative_ttl
+        self._missing.move_to_end(discord_id)
+        if len(self._missing) > self.capacity:
+            self._missing.popitem(last=False)
+
+    async def resolve(self, discord_id: str, conn: DatabaseBackend | None = None) -> int:
+        """``users.id`` for ``discord_id``, creating the user row if it does not exist yet."""
+        discord_id = str(discord_id)
+        user_id = self.get(discord_id)
+        if user_id is not None:
+            self.stats['hits'] += 1
+            return user_id
+
+        self.stats['misses'] += 1
+        if conn is not None:
+            # Not coalesced or cached on create: this transaction may roll back
+            user_id = await conn.fetchval(_SELECT_ID_SQL, discord_id)
+            if user_id is not None:
+                self.remember(discord_id, user_id)
+                return user_id
+            return await self._create(conn, discord_id)
+
+        load = self._loads.get(discord_id)
+        if load is None:
+            load = asyncio.get_running_loop().create_task(self._load(discord_id))
+            self._loads[discord_id] = load
+            load.add_done_callback(
+                lambda task: self._loads.pop(discord_id, None) if self._loads.get(discord_id) is task else None
+            )
+        else:
+            self.stats['coalesced'] += 1
+        # Shielded: a cancelled caller must not cancel the load other callers wait on
+        return await asyncio.shield(load)
+
+    async def _load(self, discord_id: str) -> int:
+        user_id = await self._create(db, discord_id)
+        self.remember(discord_id, user_id)
+        return user_id
+
+    @staticmethod
+    async def _create(executor: DatabaseBackend, discord_id: str) -> int:
+        user_id = await executor.fetchval(_RESOLVE_SQL, discord_id)
+        if user_id is None:
+            # Inserted concurrently by another writer between our SELECT and INSERT
+            user_id = await executor.fetchval(_SELECT_ID_SQL, discord_id)
+        return user_id
+
+    async def lookup(self, discord_id: str) -> int | None:
+        """``users.id`` for ``discord_id`` or None, without creating the user."""
+        discord_id = str(discord_id)
+        user_id = self.get(discord_id)
+        if user_id is not None:
+            self.stats['hits'] += 1
+            return user_id
+        if self._known_missing(discord_id):
+            self.stats['negative_hits'] += 1
+            return None
+
+        self.stats['misses'] += 1
+        user_id = await db.fetchval(_SELECT_ID_SQL, discord_id)
+        if user_id is None:
+            self._remember_missing(discord_id)
+        else:
+            self.remember(discord_id, user_id)
+        return user_id
+
+    async def prefill(self, discord_ids: Iterable[str] | None = None) -> int:
+        """
+        Bulk-load ids in one query: the given discord_ids (caching the absent ones
+        as missing), or by default the ``capacity`` most recently active users.
+        """
+        if discord_ids is None:
+            rows = await db.fetch(
+                'SELECT discord_id, id FROM users ORDER BY last_active DESC NULLS LAST LIMIT $1',
+                self.capacity,
+            )
+            wanted: set[str] = set()
+        else:
+            wanted = {str(discord_id) for discord_id in discord_ids} - self._ids.keys()
+            if not wanted:
+                return 0
+            rows = await db.fetch(
+                'SELECT discord_id, id FROM users WHERE discord_id = ANY($1::VARCHAR[])', list(wanted)
+            )
+
+        # Least recent first, so the most active users end up at the hot end of the LRU
+        for row in reversed(rows):
+            self.remember(row['discord_id'], row['id'])
+            wanted.discard(row['discord_id'])
+        for discord_id in wanted:
+            self._remember_missing(discord_id)
+        self.stats['prefilled'] += len(rows)
+        return len(rows)
+
+    def snapshot(self) -> dict:
+        return {'size': len(self._ids), 'missing': len(self._missing), **self.stats}
+
+
+# Global identity map instance
+user_ids = UserIdentityMap()
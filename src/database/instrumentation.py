@@ -0,0 +1,171 @@
+"""
+Query instrumentation for the Database wrapper.
+
+Every query is reduced to a normalized fingerprint (literals and ``$n``
+placeholders replaced with ``?``, whitespace collapsed) and its latency is
+recorded in a fixed-bucket histogram, split into pool-acquire time and
+execution time, together with row counts, errors and the calling module.
+Queries slower than ``DB_SLOW_QUERY_MS`` are logged with their fingerprint.
+"""
+
+from __future__ import annotations
+
+import functools
+import logging
+import re
+import sys
+from collections import Counter
+from dataclasses import dataclass, field
+
+from src.config.config import DB_SLOW_QUERY_MS
+
+logger = logging.getLogger('VEKA.database.queries')
+
+# Upper bounds (ms) of the latency histogram buckets; the last bucket is open-ended
+LATENCY_BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_RE = re.compile(r'\b\d+(?:\.\d+)?\b')
+_PLACEHOLDER_RE = re.compile(r'\$\d+')
+_IN_LIST_RE = re.compile(r'\(\s*\?(?:\s*,\s*\?)+\s*\)')
+_WHITESPACE_RE = re.compile(r'\s+')
+
+
+@functools.lru_cache(maxsize=2048)
+def fingerprint(query: str) -> str:
+    """Normalize SQL so queries differing only in literals share one fingerprint."""
+    normalized = _STRING_RE.sub('?', query)
+    normalized = _PLACEHOLDER_RE.sub('?', normalized)
+    normalized = _NUMBER_RE.sub('?', normalized)
+    normalized = _IN_LIST_RE.sub('(?)', normalized)
+    return _WHITESPACE_RE.sub(' ', normalized).strip()
+
+
+def caller_module(skip_prefix: str = 'src.database') -> str:
+    """Name of the first module on the stack outside the database package."""
+    frame = sys._getframe(1)
+    while frame is not None:
+        module = frame.f_globals.get('__name__', '')
+        if not module.startswith(skip_prefix) and module != __name__:
+            return module
+        frame = frame.f_back  # type: ignore[assignment]
+    return 'unknown'
+
+
+@dataclass
+class QueryStat:
+    """Aggregated timings for one query fingerprint."""
+
+    fingerprint: str
+    calls: int = 0
+    errors: int = 0
+    rows: int = 0
+    acquire_ms: float = 0.0
+    execute_ms: float = 0.0
+    max_ms: float = 0.0
+    buckets: list[int] = field(default_factory=lambda: [0] * (len(LATENCY_BUCKETS_MS) + 1))
+    sources: Counter = field(default_factory=Counter)
+
+    @property
+    def total_ms(self) -> float:
+        return self.acquire_ms + self.execute_ms
+
+    def percentile(self, pct: float) -> float:
+        """Approximate latency percentile (upper bound of the bucket it falls in)."""
+        if not self.calls:
+            return 0.0
+        target = self.calls * pct / 100
+        seen = 0
+        for index, count in enumerate(self.buckets):
+            seen += count
+            if seen >= target:
+                return float(LATENCY_BUCKETS_MS[index]) if index < len(LATENCY_BUCKETS_MS) else self.max_ms
+        return self.max_ms
+
+    def as_dict(self) -> dict:
+        return {
+            'fingerprint': self.fingerprint,
+            'calls': self.calls,
+            'errors': self.errors,
+            'rows': self.rows,
+            'total_ms': round(self.total_ms, 2),
+            'acquire_ms': round(self.acquire_ms, 2),
+            'execute_ms': round(self.execute_ms, 2),
+            'avg_ms': round(self.total_ms / self.calls, 2) if self.calls else 0.0,
+            'p50_ms': self.percentile(50),
+            'p95_ms': self.percentile(95),
+            'max_ms': round(self.max_ms, 2),
+            'top_source': self.sources.most_common(1)[0][0] if self.sources else 'unknown',
+        }
+
+
+class QueryStats:
+    """In-process registry of per-fingerprint query statistics."""
+
+    def __init__(self, slow_query_ms: float = DB_SLOW_QUERY_MS):
+        self.slow_query_ms = slow_query_ms
+        self._stats: dict[str, QueryStat] = {}
+        self.slow_queries = 0
+
+    def record(
+        self,
+        query: str,
+        *,
+        acquire_s: float,
+        execute_s: float,
+        rows: int = 0,
+        source: str = 'unknown',
+        error: bool = False,
+    ) -> None:
+        key = fingerprint(query)
+        stat = self._stats.get(key)
+        if stat is None:
+            stat = self._stats[key] = QueryStat(key)
+
+        acquire_ms = acquire_s * 1000
+        execute_ms = execute_s * 1000
+        total_ms = acquire_ms + execute_ms
+
+        stat.calls += 1
+        stat.rows += rows
+        stat.acquire_ms += acquire_ms
+        stat.execute_ms += execute_ms
+        stat.max_ms = max(stat.max_ms, total_ms)
+        stat.sources[source] += 1
+        if error:
+            stat.errors += 1
+
+        bucket = len(LATENCY_BUCKETS_MS)
+        for index, bound in enumerate(LATENCY_BUCKETS_MS):
+            if total_ms <= bound:
+                bucket = index
+                break
+        stat.buckets[bucket] += 1
+
+        if total_ms >= self.slow_query_ms:
+            self.slow_queries += 1
+            logger.warning(
+                'Slow query %.0fms (acquire %.0fms, execute %.0fms, rows %d) from %s: %s',
+                total_ms,
+                acquire_ms,
+                execute_ms,
+                rows,
+                source,
+                key[:300],
+            )
+
+    def snapshot(self) -> list[dict]:
+        """All fingerprints with their aggregated stats."""
+        return [stat.as_dict() for stat in self._stats.values()]
+
+    def top(self, limit: int = 5, key: str = 'total_ms') -> list[dict]:
+        """The ``limit`` worst fingerprints by ``key`` (total_ms, calls, p95_ms, acquire_ms, ...)."""
+        return sorted(self.snapshot(), key=lambda item: item[key], reverse=True)[:limit]
+
+    def reset(self) -> None:
+        self._stats.clear()
+        self.slow_queries = 0
+
+
+# Global query stats registry
+query_stats = QueryStats()
@@ -0,0 +1,176 @@
+"""
+Priority lanes over the shared asyncpg pool.
+
+Slash commands and long background scans (activity-role evaluation, inactivity
+sweeps, marketplace expiry, stats aggregations) used to compete for the same
+ten connections, so a scan could leave commands waiting on ``pool.acquire``.
+Each query now runs in a lane:
+
+- ``interactive`` (the default) for anything a user is waiting on;
+- ``background`` for loops and heavy aggregations, entered with
+  ``with db.lane(BACKGROUND):`` or the ``@in_lane(BACKGROUND)`` decorator. The lane is a context variable, so every
+  query awaited inside the block (including in helpers) uses it.
+
+A lane caps how many pooled connections its queries may hold at once. The
+physical pool is sized to the sum of the lane maxima, so the background lane can
+never take the connections interactive work needs. ``rebalance`` grows a lane's
+limit while its queries wait too long for a slot and shrinks it one slot at a
+time when slots sit idle; asyncpg then closes the unused connections after
+``max_inactive_connection_lifetime``.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import functools
+import logging
+import time
+from collections import deque
+from collections.abc import Callable, Coroutine, Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any
+
+from src.config.config import DB_LANE_GROW_WAIT_MS
+
+logger = logging.getLogger('VEKA.database')
+
+INTERACTIVE = 'interactive'
+BACKGROUND = 'background'
+
+current_lane: ContextVar[str] = ContextVar('db_lane', default=INTERACTIVE)
+
+
+class PoolLane:
+    """A resizable FIFO semaphore with wait and utilization accounting."""
+
+    def __init__(self, name: str, min_size: int, max_size: int):
+        self.name = name
+        self.min_size = min_size
+        self.max_size = max_size
+        self.limit = min_size
+        self.in_use = 0
+        self._waiters: deque[asyncio.Future] = deque()
+
+        # Lifetime counters
+        self.acquisitions = 0
+        self.waits = 0
+        self.wait_s = 0.0
+        self.peak = 0
+        # Window counters, reset by ``rebalance``
+        self._window_started = time.monotonic()
+        self._window_acquisitions = 0
+        self._window_wait_s = 0.0
+        self._window_busy_s = 0.0
+        self._window_peak = 0
+        self.utilization = 0.0
+        self.avg_wait_ms = 0.0
+
+    async def acquire(self) -> float:
+        """Take a slot, waiting FIFO if the lane is full. Returns the seconds waited."""
+        self.acquisitions += 1
+        self._window_acquisitions += 1
+        if self.in_use < self.limit and not self._waiters:
+            self._take()
+            return 0.0
+
+        started = time.perf_counter()
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # Granted a slot in the same tick we were cancelled: hand it on
+                self.release(0.0)
+            else:
+                self._waiters.remove(waiter)
+            raise
+        waited = time.perf_counter() - started
+        self.waits += 1
+        self.wait_s += waited
+        self._window_wait_s += waited
+        return waited
+
+    def _take(self) -> None:
+        self.in_use += 1
+        self.peak = max(self.peak, self.in_use)
+        self._window_peak = max(self._window_peak, self.in_use)
+
+    def release(self, held_s: float) -> None:
+        self.in_use -= 1
+        self._window_busy_s += held_s
+        self._wake()
+
+    def _wake(self) -> None:
+        while self._waiters and self.in_use < self.limit:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                self._take()
+                waiter.set_result(None)
+
+    def resize(self, limit: int) -> None:
+        limit = max(self.min_size, min(self.max_size, limit))
+        if limit != self.limit:
+            logger.info('Database %s lane limit %d -> %d', self.name, self.limit, limit)
+            self.limit = limit
+            self._wake()
+
+    def rebalance(self, grow_wait_ms: float = DB_LANE_GROW_WAIT_MS) -> None:
+        """Close the current window: record its metrics and adapt the limit to it."""
+        now = time.monotonic()
+        window_s = max(now - self._window_started, 1e-6)
+        self.utilization = min(1.0, self._window_busy_s / (self.limit * window_s))
+        self.avg_wait_ms = self._window_wait_s / self._window_acquisitions * 1000 if self._window_acquisitions else 0.0
+
+        if self.avg_wait_ms >= grow_wait_ms or self._waiters:
+            # Grow quickly (by half, at least by the queue length), shrink one slot at a time
+            self.resize(self.limit + max(self.limit // 2, len(self._waiters), 1))
+        elif self._window_peak < self.limit - 1:
+            # At least two slots went unused for the whole window
+            self.resize(self.limit - 1)
+
+        self._window_started = now
+        self._window_acquisitions = 0
+        self._window_wait_s = 0.0
+        self._window_busy_s = 0.0
+        self._window_peak = self.in_use
+
+    def snapshot(self) -> dict:
+        return {
+            'lane': self.name,
+            'limit': self.limit,
+            'in_use': self.in_use,
+            'waiting': len(self._waiters),
+            'peak': self.peak,
+            'acquisitions': self.acquisitions,
+            'waits': self.waits,
+            'avg_wait_ms': round(self.avg_wait_ms, 2),
+            'utilization': round(self.utilization, 3),
+        }
+
+
+@contextmanager
+def use_lane(name: str) -> Iterator[None]:
+    """Route every query awaited inside the block through lane ``name``."""
+    token = current_lane.set(name)
+    try:
+        yield
+    finally:
+        current_lane.reset(token)
+
+
+def in_lane[**P, R](
+    name: str,
+) -> Callable[[Callable[P, Coroutine[Any, Any, R]]], Callable[P, Coroutine[Any, Any, R]]]:
+    """Decorator form of ``use_lane`` for coroutine functions (stack it under ``@tasks.loop``)."""
+
+    def decorator(func: Callable[P, Coroutine[Any, Any, R]]) -> Callable[P, Coroutine[Any, Any, R]]:
+        @functools.wraps(func)
+        async def wrapper(*args: P.args, **kwargs: P.kwargs) -> R:
+            with use_lane(name):
+                return await func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
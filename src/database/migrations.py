@@ -1,6 +1,76 @@
+"""
+Schema migrations: plain ``.sql`` files in ``migrations/``, applied in filename order.
+
+``apply_migrations`` is the startup path:
+
+1. Fast path. ``migrations/manifest.json`` lists every bundled file with its
+   SHA-256 and a combined digest. If the directory holds exactly those files
+   and ``schema_migrations_state`` already records that digest, the schema is
+   current: one query, no lock, no migration file read.
+2. Otherwise it takes a PostgreSQL advisory lock, so replicas starting together
+   migrate one at a time (the others wait, re-check and usually find nothing
+   left to do), applies each pending file in its own transaction and records
+   its checksum.
+3. Drift: an applied file whose checksum changed is reported (and the digest
+   is not stored, so every startup reports it again until it is resolved).
+   Applied filenames with no bundled file, e.g. while an older release is
+   still running during a rolling deploy, are logged as a warning.
+
+Files sort by full filename, so the two historical ``005_*`` files keep their
+order (``005_guild_and_rss_schema.sql`` drops and recreates the ``rss_cache``
+that ``005_community_additions.sql`` created). New files must use a fresh
+numeric prefix; ``--check`` rejects any other duplicate.
+
+After adding a migration, regenerate the manifest::
+
+    python -m src.database.migrations --write-manifest
+    python -m src.database.migrations --check
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import logging
+import sys
+from collections import Counter
+from dataclasses import dataclass, field
 from pathlib import Path
 
+import asyncpg
+
+logger = logging.getLogger('VEKA.database')
+
 MIGRATIONS_TABLE = 'schema_migrations'
+STATE_TABLE = 'schema_migrations_state'
+MANIFEST_FILENAME = 'manifest.json'
+# Session-level advisory lock key shared by every replica ('VEKAmigr' as a bigint)
+MIGRATION_LOCK_KEY = int.from_bytes(b'VEKAmigr', 'big')
+# Numeric prefixes that were duplicated before the manifest existed; never add to this
+LEGACY_DUPLICATE_VERSIONS = frozenset({'005'})
+
+_BOOTSTRAP_SQL = f"""
+    CREATE TABLE IF NOT EXISTS {MIGRATIONS_TABLE} (
+        filename TEXT PRIMARY KEY,
+        applied_at TIMESTAMP DEFAULT NOW()
+    );
+    ALTER TABLE {MIGRATIONS_TABLE} ADD COLUMN IF NOT EXISTS checksum TEXT;
+    CREATE TABLE IF NOT EXISTS {STATE_TABLE} (
+        id BOOLEAN PRIMARY KEY DEFAULT TRUE CHECK (id),
+        head TEXT NOT NULL,
+        manifest_digest TEXT NOT NULL,
+        updated_at TIMESTAMP DEFAULT NOW()
+    );
+"""
+
+
+@dataclass
+class MigrationReport:
+    applied: list[str] = field(default_factory=list)
+    drifted: list[str] = field(default_factory=list)
+    unknown: list[str] = field(default_factory=list)
+    fast_path: bool = False
 
 
 def get_migrations_dir() -> Path:
@@ -13,3 +83,173 @@ def list_migration_files() -> list[Path]:
 
 def sort_migration_files(files: list[Path]) -> list[Path]:
     return sorted(files, key=lambda p: p.name)
+
+
+def sql_checksum(sql: str) -> str:
+    return hashlib.sha256(sql.encode()).hexdigest()
+
+
+def file_checksum(path: Path) -> str:
+    """SHA-256 of a migration file (read in text mode, so CRLF checkouts do not look like drift)."""
+    return sql_checksum(path.read_text())
+
+
+def combined_digest(checksums: list[tuple[str, str]]) -> str:
+    """Digest over ordered (filename, checksum) pairs; identifies one exact migration set."""
+    digest = hashlib.sha256()
+    for filename, checksum in checksums:
+        digest.update(f'{filename}:{checksum}\n'.encode())
+    return digest.hexdigest()
+
+
+def duplicate_versions(filenames: list[str]) -> list[str]:
+    """Numeric prefixes used by more than one file, excluding the historical ones."""
+    counts = Counter(name.split('_', 1)[0] for name in filenames)
+    return sorted(v for v, n in counts.items() if n > 1 and v not in LEGACY_DUPLICATE_VERSIONS)
+
+
+def build_manifest(files: list[Path] | None = None) -> dict:
+    files = list_migration_files() if files is None else files
+    checksums = [(path.name, file_checksum(path)) for path in files]
+    return {
+        'head': checksums[-1][0] if checksums else None,
+        'digest': combined_digest(checksums),
+        'migrations': [{'filename': name, 'checksum': checksum} for name, checksum in checksums],
+    }
+
+
+def load_manifest() -> dict | None:
+    try:
+        return json.loads((get_migrations_dir() / MANIFEST_FILENAME).read_text())
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as exc:
+        logger.warning('Ignoring unreadable migration manifest: %s', exc)
+        return None
+
+
+def write_manifest() -> dict:
+    manifest = build_manifest()
+    path = get_migrations_dir() / MANIFEST_FILENAME
+    path.write_text(json.dumps(manifest, indent=2) + '\n')
+    return manifest
+
+
+async def _stored_digest(connection: asyncpg.Connection) -> str | None:
+    try:
+        return await connection.fetchval(f'SELECT manifest_digest FROM {STATE_TABLE}')
+    except asyncpg.UndefinedTableError:
+        return None
+
+
+async def apply_migrations(connection: asyncpg.Connection) -> MigrationReport:
+    """Bring the schema up to date on ``connection`` (see the module docstring)."""
+    report = MigrationReport()
+    files = list_migration_files()
+    if not files:
+        return report
+
+    names = [path.name for path in files]
+    manifest = load_manifest()
+    manifest_digest = None
+    if manifest is not None:
+        if [entry['filename'] for entry in manifest.get('migrations', [])] == names:
+            manifest_digest = manifest.get('digest')
+        else:
+            logger.warning('migrations/%s is stale; regenerate it with --write-manifest', MANIFEST_FILENAME)
+
+    if manifest_digest is not None and await _stored_digest(connection) == manifest_digest:
+        report.fast_path = True
+        return report
+
+    await connection.execute('SELECT pg_advisory_lock($1)', MIGRATION_LOCK_KEY)
+    try:
+        await connection.execute(_BOOTSTRAP_SQL)
+        # Another replica may have finished while we waited for the lock
+        if manifest_digest is not None and await _stored_digest(connection) == manifest_digest:
+            report.fast_path = True
+            return report
+
+        applied = {
+            row['filename']: row['checksum']
+            for row in await connection.fetch(f'SELECT filename, checksum FROM {MIGRATIONS_TABLE}')
+        }
+        checksums: list[tuple[str, str]] = []
+        for path in files:
+            sql = path.read_text()
+            checksum = sql_checksum(sql)
+            checksums.append((path.name, checksum))
+
+            if path.name in applied:
+                recorded = applied[path.name]
+                if recorded is None:
+                    # Applied before checksums were tracked: adopt the current file as the baseline
+                    await connection.execute(
+                        f'UPDATE {MIGRATIONS_TABLE} SET checksum = $2 WHERE filename = $1', path.name, checksum
+                    )
+                elif recorded != checksum:
+                    report.drifted.append(path.name)
+                continue
+
+            async with connection.transaction():
+                logger.info('Applying migration: %s', path.name)
+                await connection.execute(sql)
+                await connection.execute(
+                    f'INSERT INTO {MIGRATIONS_TABLE} (filename, checksum) VALUES ($1, $2)', path.name, checksum
+                )
+            report.applied.append(path.name)
+            logger.info('Applied migration: %s', path.name)
+
+        report.unknown = sorted(applied.keys() - set(names))
+        if report.unknown:
+            logger.warning(
+                'Database has migrations this release does not ship (newer release deployed?): %s',
+                ', '.join(report.unknown),
+            )
+        if report.drifted:
+            logger.error(
+                'Migration drift: %s changed after being applied; add a new migration instead of editing old ones',
+                ', '.join(report.drifted),
+            )
+        else:
+            await connection.execute(
+                f"""
+                INSERT INTO {STATE_TABLE} (id, head, manifest_digest) VALUES (TRUE, $1, $2)
+                ON CONFLICT (id) DO UPDATE
+                SET head = EXCLUDED.head, manifest_digest = EXCLUDED.manifest_digest, updated_at = NOW()
+                """,
+                names[-1],
+                combined_digest(checksums),
+            )
+    finally:
+        await connection.execute('SELECT pg_advisory_unlock($1)', MIGRATION_LOCK_KEY)
+    return report
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description='Maintain migrations/manifest.json')
+    group = parser.add_mutually_exclusive_group(required=True)
+    group.add_argument('--write-manifest', action='store_true', help='regenerate the manifest from migrations/')
+    group.add_argument('--check', action='store_true', help='fail if the manifest is stale or prefixes collide')
+    args = parser.parse_args()
+
+    names = [path.name for path in list_migration_files()]
+    duplicates = duplicate_versions(names)
+    if duplicates:
+        print(f'Duplicate migration prefixes: {", ".join(duplicates)}', file=sys.stderr)
+        return 1
+
+    if args.write_manifest:
+        manifest = write_manifest()
+        print(f'Wrote {MANIFEST_FILENAME}: {len(manifest["migrations"])} migrations, head {manifest["head"]}')
+        return 0
+
+    if load_manifest() != build_manifest():
+        print(f'{MANIFEST_FILENAME} is out of date; run python -m src.database.migrations --write-manifest')
+        return 1
+    print(f'{MANIFEST_FILENAME} is up to date')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
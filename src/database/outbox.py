@@ -0,0 +1,278 @@
+"""
+Local write-ahead outbox for writes made while PostgreSQL is unreachable.
+
+Callers opt in per write with ``db.execute(..., outbox=True)`` (or
+``execute_many``). While the circuit breaker is open, or when the write fails
+with a connection error, the statement and its arguments are appended to a
+SQLite file instead of being lost. Once the database is healthy again the
+entries are replayed in order, in batches. While a backlog exists new outbox
+writes are appended behind it, so replay never reorders them.
+
+Each replayed batch runs in one transaction that also advances this outbox's
+high-water mark in ``outbox_replay``; a crash between commit and local cleanup
+therefore never applies an entry twice. Replayed statements run at replay
+time, so ``NOW()`` in them records the replay time, not the original one.
+
+The file is bounded by ``OUTBOX_MAX_BYTES``; past that, new writes are dropped
+(and counted) rather than growing the disk without limit.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime
+from decimal import Decimal
+from typing import TYPE_CHECKING, Any
+
+import asyncpg
+
+from src.config.config import OUTBOX_MAX_BYTES, OUTBOX_PATH, OUTBOX_REPLAY_BATCH
+from src.database.lanes import BACKGROUND, in_lane
+from src.utils.safety import DatabaseUnavailableError
+
+if TYPE_CHECKING:
+    from src.database.database import Database
+
+logger = logging.getLogger('VEKA.database.outbox')
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS entries (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    query TEXT NOT NULL,
+    args TEXT NOT NULL,
+    many INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    created_at REAL NOT NULL
+);
+"""
+
+
+def _encode(value: Any) -> Any:
+    """Make asyncpg arguments JSON-safe, tagging the types JSON cannot represent."""
+    if isinstance(value, list | tuple):
+        return [_encode(item) for item in value]
+    if isinstance(value, datetime):
+        return {'$dt': value.isoformat()}
+    if isinstance(value, date):
+        return {'$date': value.isoformat()}
+    if isinstance(value, Decimal):
+        return {'$dec': str(value)}
+    return value
+
+
+def _decode(value: Any) -> Any:
+    if isinstance(value, list):
+        return [_decode(item) for item in value]
+    if isinstance(value, dict):
+        if '$dt' in value:
+            return datetime.fromisoformat(value['$dt'])
+        if '$date' in value:
+            return date.fromisoformat(value['$date'])
+        if '$dec' in value:
+            return Decimal(value['$dec'])
+    return value
+
+
+def is_connection_failure(exc: DatabaseUnavailableError) -> bool:
+    """True unless the server answered with a query error (which replay would hit again)."""
+    return not isinstance(exc.__cause__, asyncpg.PostgresError)
+
+
+class Outbox:
+    """Append-only SQLite spill file with ordered, exactly-once batched replay."""
+
+    def __init__(
+        self,
+        path: str = OUTBOX_PATH,
+        max_bytes: int = OUTBOX_MAX_BYTES,
+        batch_size: int = OUTBOX_REPLAY_BATCH,
+    ):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.batch_size = batch_size
+        # One thread owns the SQLite connection, so file I/O stays off the event loop
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='db-outbox')
+        self._conn: sqlite3.Connection | None = None
+        self.outbox_id = ''
+        self.pending = 0
+        self.bytes = 0
+        self._replay_task: asyncio.Task | None = None
+        self.stats: dict[str, float] = {
+            'spilled': 0,
+            'dropped': 0,
+            'failed_appends': 0,
+            'replayed': 0,
+            'replay_batches': 0,
+            'replay_failed': 0,
+            'last_replay_seconds': 0.0,
+            'last_replay_rate': 0.0,
+        }
+
+    async def _call(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+
+    # --- SQLite side (runs on the outbox thread) ---
+
+    def _open_sync(self) -> None:
+        if self._conn is not None:
+            return
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.executescript(_SCHEMA)
+        row = conn.execute("SELECT value FROM meta WHERE key = 'outbox_id'").fetchone()
+        if row is None:
+            self.outbox_id = uuid.uuid4().hex
+            conn.execute("INSERT INTO meta (key, value) VALUES ('outbox_id', ?)", (self.outbox_id,))
+        else:
+            self.outbox_id = row[0]
+        self.pending, self.bytes = conn.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries').fetchone()
+        self._conn = conn
+
+    def _append_sync(self, query: str, args: str, many: bool, size: int) -> None:
+        self._open_sync()
+        self._conn.execute(  # type: ignore[union-attr]
+            'INSERT INTO entries (query, args, many, size, created_at) VALUES (?, ?, ?, ?, ?)',
+            (query, args, int(many), size, time.time()),
+        )
+
+    def _read_sync(self, limit: int) -> list[tuple[int, str, str, int, int]]:
+        self._open_sync()
+        return self._conn.execute(  # type: ignore[union-attr]
+            'SELECT seq, query, args, many, size FROM entries ORDER BY seq LIMIT ?', (limit,)
+        ).fetchall()
+
+    def _delete_through_sync(self, seq: int) -> None:
+        self._conn.execute('DELETE FROM entries WHERE seq <= ?', (seq,))  # type: ignore[union-attr]
+        if not self._conn.execute('SELECT 1 FROM entries LIMIT 1').fetchone():  # type: ignore[union-attr]
+            # Drained: give the space back to the filesystem
+            self._conn.execute('VACUUM')  # type: ignore[union-attr]
+
+    # --- async API ---
+
+    async def open(self) -> None:
+        """Open the spill file and load its backlog counters (creates it if missing)."""
+        await self._call(self._open_sync)
+        if self.pending:
+            logger.warning(
+                'Write outbox has %d pending entries (%d bytes) from a previous run', self.pending, self.bytes
+            )
+
+    async def append(self, query: str, args: Any, many: bool = False) -> bool:
+        """Spill one write. Returns False (and drops it) if the disk budget is exhausted or the file is unusable."""
+        payload = json.dumps(_encode(args), separators=(',', ':'))
+        size = len(query) + len(payload)
+        if self.bytes + size > self.max_bytes:
+            self.stats['dropped'] += 1
+            if self.stats['dropped'] == 1 or self.stats['dropped'] % 1000 == 0:
+                logger.error(
+                    'Write outbox full (%d/%d bytes); dropped %d writes so far',
+                    self.bytes,
+                    self.max_bytes,
+                    self.stats['dropped'],
+                )
+            return False
+        try:
+            await self._call(self._append_sync, query, payload, many, size)
+        except (sqlite3.Error, OSError) as exc:
+            # e.g. open() already failed at startup; the caller reports the write as unavailable
+            self.stats['failed_appends'] += 1
+            if self.stats['failed_appends'] == 1 or self.stats['failed_appends'] % 1000 == 0:
+                logger.error('Write outbox unusable (%s); dropped %d writes so far', exc, self.stats['failed_appends'])
+            return False
+        self.pending += 1
+        self.bytes += size
+        self.stats['spilled'] += 1
+        return True
+
+    def start_replay(self, database: Database) -> None:
+        """Start draining the backlog in the background (no-op if empty or already running)."""
+        if not self.pending or (self._replay_task is not None and not self._replay_task.done()):
+            return
+        self._replay_task = asyncio.get_running_loop().create_task(self.replay(database), name='db-outbox-replay')
+
+    @in_lane(BACKGROUND)
+    async def replay(self, database: Database) -> int:
+        """Replay pending entries in order until drained or the database fails. Returns entries applied."""
+        started = time.perf_counter()
+        applied = 0
+        batch_size = self.batch_size
+        while self.pending:
+            entries = await self._call(self._read_sync, batch_size)
+            if not entries:
+                self.pending = self.bytes = 0
+                break
+            try:
+                count = await self._apply(database, entries)
+            except DatabaseUnavailableError as exc:
+                if is_connection_failure(exc):
+                    logger.warning('Outbox replay paused, database unavailable: %s', exc)
+                    break
+                if len(entries) > 1:
+                    # A statement in this batch is rejected by the server; isolate it
+                    batch_size = 1
+                    continue
+                seq, query = entries[0][0], entries[0][1]
+                logger.error('Dropping outbox entry %d rejected by the database: %s | %s', seq, exc, query[:300])
+                self.stats['replay_failed'] += 1
+            else:
+                applied += count
+                self.stats['replayed'] += count
+                self.stats['replay_batches'] += 1
+                batch_size = self.batch_size
+
+            await self._call(self._delete_through_sync, entries[-1][0])
+            self.pending -= len(entries)
+            self.bytes -= sum(entry[4] for entry in entries)
+
+        elapsed = time.perf_counter() - started
+        if applied:
+            self.stats['last_replay_seconds'] = round(elapsed, 3)
+            self.stats['last_replay_rate'] = round(applied / elapsed, 1) if elapsed else float(applied)
+            logger.info(
+                'Replayed %d outbox entries in %.1fs (%.0f/s); %d pending',
+                applied,
+                elapsed,
+                self.stats['last_replay_rate'],
+                self.pending,
+            )
+        return applied
+
+    async def _apply(self, database: Database, entries: list[tuple[int, str, str, int, int]]) -> int:
+        """Apply one batch and advance the replay high-water mark in the same transaction."""
+        count = 0
+        async with database.transaction() as tx:
+            high_water = await tx.fetchval(
+                'SELECT last_seq FROM outbox_replay WHERE outbox_id = $1 FOR UPDATE', self.outbox_id
+            )
+            for seq, query, args, many, _size in entries:
+                if high_water is not None and seq <= high_water:
+                    continue  # applied before a crash, but not yet removed locally
+                if many:
+                    await tx.execute_many(query, _decode(json.loads(args)))
+                else:
+                    await tx.execute(query, *_decode(json.loads(args)))
+                count += 1
+            await tx.execute(
+                """
+                INSERT INTO outbox_replay (outbox_id, last_seq) VALUES ($1, $2)
+                ON CONFLICT (outbox_id) DO UPDATE SET last_seq = EXCLUDED.last_seq, updated_at = NOW()
+                """,
+                self.outbox_id,
+                entries[-1][0],
+            )
+        return count
+
+    def snapshot(self) -> dict:
+        return {'pending': self.pending, 'bytes': self.bytes, **self.stats}
@@ -0,0 +1,152 @@
+"""
+Named-query registry: hot statements prepared once per pooled connection.
+
+asyncpg prepares every distinct query text and keeps it in a small per-connection
+LRU (``statement_cache_size``). Queries assembled with f-strings (one text per
+stat column or activity category) multiply the number of texts and push each
+other out of that cache, so hot statements kept being re-prepared.
+
+Register a hot statement once, at import time::
+
+    _SELECT_STATE = statements.register('footer.select_state', 'SELECT ... WHERE user_id = $1')
+    row = await db.fetch_one(_SELECT_STATE, user_id)
+
+``register`` returns a ``NamedStatement``, a ``str`` carrying its registry name,
+so it works with every ``db`` method (including ``outbox=True`` writes, which
+spill its text) and with connections from other pools. On pool connections
+(``PreparedConnection``) the pool ``init`` hook prepares every registered
+statement up front and later calls run the stored ``PreparedStatement`` by name;
+statements registered after a connection was opened, or that could not be
+prepared then (e.g. before migrations created their table), are prepared on
+first use. ``statements.snapshot()`` reports hits (reused), misses (prepared on
+demand) and re-prepares after schema changes.
+"""
+
+from __future__ import annotations
+
+import logging
+from collections import Counter
+from typing import Any
+
+import asyncpg
+from asyncpg.prepared_stmt import PreparedStatement
+
+logger = logging.getLogger('VEKA.database')
+
+
+class NamedStatement(str):
+    """SQL text tagged with its registry name."""
+
+    name: str
+
+    def __new__(cls, name: str, sql: str) -> NamedStatement:
+        statement = super().__new__(cls, sql)
+        statement.name = name
+        return statement
+
+
+class StatementRegistry:
+    """Process-wide set of named statements plus their prepare/reuse counters."""
+
+    def __init__(self) -> None:
+        self._statements: dict[str, NamedStatement] = {}
+        self.stats: dict[str, int] = {
+            'hits': 0,
+            'misses': 0,
+            'prepared_on_connect': 0,
+            'prepare_failures': 0,
+            'reprepared': 0,
+        }
+        # name -> on-demand prepares, to spot statements that keep missing
+        self.misses_by_name: Counter = Counter()
+
+    def __len__(self) -> int:
+        return len(self._statements)
+
+    def register(self, name: str, sql: str) -> NamedStatement:
+        existing = self._statements.get(name)
+        if existing is not None:
+            if existing != sql:
+                raise ValueError(f'Statement {name!r} is already registered with different SQL')
+            return existing
+        statement = self._statements[name] = NamedStatement(name, sql)
+        return statement
+
+    async def prepare_all(self, connection: asyncpg.Connection) -> None:
+        """Pool ``init`` hook: prepare every registered statement on a new connection."""
+        if not isinstance(connection, PreparedConnection):
+            return
+        for statement in list(self._statements.values()):
+            try:
+                connection.named[statement.name] = await connection.prepare(statement)
+                self.stats['prepared_on_connect'] += 1
+            except asyncpg.PostgresError as exc:
+                # Usually a table a pending migration creates; prepared on first use instead
+                self.stats['prepare_failures'] += 1
+                logger.debug('Could not prepare %s on connect: %s', statement.name, exc)
+
+    def snapshot(self) -> dict:
+        lookups = self.stats['hits'] + self.stats['misses']
+        return {
+            'registered': len(self._statements),
+            **self.stats,
+            'hit_rate': round(self.stats['hits'] / lookups, 4) if lookups else 0.0,
+            'top_misses': self.misses_by_name.most_common(5),
+        }
+
+
+# Global statement registry
+statements = StatementRegistry()
+
+
+class PreparedConnection(asyncpg.Connection):
+    """Pool connection class that keeps the registry's prepared statements by name."""
+
+    __slots__ = ('named',)
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        self.named: dict[str, PreparedStatement] = {}
+
+    async def named_statement(self, statement: NamedStatement) -> PreparedStatement:
+        prepared = self.named.get(statement.name)
+        if prepared is not None:
+            statements.stats['hits'] += 1
+            return prepared
+        statements.stats['misses'] += 1
+        statements.misses_by_name[statement.name] += 1
+        prepared = self.named[statement.name] = await self.prepare(statement)
+        return prepared
+
+
+async def run_statement(connection: Any, query: str, method: str, *args: Any) -> Any:
+    """
+    ``connection.<method>(query, *args)``, using the connection's prepared copy
+    when ``query`` is a registered statement. ``method`` is one of fetch,
+    fetchrow, fetchval, execute or executemany (whose single argument is the
+    list of argument tuples).
+    """
+    if not isinstance(query, NamedStatement):
+        return await getattr(connection, method)(query, *args)
+    # Pool proxies forward attribute access, so look the method up rather than isinstance()
+    named_statement = getattr(connection, 'named_statement', None)
+    if named_statement is None:
+        return await getattr(connection, method)(query, *args)
+    name = query.name
+
+    retried = False
+    while True:
+        prepared = await named_statement(query)
+        try:
+            if method == 'execute':
+                # PreparedStatement has no execute(); fetch() runs it and keeps the command status
+                await prepared.fetch(*args)
+                return prepared.get_statusmsg()
+            return await getattr(prepared, method)(*args)
+        except asyncpg.InvalidCachedStatementError:
+            # The schema changed under the prepared plan; prepare again unless a transaction is now aborted
+            connection.named.pop(name, None)
+            if retried or connection.is_in_transaction():
+                raise
+            retried = True
+            statements.stats['reprepared'] += 1
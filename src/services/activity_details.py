@@ -0,0 +1,53 @@
+"""
+Batched writes to ``user_activity_details``.
+
+The presence pipeline flush and radio listener tracking both add minutes to
+(user, activity type, activity name) rows. ``add_detail_minutes`` sends a whole
+batch as one ``INSERT ... SELECT FROM unnest(...) ON CONFLICT DO UPDATE``, so a
+flush costs one statement however many members are tracked.
+"""
+
+from __future__ import annotations
+
+from collections.abc import Mapping
+
+from src.database.backend import DatabaseBackend
+from src.database.database import db
+from src.database.statements import statements
+
+_UPSERT_DETAIL_MINUTES_SQL = statements.register(
+    'activity_details.add_minutes',
+    """
+    INSERT INTO user_activity_details (user_id, activity_type, activity_name, duration_minutes, last_seen)
+    SELECT user_id, activity_type, activity_name, minutes, NOW()
+    FROM unnest($1::VARCHAR[], $2::VARCHAR[], $3::TEXT[], $4::INT[]) AS d(user_id, activity_type, activity_name, minutes)
+    ON CONFLICT (user_id, activity_type, activity_name)
+    DO UPDATE SET
+        duration_minutes = user_activity_details.duration_minutes + EXCLUDED.duration_minutes,
+        last_seen = NOW()
+    """,
+)
+
+
+async def add_detail_minutes(minutes: Mapping[tuple[int, str, str], int], conn: DatabaseBackend | None = None) -> int:
+    """
+    Add ``minutes`` ((user_id, activity_type, activity_name) -> minutes) in one
+    statement. Keys are unique by construction, which ``ON CONFLICT DO UPDATE``
+    requires within a single statement. Without ``conn`` it spills to the
+    outbox during outages. Returns the number of rows.
+    """
+    if not minutes:
+        return 0
+    # Sorted so concurrent batches lock shared rows in the same order
+    keys = sorted(minutes, key=lambda key: (str(key[0]), key[1], key[2]))
+    args = (
+        [str(user_id) for user_id, _, _ in keys],
+        [activity_type for _, activity_type, _ in keys],
+        [activity_name for _, _, activity_name in keys],
+        [minutes[key] for key in keys],
+    )
+    if conn is None:
+        await db.execute(_UPSERT_DETAIL_MINUTES_SQL, *args, outbox=True)
+    else:
+        await conn.execute(_UPSERT_DETAIL_MINUTES_SQL, *args)
+    return len(keys)
@@ -0,0 +1,97 @@
+"""
+Partition maintenance for ``user_activity_log``.
+
+The log is range-partitioned by month (migration 014). Partitions are created
+ahead of time so rows never land in the default partition, and partitions older
+than the retention window are dropped together with their daily rollups.
+"""
+
+from __future__ import annotations
+
+import logging
+import re
+from datetime import UTC, date, datetime
+
+from src.config.config import ACTIVITY_LOG_PARTITIONS_AHEAD, ACTIVITY_LOG_RETENTION_MONTHS
+from src.database.database import db
+
+logger = logging.getLogger('VEKA.activity_log')
+
+_PARENT_TABLE = 'user_activity_log'
+_PARTITION_RE = re.compile(r'^user_activity_log_(\d{4})_(\d{2})$')
+
+
+def _add_months(month: date, months: int) -> date:
+    index = month.year * 12 + (month.month - 1) + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def _partition_name(month: date) -> str:
+    return f'{_PARENT_TABLE}_{month.year:04d}_{month.month:02d}'
+
+
+def _current_month() -> date:
+    today = datetime.now(UTC).date()
+    return today.replace(day=1)
+
+
+async def list_partitions() -> dict[str, date]:
+    """Return monthly partitions of user_activity_log keyed by name, with their start month."""
+    rows = await db.fetch(
+        """
+        SELECT c.relname
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = $1::regclass
+        """,
+        _PARENT_TABLE,
+    )
+    partitions: dict[str, date] = {}
+    for row in rows:
+        match = _PARTITION_RE.match(row['relname'])
+        if match:
+            partitions[row['relname']] = date(int(match.group(1)), int(match.group(2)), 1)
+    return partitions
+
+
+async def ensure_partitions(months_ahead: int = ACTIVITY_LOG_PARTITIONS_AHEAD) -> list[str]:
+    """Create monthly partitions for the current month through ``months_ahead`` months ahead."""
+    existing = await list_partitions()
+    created = []
+    start = _current_month()
+    for offset in range(months_ahead + 1):
+        month = _add_months(start, offset)
+        name = _partition_name(month)
+        if name in existing:
+            continue
+        await db.execute(
+            f'CREATE TABLE IF NOT EXISTS {name} PARTITION OF {_PARENT_TABLE} '
+            f"FOR VALUES FROM ('{month.isoformat()}') TO ('{_add_months(month, 1).isoformat()}')"
+        )
+        created.append(name)
+    if created:
+        logger.info('Created activity log partitions: %s', ', '.join(created))
+    return created
+
+
+async def drop_expired_partitions(retention_months: int = ACTIVITY_LOG_RETENTION_MONTHS) -> list[str]:
+    """Drop monthly partitions (and daily rollups) older than ``retention_months``."""
+    cutoff = _add_months(_current_month(), -retention_months)
+    dropped = []
+    for name, month in sorted((await list_partitions()).items(), key=lambda kv: kv[1]):
+        if month >= cutoff:
+            continue
+        await db.execute(f'DROP TABLE IF EXISTS {name}')
+        dropped.append(name)
+
+    await db.execute('DELETE FROM user_activity_daily WHERE day < $1', cutoff)
+
+    if dropped:
+        logger.info('Dropped expired activity log partitions: %s', ', '.join(dropped))
+    return dropped
+
+
+async def run_maintenance() -> None:
+    """Create upcoming partitions and apply the retention policy."""
+    await ensure_partitions()
+    await drop_expired_partitions()
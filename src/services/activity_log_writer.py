@@ -0,0 +1,149 @@
+"""
+Buffered writer for ``user_activity_log``.
+
+Activity log rows are the highest-volume write in the schema. Instead of one
+INSERT per XP event, rows are buffered in memory and streamed to PostgreSQL in
+batches with COPY (``copy_records_to_table``).
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from collections import deque
+from datetime import UTC, datetime
+
+from src.config.config import (
+    ACTIVITY_LOG_BATCH_SIZE,
+    ACTIVITY_LOG_MAX_BACKOFF,
+    ACTIVITY_LOG_MAX_BUFFERED,
+)
+from src.core.runtime_state import runtime_state
+from src.database.database import db
+from src.utils.safety import DatabaseUnavailableError
+
+logger = logging.getLogger('VEKA.activity_log')
+
+_TABLE = 'user_activity_log'
+_COLUMNS = ['user_id', 'activity_type', 'points_awarded', 'channel_id', 'guild_id', 'created_at']
+
+
+class ActivityLogWriter:
+    """
+    Batches ``user_activity_log`` rows and flushes them with COPY.
+
+    Flushes are triggered by size (``batch_size`` rows buffered, see ``add``)
+    and by time (the owning cog calls ``flush`` on an interval). While the
+    database is down the writer backs off exponentially and keeps buffering up
+    to ``max_buffered`` rows; beyond that the oldest rows are dropped.
+    """
+
+    def __init__(
+        self,
+        batch_size: int = ACTIVITY_LOG_BATCH_SIZE,
+        max_buffered: int = ACTIVITY_LOG_MAX_BUFFERED,
+        max_backoff: float = ACTIVITY_LOG_MAX_BACKOFF,
+    ):
+        self.batch_size = batch_size
+        self.max_buffered = max_buffered
+        self.max_backoff = max_backoff
+        self._buffer: deque[tuple] = deque()
+        self._flush_lock = asyncio.Lock()
+        self._flush_task: asyncio.Task | None = None
+        self._backoff = 0.0
+        self._retry_at = 0.0
+        self.stats: dict[str, int] = {
+            'buffered': 0,
+            'flushed': 0,
+            'dropped': 0,
+            'batches': 0,
+            'failed_batches': 0,
+        }
+
+    def __len__(self) -> int:
+        return len(self._buffer)
+
+    def add(
+        self,
+        user_id: str,
+        activity_type: str,
+        points_awarded: int,
+        channel_id: int = 0,
+        guild_id: int = 0,
+        created_at: datetime | None = None,
+    ) -> None:
+        """Buffer one log row, scheduling a flush once ``batch_size`` rows are waiting."""
+        if len(self._buffer) >= self.max_buffered:
+            self._buffer.popleft()
+            self.stats['dropped'] += 1
+        self._buffer.append(
+            (
+                user_id,
+                activity_type,
+                points_awarded,
+                channel_id,
+                guild_id,
+                created_at or datetime.now(UTC).replace(tzinfo=None),
+            )
+        )
+        self.stats['buffered'] += 1
+
+        if len(self._buffer) >= self.batch_size and self._can_flush() and not self._flush_pending():
+            self._flush_task = asyncio.get_running_loop().create_task(self.flush())
+
+    def _flush_pending(self) -> bool:
+        return self._flush_task is not None and not self._flush_task.done()
+
+    def _can_flush(self) -> bool:
+        """Backpressure: skip flushes while the DB is down or we are backing off after a failure."""
+        return runtime_state.db_available and time.monotonic() >= self._retry_at
+
+    async def flush(self) -> int:
+        """Stream all buffered rows to the database. Returns the number of rows written."""
+        async with self._flush_lock:
+            written = 0
+            while self._buffer and self._can_flush():
+                count = min(len(self._buffer), self.batch_size)
+                batch = [self._buffer.popleft() for _ in range(count)]
+                copied = False
+                try:
+                    await db.copy_records(_TABLE, batch, _COLUMNS)
+                    copied = True
+                except DatabaseUnavailableError as exc:
+                    self.stats['failed_batches'] += 1
+                    self._backoff = min(self.max_backoff, max(1.0, self._backoff * 2))
+                    self._retry_at = time.monotonic() + self._backoff
+                    logger.warning(
+                        'Activity log COPY failed (%d rows buffered), retrying in %.0fs: %s',
+                        len(self._buffer) + count,
+                        self._backoff,
+                        exc,
+                    )
+                    break
+                finally:
+                    # Any exit without a COPY (outage, cancellation on unload) keeps the rows
+                    if not copied:
+                        self._requeue(batch)
+
+                self._backoff = 0.0
+                self.stats['batches'] += 1
+                self.stats['flushed'] += count
+                written += count
+
+            if written:
+                logger.debug('Flushed %d activity log rows', written)
+            return written
+
+    def _requeue(self, batch: list[tuple]) -> None:
+        """Put a failed batch back at the head of the buffer, dropping the oldest rows on overflow."""
+        room = self.max_buffered - len(self._buffer)
+        if room < len(batch):
+            dropped = len(batch) - max(room, 0)
+            self.stats['dropped'] += dropped
+            batch = batch[dropped:]
+        self._buffer.extendleft(reversed(batch))
+
+
+# Global writer instance
+activity_log_writer = ActivityLogWriter()
@@ -0,0 +1,148 @@
+"""
+Dirty-set tracking for activity roles (Active Member / Active+ / Active Star).
+
+A user's activity role only changes when their points cross a threshold or
+their ``last_active`` ages past ``ACTIVITY_ROLE_INACTIVITY_DAYS``. Scanning
+every user with points (the old six-hourly evaluation) is therefore kept only
+as the nightly reconciliation. In between:
+
+- The XP flush reports new point totals through ``observe_points``. A user is
+  marked dirty when the role their points qualify for differs from the one
+  recorded in ``user_rpg_roles``. This covers threshold crossings and users
+  coming back after a period of inactivity.
+- ``aged_out`` finds the users whose ``last_active`` passed the inactivity
+  cutoff since the previous run.
+
+The RPG cog evaluates only those users and writes ``user_rpg_roles`` with one
+batched upsert (``record``).
+"""
+
+from __future__ import annotations
+
+import logging
+from collections.abc import Iterable
+from datetime import UTC, datetime, timedelta
+
+from src.config.config import ACTIVITY_ROLE_INACTIVITY_DAYS, ACTIVITY_ROLES
+from src.database.database import db
+from src.database.statements import statements
+
+logger = logging.getLogger('VEKA.rpg')
+
+# Map role keys to their Discord role names
+ACTIVITY_ROLE_NAMES = {
+    'active_member': 'Active Member',
+    'active_plus': 'Active+',
+    'active_star': 'Active Star',
+}
+
+# Sorted descending by threshold so the first match is the highest role
+_THRESHOLDS_DESC = sorted(ACTIVITY_ROLES.items(), key=lambda kv: kv[1], reverse=True)
+
+_UPSERT_ROLES_SQL = statements.register(
+    'activity_roles.upsert',
+    """
+    INSERT INTO user_rpg_roles (user_id, active_role, last_evaluated)
+    SELECT user_id, active_role, NOW() FROM unnest($1::VARCHAR[], $2::VARCHAR[]) AS t(user_id, active_role)
+    ON CONFLICT (user_id) DO UPDATE SET active_role = EXCLUDED.active_role, last_evaluated = NOW()
+    """,
+)
+
+
+def role_for_points(points: int) -> str | None:
+    """Name of the highest activity role ``points`` qualify for."""
+    for role_key, threshold in _THRESHOLDS_DESC:
+        if points >= threshold:
+            return ACTIVITY_ROLE_NAMES[role_key]
+    return None
+
+
+def inactivity_cutoff(now: datetime | None = None) -> datetime:
+    """Naive-UTC ``last_active`` bound below which users lose their activity role."""
+    now = now or datetime.now(UTC)
+    return (now - timedelta(days=ACTIVITY_ROLE_INACTIVITY_DAYS)).replace(tzinfo=None)
+
+
+def target_role(points: int, last_active: datetime | None, cutoff: datetime) -> str | None:
+    """Role a user should hold: by points, or none once inactive (or never active)."""
+    if last_active is None:
+        return None
+    if last_active.tzinfo is not None:
+        last_active = last_active.astimezone(UTC).replace(tzinfo=None)
+    if last_active < cutoff:
+        return None
+    return role_for_points(points)
+
+
+class ActivityRoleTracker:
+    """Recorded role per user plus the set of users whose role may have changed."""
+
+    def __init__(self) -> None:
+        # discord_id -> active_role as recorded in user_rpg_roles ('' for none)
+        self._recorded: dict[str, str] = {}
+        self._dirty: set[str] = set()
+        self.seeded = False
+        # Cutoff used by the previous run; users between it and the next cutoff aged out meanwhile
+        self.last_cutoff: datetime | None = None
+        self.stats: dict[str, int] = {'marked': 0, 'incremental_runs': 0, 'full_runs': 0, 'evaluated': 0}
+
+    def __len__(self) -> int:
+        return len(self._dirty)
+
+    def observe_points(self, discord_id: str, points: int) -> None:
+        """Mark a user who just earned points if their recorded role no longer matches."""
+        if not self.seeded:
+            return  # the first (full) run evaluates everyone anyway
+        # They were just active, so only the points decide
+        if (role_for_points(points) or '') != self._recorded.get(discord_id, ''):
+            if discord_id not in self._dirty:
+                self._dirty.add(discord_id)
+                self.stats['marked'] += 1
+
+    def mark(self, discord_ids: Iterable[str]) -> None:
+        self._dirty.update(discord_ids)
+
+    def take_dirty(self) -> set[str]:
+        dirty, self._dirty = self._dirty, set()
+        return dirty
+
+    async def aged_out(self, cutoff: datetime) -> list[str]:
+        """Users with a recorded role whose ``last_active`` fell behind ``cutoff`` since the last run."""
+        if self.last_cutoff is None or cutoff <= self.last_cutoff:
+            return []
+        rows = await db.fetch(
+            """
+            SELECT discord_id FROM users
+            WHERE points > 0 AND last_active >= $1 AND last_active < $2
+            """,
+            self.last_cutoff,
+            cutoff,
+        )
+        return [row['discord_id'] for row in rows if self._recorded.get(row['discord_id'])]
+
+    async def record(self, roles: dict[str, str | None]) -> None:
+        """Persist evaluated roles (``discord_id -> role name or None``) in one upsert."""
+        if not roles:
+            return
+        user_ids = list(roles)
+        await db.execute(_UPSERT_ROLES_SQL, user_ids, [roles[user_id] or '' for user_id in user_ids])
+        for user_id in user_ids:
+            self._recorded[user_id] = roles[user_id] or ''
+
+    def finish_run(self, cutoff: datetime, evaluated: int, full: bool) -> None:
+        self.last_cutoff = cutoff
+        self.seeded = self.seeded or full
+        self.stats['evaluated'] += evaluated
+        self.stats['full_runs' if full else 'incremental_runs'] += 1
+
+    def reset_recorded(self) -> None:
+        """Forget recorded roles before a full run rebuilds them."""
+        self._recorded.clear()
+        self._dirty.clear()
+
+    def snapshot(self) -> dict:
+        return {'dirty': len(self._dirty), 'recorded': len(self._recorded), 'seeded': self.seeded, **self.stats}
+
+
+# Global activity role tracker instance
+activity_role_tracker = ActivityRoleTracker()
@@ -0,0 +1,98 @@
+"""
+Off-loop RSS parsing.
+
+``feedparser.parse`` and BeautifulSoup are pure-Python and CPU-bound, so large
+feeds parsed inline stall gateway heartbeats and every command handler. Parsing
+and HTML-to-text cleanup run in a small process pool instead. Workers use the
+``spawn`` start method so they never inherit the bot's event loop, sockets or
+database pool.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import multiprocessing
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import feedparser
+from bs4 import BeautifulSoup
+
+logger = logging.getLogger('VEKA.rss')
+
+MAX_ENTRIES = 10
+MAX_DESCRIPTION_CHARS = 500
+
+
+def clean_description(raw: str) -> str:
+    """Convert an entry description to plain text, truncated for embeds."""
+    # Fast path: plain text needs no HTML parser
+    if '<' not in raw and '&' not in raw:
+        text = raw
+    else:
+        text = BeautifulSoup(raw, 'html.parser').get_text()
+    return text[:MAX_DESCRIPTION_CHARS] + '...' if len(text) > MAX_DESCRIPTION_CHARS else text
+
+
+def parse_feed(content: str, max_entries: int = MAX_ENTRIES) -> dict:
+    """Parse feed XML into the plain dict shape used by RSSService (runs in a worker)."""
+    feed = feedparser.parse(content)
+    entries = []
+    for entry in feed.entries[:max_entries]:
+        entry_id = entry.get('id', entry.get('link', ''))
+        if not entry_id:
+            continue
+        entries.append(
+            {
+                'entry_id': entry_id,
+                'title': entry.get('title', 'No title'),
+                'link': entry.get('link', '#'),
+                'description': clean_description(entry.get('description', '')),
+                'published': entry.get('published', 'No date'),
+                'author': entry.get('author', 'Unknown'),
+            }
+        )
+    return {'title': feed.feed.get('title', 'Unknown Feed'), 'entries': entries}
+
+
+class FeedParserPool:
+    """
+    Lazily started worker pool for ``parse_feed``.
+
+    ``workers`` processes are used; with ``workers=0`` parsing runs in a single
+    background thread instead (no extra processes, still off the event loop).
+    A crashed process pool is replaced on the next call.
+    """
+
+    def __init__(self, workers: int):
+        self.workers = workers
+        self._executor: Executor | None = None
+        self.stats: dict[str, int] = {'parsed': 0, 'pool_restarts': 0}
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            if self.workers > 0:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers, mp_context=multiprocessing.get_context('spawn')
+                )
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='feed-parser')
+        return self._executor
+
+    async def parse(self, content: str) -> dict:
+        loop = asyncio.get_running_loop()
+        try:
+            result = await loop.run_in_executor(self._get_executor(), parse_feed, content)
+        except BrokenProcessPool:
+            logger.warning('Feed parser pool crashed; restarting it')
+            self.shutdown()
+            self.stats['pool_restarts'] += 1
+            result = await loop.run_in_executor(self._get_executor(), parse_feed, content)
+        self.stats['parsed'] += 1
+        return result
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
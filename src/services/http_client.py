@@ -0,0 +1,73 @@
+"""
+Shared, bot-scoped HTTP client.
+
+One long-lived ``aiohttp.ClientSession`` with a bounded connection pool,
+per-host connection limits and a DNS cache, so outbound requests (RSS feeds
+and friends) reuse TCP/TLS connections instead of opening a session per call.
+The session is created lazily on first use and recreated if it was closed.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+
+import aiohttp
+
+from src.config.config import HTTP_DNS_CACHE_TTL, HTTP_POOL_LIMIT, HTTP_POOL_LIMIT_PER_HOST, HTTP_USER_AGENT
+
+logger = logging.getLogger('VEKA.http')
+
+
+class HTTPClient:
+    """Lazily created, pooled ``aiohttp.ClientSession`` shared across the bot."""
+
+    def __init__(
+        self,
+        limit: int = HTTP_POOL_LIMIT,
+        limit_per_host: int = HTTP_POOL_LIMIT_PER_HOST,
+        dns_cache_ttl: int = HTTP_DNS_CACHE_TTL,
+    ):
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.dns_cache_ttl = dns_cache_ttl
+        self._session: aiohttp.ClientSession | None = None
+        self._lock = asyncio.Lock()
+
+    @property
+    def is_open(self) -> bool:
+        return self._session is not None and not self._session.closed
+
+    async def session(self) -> aiohttp.ClientSession:
+        """Return the shared session, creating it on first use."""
+        if self.is_open:
+            return self._session  # type: ignore[return-value]
+        async with self._lock:
+            if not self.is_open:
+                connector = aiohttp.TCPConnector(
+                    limit=self.limit,
+                    limit_per_host=self.limit_per_host,
+                    ttl_dns_cache=self.dns_cache_ttl,
+                )
+                self._session = aiohttp.ClientSession(
+                    connector=connector,
+                    headers={'User-Agent': HTTP_USER_AGENT},
+                )
+                logger.debug(
+                    'Opened shared HTTP session (limit=%d, per_host=%d, dns_ttl=%ds)',
+                    self.limit,
+                    self.limit_per_host,
+                    self.dns_cache_ttl,
+                )
+        return self._session  # type: ignore[return-value]
+
+    async def close(self) -> None:
+        """Close the shared session; the next ``session()`` call opens a new one."""
+        if self.is_open:
+            await self._session.close()  # type: ignore[union-attr]
+            logger.debug('Closed shared HTTP session')
+        self._session = None
+
+
+# Global HTTP client instance
+http_client = HTTPClient()
@@ -4,10 +4,12 @@ import logging
 from datetime import UTC, datetime
 
 from src.database.database import db
+from src.database.lanes import BACKGROUND, in_lane
 
 log = logging.getLogger('VEKA.inactivity')
 
 
+@in_lane(BACKGROUND)
 async def get_inactive_users(week_days: int, month_days: int) -> list[dict]:
     """Fetch users who are inactive past the week or month threshold, not yet notified."""
     rows = await db.fetch(
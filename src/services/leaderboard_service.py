@@ -0,0 +1,377 @@
+"""
+In-process leaderboard cache.
+
+Keeps a bounded top-K per ``users`` stat column so the leaderboard task,
+``/leaderboard`` are served from memory, plus an order-statistic index over
+every user's points for rank, percentile and "points to pass the next user"
+lookups. Both are seeded from PostgreSQL, updated with the absolute values
+returned by XP flushes and activity-minute updates, and periodically reconciled
+against the database to correct any drift.
+"""
+
+from __future__ import annotations
+
+import logging
+import time
+from array import array
+from bisect import bisect_left, bisect_right, insort
+from dataclasses import dataclass
+
+from src.config.config import LEADERBOARD_CACHE_SIZE
+from src.database.database import db
+
+logger = logging.getLogger('VEKA.leaderboard')
+
+LEADERBOARD_COLUMNS = (
+    'points',
+    'total_messages',
+    'total_voice_minutes',
+    'total_streaming_minutes',
+    'total_gaming_minutes',
+    'total_listening_minutes',
+)
+
+
+def _level_for(points: int) -> int:
+    # Mirrors rpg_manager.calculate_level without importing the cog module
+    if points <= 0:
+        return 0
+    return int((points / 100) ** 0.5)
+
+
+class TopK:
+    """Bounded, sorted top-K of (user_id, value) pairs with O(K) updates and O(log K) rank lookups."""
+
+    __slots__ = ('capacity', '_values', '_order')
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self._values: dict[str, int] = {}
+        # Sorted ascending by (-value, user_id), so the highest value comes first
+        self._order: list[tuple[int, str]] = []
+
+    def __len__(self) -> int:
+        return len(self._order)
+
+    def __contains__(self, user_id: str) -> bool:
+        return user_id in self._values
+
+    def _remove(self, user_id: str) -> None:
+        old = self._values.pop(user_id)
+        del self._order[bisect_left(self._order, (-old, user_id))]
+
+    def update(self, user_id: str, value: int) -> None:
+        """Set a user's absolute value, admitting or evicting them as needed."""
+        old = self._values.get(user_id)
+        if old == value:
+            return
+        if old is not None:
+            self._remove(user_id)
+        if value <= 0:
+            return
+        if len(self._order) >= self.capacity and value <= -self._order[-1][0]:
+            return
+
+        insort(self._order, (-value, user_id))
+        self._values[user_id] = value
+        if len(self._order) > self.capacity:
+            _, evicted = self._order.pop()
+            del self._values[evicted]
+
+    def replace(self, items: list[tuple[str, int]]) -> None:
+        """Reset the structure from a fresh (user_id, value) list."""
+        self._values = {}
+        self._order = []
+        for user_id, value in items:
+            if value and value > 0:
+                self._values[user_id] = value
+        self._order = sorted((-value, user_id) for user_id, value in self._values.items())[: self.capacity]
+        self._values = {user_id: -neg for neg, user_id in self._order}
+
+    def top(self, limit: int) -> list[tuple[str, int]]:
+        return [(user_id, -neg) for neg, user_id in self._order[:limit]]
+
+    def value(self, user_id: str) -> int | None:
+        return self._values.get(user_id)
+
+    def rank(self, user_id: str) -> int | None:
+        """1-indexed rank (users with a strictly higher value + 1), or None if not tracked."""
+        value = self._values.get(user_id)
+        if value is None:
+            return None
+        return bisect_left(self._order, (-value, '')) + 1
+
+
+@dataclass(frozen=True)
+class RankStanding:
+    """A user's position in the XP ranking."""
+
+    rank: int
+    percentile: float  # share of other users with fewer points, 0-100
+    points_to_next: int | None  # points needed to pass the next user up, None when already first
+
+
+class RankIndex:
+    """
+    Order-statistic index over every user's points.
+
+    Points are kept in sorted ``array('q')`` buckets of at most
+    ``2 * bucket_size`` values, with each bucket's maximum in a list and the
+    bucket sizes in a Fenwick tree. Counting the users below a value is a
+    bisect over the maxima, one inside a bucket and an O(log buckets) prefix
+    sum. An update moves memory within one bucket only, not across the whole
+    index. Splitting a full bucket or dropping an empty one rebuilds the tree,
+    which is O(buckets) but happens about once per ``bucket_size`` updates.
+    """
+
+    def __init__(self, bucket_size: int = 1024):
+        self.bucket_size = bucket_size
+        self._points: dict[int, int] = {}
+        self._buckets: list[array] = []
+        self._maxes: list[int] = []
+        self._tree: list[int] = [0]  # Fenwick tree over bucket sizes, 1-based
+        self._len = 0
+
+    def __len__(self) -> int:
+        return self._len
+
+    def load(self, items) -> None:
+        """Replace the index from (discord_id, points) pairs."""
+        self._points = {int(user_id): max(0, points or 0) for user_id, points in items}
+        values = sorted(self._points.values())
+        size = self.bucket_size
+        self._buckets = [array('q', values[start : start + size]) for start in range(0, len(values), size)]
+        self._maxes = [bucket[-1] for bucket in self._buckets]
+        self._len = len(values)
+        self._rebuild_tree()
+
+    def update(self, user_id: str | int, points: int) -> None:
+        """Set a user's absolute points."""
+        key = int(user_id)
+        points = max(0, points or 0)
+        old = self._points.get(key)
+        if old == points:
+            return
+        if old is not None:
+            self._remove(old)
+        self._insert(points)
+        self._points[key] = points
+
+    def standing(self, user_id: str | int, extra: int = 0) -> RankStanding:
+        """
+        Rank a user by their indexed points plus ``extra`` not-yet-flushed points.
+
+        Users without an indexed row rank as if they had zero points, matching
+        ``COUNT(*) + 1 ... WHERE points > x`` in SQL.
+        """
+        key = int(user_id)
+        own = self._points.get(key)
+        points = (own or 0) + max(0, extra)
+        total = self._len
+
+        above = self._count(points, inclusive=True)
+        # The user's own (possibly stale, never higher) entry is never counted as above
+        below = self._count(points, inclusive=False)
+        others = total
+        if own is not None:
+            others -= 1
+            if own < points:
+                below -= 1
+
+        percentile = 100.0 if others <= 0 else below / others * 100
+        next_up = self._next_above(points)
+        points_to_next = None if next_up is None else next_up - points + 1
+        return RankStanding(rank=total - above + 1, percentile=percentile, points_to_next=points_to_next)
+
+    def _count(self, value: int, inclusive: bool) -> int:
+        """Number of indexed points below ``value`` (or at most ``value`` when ``inclusive``)."""
+        search = bisect_right if inclusive else bisect_left
+        index = search(self._maxes, value)
+        if index == len(self._buckets):
+            return self._len
+        return self._prefix(index) + search(self._buckets[index], value)
+
+    def _next_above(self, value: int) -> int | None:
+        """Smallest indexed points greater than ``value``."""
+        index = bisect_right(self._maxes, value)
+        if index == len(self._buckets):
+            return None
+        bucket = self._buckets[index]
+        return bucket[bisect_right(bucket, value)]
+
+    def _insert(self, value: int) -> None:
+        if not self._buckets:
+            self._buckets.append(array('q', [value]))
+            self._maxes.append(value)
+            self._len = 1
+            self._rebuild_tree()
+            return
+        # Past the last maximum goes into the last bucket
+        index = min(bisect_left(self._maxes, value), len(self._buckets) - 1)
+        bucket = self._buckets[index]
+        insort(bucket, value)
+        self._maxes[index] = bucket[-1]
+        self._len += 1
+        if len(bucket) > 2 * self.bucket_size:
+            half = len(bucket) // 2
+            self._buckets[index : index + 1] = [bucket[:half], bucket[half:]]
+            self._maxes[index : index + 1] = [bucket[half - 1], bucket[-1]]
+            self._rebuild_tree()
+        else:
+            self._add(index, 1)
+
+    def _remove(self, value: int) -> None:
+        index = bisect_left(self._maxes, value)
+        bucket = self._buckets[index]
+        del bucket[bisect_left(bucket, value)]
+        self._len -= 1
+        if bucket:
+            self._maxes[index] = bucket[-1]
+            self._add(index, -1)
+        else:
+            del self._buckets[index]
+            del self._maxes[index]
+            self._rebuild_tree()
+
+    def _rebuild_tree(self) -> None:
+        tree = [0]
+        tree.extend(len(bucket) for bucket in self._buckets)
+        for index in range(1, len(tree)):
+            parent = index + (index & -index)
+            if parent < len(tree):
+                tree[parent] += tree[index]
+        self._tree = tree
+
+    def _add(self, bucket_index: int, delta: int) -> None:
+        tree = self._tree
+        index = bucket_index + 1
+        while index < len(tree):
+            tree[index] += delta
+            index += index & -index
+
+    def _prefix(self, bucket_count: int) -> int:
+        """Total size of the first ``bucket_count`` buckets."""
+        tree = self._tree
+        total = 0
+        while bucket_count:
+            total += tree[bucket_count]
+            bucket_count -= bucket_count & -bucket_count
+        return total
+
+
+class LeaderboardCache:
+    """Top-K snapshot per leaderboard column, kept in sync with XP writes."""
+
+    def __init__(self, capacity: int = LEADERBOARD_CACHE_SIZE):
+        self.capacity = capacity
+        self._boards: dict[str, TopK] = {column: TopK(capacity) for column in LEADERBOARD_COLUMNS}
+        self._usernames: dict[str, str | None] = {}
+        self.ranks = RankIndex()
+        self.seeded = False
+        self.last_reconciled: float | None = None
+        self.stats: dict[str, int] = {'reconciles': 0, 'updates': 0, 'drift_corrections': 0}
+        # Observations made while a reconcile is awaiting its snapshot, as (column, user_id, value);
+        # a column of None is a rank index update. Replayed over the snapshot so it never rolls them back
+        self._journals: list[list[tuple[str | None, str, int]]] = []
+
+    async def reconcile(self) -> None:
+        """Reload every board from PostgreSQL, counting entries that had drifted."""
+        journal: list[tuple[str | None, str, int]] = []
+        self._journals.append(journal)
+        try:
+            await self._reload(journal)
+        finally:
+            self._journals.remove(journal)
+
+    async def _reload(self, journal: list[tuple[str | None, str, int]]) -> None:
+        fresh: dict[str, list[tuple[str, int]]] = {}
+        usernames: dict[str, str | None] = {}
+        for column in LEADERBOARD_COLUMNS:
+            rows = await db.fetch(
+                f"""
+                SELECT discord_id, username, {column} AS value
+                FROM users
+                WHERE {column} > 0
+                ORDER BY {column} DESC
+                LIMIT $1
+                """,
+                self.capacity,
+            )
+            fresh[column] = [(row['discord_id'], row['value']) for row in rows]
+            if column == 'points':
+                usernames = {row['discord_id']: row['username'] for row in rows}
+
+        drift = 0
+        for column, items in fresh.items():
+            board = self._boards[column]
+            if self.seeded:
+                drift += sum(1 for user_id, value in items if board.value(user_id) != value)
+            board.replace(items)
+
+        self._usernames = usernames
+        point_rows = await db.fetch('SELECT discord_id, COALESCE(points, 0) AS points FROM users')
+        self.ranks.load((row['discord_id'], row['points']) for row in point_rows)
+        # Writes observed during the awaits above may be newer than the snapshot rows
+        for observed, user_id, value in journal:
+            if observed is None:
+                self.ranks.update(user_id, value)
+            else:
+                self._boards[observed].update(user_id, value)
+        self.stats['reconciles'] += 1
+        self.stats['drift_corrections'] += drift
+        if self.seeded and drift:
+            logger.info('Leaderboard reconcile corrected %d drifted entries', drift)
+        self.seeded = True
+        self.last_reconciled = time.monotonic()
+
+    def observe(self, rows) -> None:
+        """Apply absolute column values from rows returned by a write (e.g. ``RETURNING``)."""
+        for row in rows:
+            user_id = row['discord_id']
+            if 'points' in row.keys():
+                self.ranks.update(user_id, row['points'])
+                self._journal(None, user_id, row['points'])
+            for column in LEADERBOARD_COLUMNS:
+                if column in row.keys() and row[column] is not None:
+                    self._boards[column].update(user_id, row[column])
+                    self._journal(column, user_id, row[column])
+            self.stats['updates'] += 1
+
+    def observe_value(self, column: str, user_id: str, value: int | None) -> None:
+        """Apply a single absolute column value for one user."""
+        if value is None or column not in self._boards:
+            return
+        self._boards[column].update(user_id, value)
+        self._journal(column, user_id, value)
+        self.stats['updates'] += 1
+
+    def _journal(self, column: str | None, user_id: str, value: int) -> None:
+        for journal in self._journals:
+            journal.append((column, user_id, value))
+
+    def has_column(self, column: str) -> bool:
+        return column in self._boards
+
+    def top(self, column: str, limit: int) -> list[dict]:
+        """Return the top ``limit`` users for a column, shaped like the SQL rows it replaces."""
+        results = []
+        for user_id, value in self._boards[column].top(limit):
+            entry: dict = {'discord_id': user_id, column: value}
+            if column == 'points':
+                entry['username'] = self._usernames.get(user_id)
+                entry['experience'] = value
+                entry['level'] = _level_for(value)
+            results.append(entry)
+        return results
+
+    def rank(self, user_id: str, column: str = 'points') -> int | None:
+        """Rank for users inside the cached top-K; None when the user is not tracked."""
+        return self._boards[column].rank(user_id)
+
+    def standing(self, user_id: str | int, extra: int = 0) -> RankStanding:
+        """XP rank, percentile and points to the next user, from the full rank index."""
+        return self.ranks.standing(user_id, extra)
+
+
+# Global leaderboard cache instance
+leaderboard_cache = LeaderboardCache()
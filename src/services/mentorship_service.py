@@ -1,7 +1,9 @@
 import logging
 
 from src.config.config import MENTORSHIP_CATEGORIES
-from src.database.database import db, get_or_create_user
+from src.database.backend import DatabaseBackend
+from src.database.database import db
+from src.database.identity_map import user_ids
 
 logger = logging.getLogger('VEKA.mentorship')
 
@@ -10,9 +12,8 @@ class MentorshipService:
     def __init__(self, bot):
         self.bot = bot
 
-    async def _resolve_user_id(self, discord_id: str) -> int:
-        user = await get_or_create_user(discord_id)
-        return user['id']
+    async def _resolve_user_id(self, discord_id: str, conn: DatabaseBackend | None = None) -> int:
+        return await user_ids.resolve(discord_id, conn=conn)
 
     async def create_mentorship_request(self, mentor_id: str, mentee_id: str, category: str) -> dict:
         if category not in MENTORSHIP_CATEGORIES:
@@ -39,28 +40,31 @@ class MentorshipService:
         return mentorship
 
     async def accept_mentorship(self, mentorship_id: int, mentor_id: str) -> dict:
-        mentorship = await self.get_mentorship(mentorship_id)
-        if not mentorship:
-            raise ValueError('Mentorship not found')
-
-        mentor_user_id = await self._resolve_user_id(mentor_id)
-        if mentorship['mentor_id'] != mentor_user_id:
-            raise ValueError('Only the mentor can accept this request')
-
-        if mentorship['status'] != 'pending':
-            raise ValueError(f'Cannot accept mentorship with status: {mentorship["status"]}')
-
-        await db.execute(
-            """
-            UPDATE mentorships
-            SET status = 'active', updated_at = NOW()
-            WHERE id = $1
-            """,
-            mentorship_id,
-        )
+        async with db.transaction() as tx:
+            # Lock the row so two concurrent accepts cannot both see 'pending'
+            mentorship = await tx.fetch_one('SELECT * FROM mentorships WHERE id = $1 FOR UPDATE', mentorship_id)
+            if not mentorship:
+                raise ValueError('Mentorship not found')
+
+            mentor_user_id = await self._resolve_user_id(mentor_id, conn=tx)
+            if mentorship['mentor_id'] != mentor_user_id:
+                raise ValueError('Only the mentor can accept this request')
+
+            if mentorship['status'] != 'pending':
+                raise ValueError(f'Cannot accept mentorship with status: {mentorship["status"]}')
+
+            updated = await tx.fetch_one(
+                """
+                UPDATE mentorships
+                SET status = 'active', updated_at = NOW()
+                WHERE id = $1
+                RETURNING *
+                """,
+                mentorship_id,
+            )
 
-        mentorship['status'] = 'active'
-        return mentorship
+        assert updated is not None
+        return dict(updated)
 
     async def complete_mentorship(self, mentorship_id: int, mentor_id: str) -> dict:
         mentorship = await self.get_mentorship(mentorship_id)
@@ -1,6 +1,7 @@
 import logging
 
-from src.database.database import db, get_or_create_user
+from src.database.database import db
+from src.database.identity_map import user_ids
 
 logger = logging.getLogger('VEKA.networking')
 
@@ -9,8 +10,7 @@ class NetworkingService:
     """Database-backed networking service for profiles and connections."""
 
     async def _resolve_user_id(self, discord_id: str) -> int:
-        user = await get_or_create_user(discord_id)
-        return user['id']
+        return await user_ids.resolve(discord_id)
 
     async def get_profile(self, discord_id: str) -> dict | None:
         return await db.fetch_one(
@@ -0,0 +1,571 @@
+"""
+Coalesced presence ingestion for activity-duration tracking.
+
+With the ``presences`` intent, ``on_member_update`` fires for every status and
+activity change of every member. Tracking used to run four passes per event
+and await UPDATE/upsert statements inline on the gateway dispatch path. Now:
+
+1. The listener reduces the member to a ``PresenceSnapshot`` (one pass over
+   ``member.activities``) and calls ``submit``, which only records it as the
+   user's latest snapshot. Nothing is awaited.
+2. ``window`` seconds after the first pending snapshot, ``drain`` diffs each
+   user's latest snapshot against their open sessions in one pass. A burst of
+   updates for one member therefore costs one diff. Ended sessions become whole
+   minutes in a buffer aggregated per (user, category) and per
+   (user, activity type, name). Open sessions are kept compactly: one
+   ``UserSessions`` record per member with open sessions (dropped when the
+   last one closes), holding activity names as ids interned by
+   ``ActivityNames``.
+3. ``flush`` (driven by the RPG cog every ``PRESENCE_FLUSH_INTERVAL``) writes
+   the buffer in two batched statements: one ``unnest`` UPDATE for the
+   streaming/gaming/listening totals and one ``unnest`` upsert for
+   ``user_activity_details`` (``add_detail_minutes``). ``checkpoint`` (the
+   cog's session checkpoint, every ``PRESENCE_CHECKPOINT_INTERVAL``) also
+   banks the whole minutes of sessions that are still running and writes them
+   in one transaction with the ``session_store`` snapshot of what remains
+   open; ``resume`` restores that snapshot after a restart.
+
+Coalescing can shift a session boundary by at most ``window`` seconds.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from array import array
+from collections import Counter
+from collections.abc import Iterable
+from dataclasses import dataclass
+
+import nextcord
+
+from src.config.config import (
+    CODING_APPS,
+    PRESENCE_COALESCE_WINDOW,
+    PRESENCE_MAX_BUFFERED,
+)
+from src.database.database import db
+from src.database.statements import statements
+from src.services.activity_details import add_detail_minutes
+from src.services.leaderboard_service import leaderboard_cache
+from src.services.session_store import CATEGORY_SESSION, session_store
+from src.utils.safety import DatabaseUnavailableError
+
+logger = logging.getLogger('VEKA.presence')
+
+CATEGORIES = ('streaming', 'gaming', 'listening')
+
+_ADD_CATEGORY_MINUTES_SQL = statements.register(
+    'presence.add_category_minutes',
+    """
+    UPDATE users AS u SET
+        total_streaming_minutes = COALESCE(u.total_streaming_minutes, 0) + d.streaming,
+        total_gaming_minutes = COALESCE(u.total_gaming_minutes, 0) + d.gaming,
+        total_listening_minutes = COALESCE(u.total_listening_minutes, 0) + d.listening
+    FROM unnest($1::VARCHAR[], $2::INT[], $3::INT[], $4::INT[]) AS d(discord_id, streaming, gaming, listening)
+    WHERE u.discord_id = d.discord_id
+    RETURNING u.discord_id, u.total_streaming_minutes, u.total_gaming_minutes, u.total_listening_minutes
+    """,
+)
+
+
+@dataclass(frozen=True, slots=True)
+class PresenceSnapshot:
+    """What the tracker needs from one member's presence."""
+
+    categories: frozenset[str] = frozenset()
+    # (activity_type, activity_name): 'game', 'streaming_game', 'coding' or 'listening'
+    details: frozenset[tuple[str, str]] = frozenset()
+
+
+EMPTY_PRESENCE = PresenceSnapshot()
+
+
+def _is_coding_activity(activity_name: str) -> bool:
+    name_lower = activity_name.lower()
+    return any(coding_app in name_lower for coding_app in CODING_APPS)
+
+
+def snapshot_member(member: nextcord.Member) -> PresenceSnapshot:
+    """Reduce a member's activities to a snapshot in a single pass."""
+    categories: set[str] = set()
+    details: set[tuple[str, str]] = set()
+    games: list[str] = []
+    for activity in member.activities:
+        activity_type = activity.type
+        name = activity.name
+        if activity_type == nextcord.ActivityType.streaming:
+            categories.add('streaming')
+        elif activity_type == nextcord.ActivityType.playing:
+            categories.add('gaming')
+            if name:
+                games.append(name)
+                details.add(('game', name))
+                if _is_coding_activity(name):
+                    details.add(('coding', name))
+        elif activity_type == nextcord.ActivityType.listening:
+            categories.add('listening')
+            # Spotify carries the song in ``details`` and the artist in ``state``
+            song = getattr(activity, 'details', None)
+            artist = getattr(activity, 'state', None)
+            if song:
+                details.add(('listening', song))
+            if artist:
+                details.add(('listening', artist))
+            details.add(('listening', name or 'Unknown'))
+        elif activity_type == nextcord.ActivityType.custom and name and _is_coding_activity(name):
+            details.add(('coding', name))
+
+    if 'streaming' in categories:
+        details.update(('streaming_game', game) for game in games)
+    if not categories and not details:
+        return EMPTY_PRESENCE
+    return PresenceSnapshot(frozenset(categories), frozenset(details))
+
+
+class ActivityNames:
+    """
+    Interns (activity_type, activity_name) pairs into small integer ids.
+
+    Song and game titles arrive as fresh strings in every presence update; open
+    sessions hold an id instead, and one canonical copy of each pair lives here.
+    Ids are reference counted by the sessions using them and recycled once the
+    last one closes, so titles nobody plays any more do not accumulate.
+    """
+
+    __slots__ = ('_ids', '_pairs', '_refs', '_free')
+
+    def __init__(self) -> None:
+        # activity_type -> activity_name -> id; nested so lookups build no key tuple
+        self._ids: dict[str, dict[str, int]] = {}
+        self._pairs: list[tuple[str, str] | None] = []
+        self._refs = array('I')
+        self._free: list[int] = []
+
+    def __len__(self) -> int:
+        return len(self._pairs) - len(self._free)
+
+    def find(self, activity_type: str, name: str) -> int | None:
+        names = self._ids.get(activity_type)
+        return names.get(name) if names is not None else None
+
+    def acquire(self, activity_type: str, name: str) -> int:
+        """Id of the pair, interning it if needed; the caller holds one reference."""
+        names = self._ids.setdefault(activity_type, {})
+        detail_id = names.get(name)
+        if detail_id is None:
+            if self._free:
+                detail_id = self._free.pop()
+                self._pairs[detail_id] = (activity_type, name)
+            else:
+                detail_id = len(self._pairs)
+                self._pairs.append((activity_type, name))
+                self._refs.append(0)
+            names[name] = detail_id
+        self._refs[detail_id] += 1
+        return detail_id
+
+    def release(self, detail_id: int) -> None:
+        self._refs[detail_id] -= 1
+        if self._refs[detail_id]:
+            return
+        activity_type, name = self.pair(detail_id)
+        names = self._ids[activity_type]
+        del names[name]
+        if not names:
+            del self._ids[activity_type]
+        self._pairs[detail_id] = None
+        self._free.append(detail_id)
+
+    def pair(self, detail_id: int) -> tuple[str, str]:
+        pair = self._pairs[detail_id]
+        if pair is None:
+            raise KeyError(detail_id)
+        return pair
+
+
+class UserSessions:
+    """One member's open sessions: a start per category slot and interned detail id -> start (monotonic)."""
+
+    __slots__ = ('streaming', 'gaming', 'listening', 'details')
+
+    def __init__(self) -> None:
+        self.streaming: float | None = None
+        self.gaming: float | None = None
+        self.listening: float | None = None
+        self.details: dict[int, float] = {}
+
+    def __bool__(self) -> bool:
+        return bool(self.details) or any(getattr(self, category) is not None for category in CATEGORIES)
+
+
+def _category_args(batch: Counter[tuple[int, str]]) -> tuple[dict[int, list[int]], tuple[list, ...]]:
+    """Per-user minutes per category slot, and the ``unnest`` arguments for ``presence.add_category_minutes``."""
+    per_user: dict[int, list[int]] = {}
+    for (user_id, category), minutes in batch.items():
+        per_user.setdefault(user_id, [0, 0, 0])[CATEGORIES.index(category)] += minutes
+    user_ids = list(per_user)
+    args = (
+        [str(user_id) for user_id in user_ids],
+        [per_user[user_id][0] for user_id in user_ids],
+        [per_user[user_id][1] for user_id in user_ids],
+        [per_user[user_id][2] for user_id in user_ids],
+    )
+    return per_user, args
+
+
+def _observe_category_totals(per_user: dict[int, list[int]], rows) -> None:
+    """Push the totals returned by the category update to the leaderboard cache."""
+    for row in rows:
+        user_minutes = per_user[int(row['discord_id'])]
+        for index, category in enumerate(CATEGORIES):
+            if user_minutes[index]:
+                column = f'total_{category}_minutes'
+                leaderboard_cache.observe_value(column, row['discord_id'], row[column])
+
+
+class PresencePipeline:
+    """Per-user coalescing of presence snapshots, session diffing and batched duration writes."""
+
+    def __init__(
+        self,
+        window: float = PRESENCE_COALESCE_WINDOW,
+        max_buffered: int = PRESENCE_MAX_BUFFERED,
+    ):
+        self.window = window
+        self.max_buffered = max_buffered
+        # user_id -> (observed_at, latest snapshot) awaiting the next drain
+        self._pending: dict[int, tuple[float, PresenceSnapshot]] = {}
+        self._drain_task: asyncio.Task | None = None
+        # Open sessions per user; users with none are dropped
+        self._users: dict[int, UserSessions] = {}
+        self._names = ActivityNames()
+        # Whole minutes waiting for ``flush``
+        self._category_minutes: Counter[tuple[int, str]] = Counter()
+        self._detail_minutes: Counter[tuple[int, str, str]] = Counter()
+        self._flush_lock = asyncio.Lock()
+        # Set while a checkpoint transaction is in flight; drains wait so banked sessions stay put
+        self._checkpointing = False
+        self.stats: dict[str, float] = {
+            'events': 0,
+            'coalesced': 0,
+            'drains': 0,
+            'diffs': 0,
+            'sessions_closed': 0,
+            'sessions_banked': 0,
+            'max_queue_depth': 0,
+            'last_drain_ms': 0.0,
+            'flushes': 0,
+            'rows_written': 0,
+            'failed_flushes': 0,
+            'dropped': 0,
+        }
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self._pending)
+
+    @property
+    def buffered(self) -> int:
+        return len(self._category_minutes) + len(self._detail_minutes)
+
+    def submit(self, user_id: int, snapshot: PresenceSnapshot, observed_at: float | None = None) -> None:
+        """Record a user's latest presence; a pending one for the same user is replaced."""
+        self.stats['events'] += 1
+        if user_id in self._pending:
+            self.stats['coalesced'] += 1
+        self._pending[user_id] = (time.monotonic() if observed_at is None else observed_at, snapshot)
+        if len(self._pending) > self.stats['max_queue_depth']:
+            self.stats['max_queue_depth'] = len(self._pending)
+        self._schedule_drain()
+
+    def _schedule_drain(self) -> None:
+        if self._drain_task is not None and not self._drain_task.done():
+            return
+        try:
+            self._drain_task = asyncio.get_running_loop().create_task(self._delayed_drain())
+        except RuntimeError:
+            pass  # No running loop (replays, shutdown); call ``drain`` directly
+
+    async def _delayed_drain(self) -> None:
+        await asyncio.sleep(self.window)
+        self.drain()
+
+    def drain(self) -> int:
+        """Diff every pending snapshot against the open sessions. Returns the number of users diffed."""
+        if not self._pending or self._checkpointing:
+            return 0
+        started = time.perf_counter()
+        pending, self._pending = self._pending, {}
+        diffs = 0
+        for user_id, (observed_at, snapshot) in pending.items():
+            if self._apply(user_id, snapshot, observed_at):
+                diffs += 1
+
+        self.stats['drains'] += 1
+        self.stats['diffs'] += diffs
+        self.stats['last_drain_ms'] = round((time.perf_counter() - started) * 1000, 3)
+        return diffs
+
+    def _apply(self, user_id: int, current: PresenceSnapshot, now: float) -> bool:
+        """Close the sessions ``current`` no longer has and open the new ones. Returns whether anything changed."""
+        record = self._users.get(user_id)
+        if record is None:
+            if current is EMPTY_PRESENCE:
+                return False
+            record = self._users[user_id] = UserSessions()
+
+        changed = False
+        for category in CATEGORIES:
+            start = getattr(record, category)
+            if category in current.categories:
+                if start is None:
+                    setattr(record, category, now)
+                    changed = True
+            elif start is not None:
+                setattr(record, category, None)
+                self._bank(self._category_minutes, (user_id, category), now - start)
+                changed = True
+
+        details = record.details
+        names = self._names
+        seen = 0
+        for activity_type, name in current.details:
+            detail_id = names.find(activity_type, name)
+            if detail_id is None or detail_id not in details:
+                details[names.acquire(activity_type, name)] = now
+                changed = True
+            seen += 1
+        if seen != len(details):
+            # Some open sessions are not in ``current``
+            current_ids = {names.find(activity_type, name) for activity_type, name in current.details}
+            for detail_id in [detail_id for detail_id in details if detail_id not in current_ids]:
+                activity_type, name = names.pair(detail_id)
+                self._bank(self._detail_minutes, (user_id, activity_type, name), now - details.pop(detail_id))
+                names.release(detail_id)
+            changed = True
+
+        if not record:
+            del self._users[user_id]
+        return changed
+
+    def _bank(self, buffer: Counter, key: tuple, elapsed: float) -> None:
+        self.stats['sessions_closed'] += 1
+        minutes = int(elapsed / 60)
+        if minutes < 1:
+            return
+        if key not in buffer and self.buffered >= self.max_buffered:
+            self.stats['dropped'] += 1
+            return
+        buffer[key] += minutes
+        self.stats['sessions_banked'] += 1
+
+    def _running_minutes(self, now: float) -> dict[tuple[int, str, str], tuple[int, float]]:
+        """Whole minutes of running sessions, as session key -> (minutes, start past those minutes)."""
+        banked = {}
+        for user_id, activity_type, name, start in self.open_sessions():
+            minutes = int((now - start) / 60)
+            if minutes >= 1:
+                # Keep the partial minute for the next checkpoint
+                banked[(user_id, activity_type, name)] = (minutes, start + minutes * 60)
+        return banked
+
+    def _advance(self, banked: dict[tuple[int, str, str], tuple[int, float]]) -> None:
+        """Move the starts of banked sessions past their banked minutes."""
+        for (user_id, activity_type, name), (_, start) in banked.items():
+            record = self._users[user_id]
+            if activity_type == CATEGORY_SESSION:
+                setattr(record, name, start)
+            else:
+                detail_id = self._names.find(activity_type, name)
+                assert detail_id is not None
+                record.details[detail_id] = start
+        self.stats['sessions_banked'] += len(banked)
+
+    def open_sessions(self) -> list[tuple[int, str, str, float]]:
+        """Running sessions as (user_id, activity_type, activity_name, monotonic start)."""
+        sessions = []
+        for user_id, record in self._users.items():
+            for category in CATEGORIES:
+                start = getattr(record, category)
+                if start is not None:
+                    sessions.append((user_id, CATEGORY_SESSION, category, start))
+            for detail_id, start in record.details.items():
+                sessions.append((user_id, *self._names.pair(detail_id), start))
+        return sessions
+
+    def resume(
+        self,
+        user_id: int,
+        snapshot: PresenceSnapshot,
+        started: dict[tuple[str, str], float],
+        now: float | None = None,
+    ) -> None:
+        """
+        Open sessions for a member's presence after a restart. Sessions in
+        ``started`` ((activity_type, activity_name) -> monotonic start, from
+        ``open_sessions`` before the restart) continue from their old start if
+        the member is still in them; the rest begin ``now``. Call ``drain``
+        first so updates received since startup are applied.
+        """
+        now = time.monotonic() if now is None else now
+        if user_id not in self._users:
+            self._apply(user_id, snapshot, now)
+        record = self._users.get(user_id)
+        if record is None:
+            return
+        for (activity_type, name), start in started.items():
+            if activity_type == CATEGORY_SESSION:
+                current = getattr(record, name, None) if name in CATEGORIES else None
+                if current is not None and start < current:
+                    setattr(record, name, start)
+                continue
+            detail_id = self._names.find(activity_type, name)
+            if detail_id is not None and start < record.details.get(detail_id, start):
+                record.details[detail_id] = start
+
+    async def flush(self) -> int:
+        """Write buffered minutes in two batched statements. Returns the number of rows written."""
+        self.drain()
+        async with self._flush_lock:
+            return await self._flush_buffers()
+
+    async def checkpoint(self, sessions: Iterable[tuple[int, str, str, float]] | None = None) -> int:
+        """
+        Bank the whole minutes of running sessions, keeping them open, and write
+        everything buffered. Returns the number of rows written.
+
+        ``sessions`` are open sessions tracked elsewhere (voice). When given,
+        the ``session_store`` snapshot of every open session is replaced in the
+        same transaction as the minutes, and starts only move past the banked
+        minutes once it commits, so the snapshot always matches what was
+        banked: a failure neither loses nor double-counts minutes. Drains wait
+        for the transaction. While writes are deferred to the outbox nothing is
+        banked; the buffer is flushed and the snapshot keeps the current starts.
+        Failures other than flushing the buffer are raised.
+        """
+        self.drain()
+        async with self._flush_lock:
+            if sessions is None:
+                banked = self._running_minutes(time.monotonic())
+                for (user_id, activity_type, name), (minutes, _) in banked.items():
+                    if activity_type == CATEGORY_SESSION:
+                        self._category_minutes[(user_id, name)] += minutes
+                    else:
+                        self._detail_minutes[(user_id, activity_type, name)] += minutes
+                self._advance(banked)
+                return await self._flush_buffers()
+            if db.deferring_writes:
+                written = await self._flush_buffers()
+                await session_store.save(self.open_sessions() + list(sessions))
+                return written
+
+            self._checkpointing = True
+            try:
+                return await self._write_checkpoint(list(sessions))
+            finally:
+                self._checkpointing = False
+                self.drain()
+
+    async def _write_checkpoint(self, sessions: list[tuple[int, str, str, float]]) -> int:
+        banked = self._running_minutes(time.monotonic())
+        category_batch, self._category_minutes = self._category_minutes, Counter()
+        detail_batch, self._detail_minutes = self._detail_minutes, Counter()
+        category_minutes = category_batch.copy()
+        detail_minutes = detail_batch.copy()
+        for (user_id, activity_type, name), (minutes, _) in banked.items():
+            if activity_type == CATEGORY_SESSION:
+                category_minutes[(user_id, name)] += minutes
+            else:
+                detail_minutes[(user_id, activity_type, name)] += minutes
+        for user_id, activity_type, name, start in self.open_sessions():
+            key = (user_id, activity_type, name)
+            sessions.append((*key, banked[key][1] if key in banked else start))
+
+        per_user, category_args = _category_args(category_minutes)
+        rows = []
+        committed = False
+        try:
+            async with db.transaction() as tx:
+                if per_user:
+                    rows = await tx.fetch(_ADD_CATEGORY_MINUTES_SQL, *category_args)
+                await add_detail_minutes(detail_minutes, conn=tx)
+                await session_store.save(sessions, conn=tx)
+            committed = True
+        finally:
+            if not committed:
+                # Nothing was written or banked; keep the buffered minutes for retry
+                self.stats['failed_flushes'] += 1
+                self._category_minutes.update(category_batch)
+                self._detail_minutes.update(detail_batch)
+
+        self._advance(banked)
+        _observe_category_totals(per_user, rows)
+        written = len(per_user) + len(detail_minutes)
+        if written:
+            self.stats['flushes'] += 1
+            self.stats['rows_written'] += written
+        return written
+
+    async def _flush_buffers(self) -> int:
+        written = 0
+        if self._category_minutes:
+            category_batch, self._category_minutes = self._category_minutes, Counter()
+            try:
+                written += await self._write_categories(category_batch)
+            except DatabaseUnavailableError as exc:
+                self._restore(self._category_minutes, category_batch, exc)
+        if self._detail_minutes:
+            detail_batch, self._detail_minutes = self._detail_minutes, Counter()
+            try:
+                written += await self._write_details(detail_batch)
+            except DatabaseUnavailableError as exc:
+                self._restore(self._detail_minutes, detail_batch, exc)
+        if written:
+            self.stats['flushes'] += 1
+            self.stats['rows_written'] += written
+        return written
+
+    def _restore(self, buffer: Counter, batch: Counter, exc: Exception) -> None:
+        self.stats['failed_flushes'] += 1
+        logger.warning('Presence duration flush failed, keeping %d rows for retry: %s', len(batch), exc)
+        # Re-merge under new entries; ``update`` adds counts for keys present in both
+        buffer.update(batch)
+
+    async def _write_categories(self, batch: Counter[tuple[int, str]]) -> int:
+        per_user, args = _category_args(batch)
+        if db.deferring_writes:
+            # Database unreachable: keep the minutes in the outbox; reconcile fixes the leaderboard
+            await db.execute(_ADD_CATEGORY_MINUTES_SQL, *args, outbox=True)
+            return len(per_user)
+
+        rows = await db.fetch(_ADD_CATEGORY_MINUTES_SQL, *args)
+        _observe_category_totals(per_user, rows)
+        return len(per_user)
+
+    async def _write_details(self, batch: Counter[tuple[int, str, str]]) -> int:
+        return await add_detail_minutes(batch)
+
+    async def shutdown(self, sessions: Iterable[tuple[int, str, str, float]] | None = None) -> None:
+        """Drain, bank running sessions and write everything (cog unload); see ``checkpoint``."""
+        if self._drain_task is not None:
+            self._drain_task.cancel()
+        await self.checkpoint(sessions)
+
+    def snapshot(self) -> dict:
+        return {
+            'queue_depth': self.queue_depth,
+            'active_users': len(self._users),
+            'open_sessions': sum(
+                len(record.details) + sum(getattr(record, category) is not None for category in CATEGORIES)
+                for record in self._users.values()
+            ),
+            'interned_names': len(self._names),
+            'buffered': self.buffered,
+            **self.stats,
+        }
+
+
+# Global presence pipeline instance
+presence_pipeline = PresencePipeline()
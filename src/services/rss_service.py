@@ -1,74 +1,174 @@
 import asyncio
 import logging
+import time
+from collections import OrderedDict, deque
 from datetime import datetime
+from urllib.parse import urlsplit
 
 import aiohttp
-import feedparser
-from bs4 import BeautifulSoup
 
-from src.config.config import RSS_FEEDS
+from src.config.config import (
+    RATE_LIMITS,
+    RSS_FEEDS,
+    RSS_FETCH_CONCURRENCY,
+    RSS_FETCH_TIMEOUT,
+    RSS_PARSE_WORKERS,
+    RSS_SEEN_CACHE_SIZE,
+)
 from src.database.database import db
+from src.database.outbox import is_connection_failure
+from src.services.feed_parser import FeedParserPool
+from src.services.http_client import http_client
 from src.utils.safety import DatabaseUnavailableError, ExternalRequestError
 
 logger = logging.getLogger('VEKA.rss')
 
+# Shared feed parser worker pool
+feed_parser_pool = FeedParserPool(RSS_PARSE_WORKERS)
+
+_INSERT_NEW_ENTRIES_SQL = """
+    INSERT INTO rss_cache (feed_url, entry_id, title, link, summary, author)
+    SELECT $1, e.entry_id, e.title, e.link, e.summary, e.author
+    FROM unnest($2::VARCHAR[], $3::VARCHAR[], $4::VARCHAR[], $5::TEXT[], $6::VARCHAR[])
+        AS e(entry_id, title, link, summary, author)
+    ON CONFLICT (feed_url, entry_id) DO NOTHING
+    RETURNING entry_id
+"""
+_ENTRY_ID_MAX_LENGTH = 500  # rss_cache.entry_id is VARCHAR(500)
+
+
+class HostRateLimiter:
+    """Sliding one-minute window of requests per host; ``acquire`` waits for a free slot."""
+
+    def __init__(self, per_minute: int):
+        self.per_minute = max(1, per_minute)
+        self._requests: dict[str, deque[float]] = {}
+        self._lock = asyncio.Lock()
+
+    async def acquire(self, url: str) -> None:
+        host = urlsplit(url).netloc
+        while True:
+            async with self._lock:
+                now = time.monotonic()
+                window = self._requests.setdefault(host, deque())
+                while window and now - window[0] >= 60:
+                    window.popleft()
+                if len(window) < self.per_minute:
+                    window.append(now)
+                    return
+                wait = 60 - (now - window[0])
+            await asyncio.sleep(wait)
+
 
 class RSSService:
     def __init__(self, bot=None):
         self.bot = bot
+        self._fetch_semaphore = asyncio.Semaphore(RSS_FETCH_CONCURRENCY)
+        self._host_limiter = HostRateLimiter(RATE_LIMITS['rss_fetch'])
+        # feed_url -> seconds the last fetch took, for observability
+        self.feed_latency: dict[str, float] = {}
+        # LRU of (feed_url, entry_id) keys already known to be in rss_cache
+        self._seen: OrderedDict[tuple[str, str], None] = OrderedDict()
+        self._seen_capacity = RSS_SEEN_CACHE_SIZE
+        # feed_url -> {'etag': ..., 'last_modified': ...}, persisted in rss_feed_state
+        self._validators: dict[str, dict[str, str | None]] = {}
+        self._validators_loaded = False
+        # feed_url -> last parsed feed data, reused when the server answers 304
+        self._parsed: dict[str, dict] = {}
 
-    async def fetch_feed(self, url: str) -> dict | None:
+    async def _load_validators(self) -> None:
+        """Load persisted ETag/Last-Modified validators once per process."""
+        from src.core.runtime_state import runtime_state
+
+        if self._validators_loaded or not runtime_state.db_available:
+            return
         try:
-            headers = {'User-Agent': 'VEKA-DiscordBot/1.0'}
-            async with aiohttp.ClientSession() as session:
-                async with session.get(url, headers=headers, timeout=aiohttp.ClientTimeout(total=10)) as response:
-                    if response.status != 200:
-                        raise ExternalRequestError(f'HTTP Status: {response.status}')
-                    content = await response.text()
+            rows = await db.fetch('SELECT feed_url, etag, last_modified FROM rss_feed_state')
+        except DatabaseUnavailableError as exc:
+            logger.debug('Could not load RSS feed validators: %s', exc)
+            return
+        for row in rows:
+            self._validators.setdefault(row['feed_url'], {'etag': row['etag'], 'last_modified': row['last_modified']})
+        self._validators_loaded = True
 
-            feed = feedparser.parse(content)
-            processed_entries = []
-            for entry in feed.entries[:10]:
-                soup = BeautifulSoup(entry.get('description', ''), 'html.parser')
-                text = soup.get_text()
-                clean_description = text[:500] + '...' if len(text) > 500 else text
-
-                entry_id = entry.get('id', entry.get('link', ''))
-                if not entry_id:
-                    continue
-
-                processed_entries.append(
-                    {
-                        'entry_id': entry_id,
-                        'title': entry.get('title', 'No title'),
-                        'link': entry.get('link', '#'),
-                        'description': clean_description,
-                        'published': entry.get('published', 'No date'),
-                        'author': entry.get('author', 'Unknown'),
-                    }
-                )
+    async def _save_validators(self, url: str, etag: str | None, last_modified: str | None) -> None:
+        """Remember a feed's validators in memory and persist them for the next restart."""
+        from src.core.runtime_state import runtime_state
+
+        self._validators[url] = {'etag': etag, 'last_modified': last_modified}
+        if not runtime_state.db_available:
+            return
+        try:
+            await db.execute(
+                """INSERT INTO rss_feed_state (feed_url, etag, last_modified, updated_at)
+                   VALUES ($1, $2, $3, NOW())
+                   ON CONFLICT (feed_url) DO UPDATE SET
+                       etag = EXCLUDED.etag,
+                       last_modified = EXCLUDED.last_modified,
+                       updated_at = NOW()""",
+                url,
+                etag,
+                last_modified,
+            )
+        except DatabaseUnavailableError as exc:
+            logger.debug('Could not persist RSS feed validators for %s: %s', url, exc)
 
-            feed_data = {
-                'title': feed.feed.get('title', 'Unknown Feed'),
-                'entries': processed_entries,
-            }
+    async def fetch_feed(self, url: str, require_entries: bool = False) -> dict | None:
+        """
+        Fetch and parse a feed over the shared HTTP session using a conditional GET.
 
-            # Handle recovery
-            from src.core.runtime_state import runtime_state
+        An unchanged feed (HTTP 304) is not parsed again: the result carries
+        ``not_modified=True`` and the entries parsed last time, if still held in
+        memory. Pass ``require_entries=True`` when the caller needs entries even
+        after a restart has emptied that cache; validators are then only sent
+        when a cached parse exists.
+        """
+        try:
+            await self._load_validators()
+            validators = self._validators.get(url, {})
+            if require_entries and url not in self._parsed:
+                validators = {}
 
-            fail_key = f'rss_fail_{url}'
-            if runtime_state.alert_state_cache.get(fail_key, 0) > 0:
-                runtime_state.alert_state_cache[fail_key] = 0
-                if self.bot and hasattr(self.bot, 'notifier'):
-                    self.bot.notifier.clear_cooldown(f'rss_alert_{url}')
-                    asyncio.create_task(
-                        self.bot.notifier.send_alert(
-                            title='RSS Feed Recovered',
-                            description=f'The RSS feed `{url}` is now responding correctly.',
-                            severity='INFO',
-                        )
-                    )
+            headers: dict[str, str] = {}
+            if etag := validators.get('etag'):
+                headers['If-None-Match'] = etag
+            if last_modified := validators.get('last_modified'):
+                headers['If-Modified-Since'] = last_modified
 
+            session = await http_client.session()
+            async with session.get(
+                url, headers=headers, timeout=aiohttp.ClientTimeout(total=RSS_FETCH_TIMEOUT)
+            ) as response:
+                if response.status == 304:
+                    content = None
+                elif response.status != 200:
+                    raise ExternalRequestError(f'HTTP Status: {response.status}')
+                else:
+                    content = await response.text()
+                    etag = response.headers.get('ETag')
+                    last_modified = response.headers.get('Last-Modified')
+
+            if content is None:
+                cached = self._parsed.get(url)
+                feed_data = {
+                    'title': cached['title'] if cached else 'Unknown Feed',
+                    'entries': cached['entries'] if cached else [],
+                    'not_modified': True,
+                }
+                self._handle_recovery(url)
+                return feed_data
+
+            # Parsing and HTML cleanup run in the worker pool, off the event loop
+            feed_data = await feed_parser_pool.parse(content)
+            feed_data['not_modified'] = False
+            self._parsed[url] = feed_data
+            if (etag or last_modified) and (etag, last_modified) != (
+                validators.get('etag'),
+                validators.get('last_modified'),
+            ):
+                await self._save_validators(url, etag, last_modified)
+
+            self._handle_recovery(url)
             return feed_data
 
         except Exception as exc:
@@ -91,60 +191,150 @@ class RSSService:
                 )
             return None
 
+    def _handle_recovery(self, url: str) -> None:
+        from src.core.runtime_state import runtime_state
+
+        fail_key = f'rss_fail_{url}'
+        if runtime_state.alert_state_cache.get(fail_key, 0) > 0:
+            runtime_state.alert_state_cache[fail_key] = 0
+            if self.bot and hasattr(self.bot, 'notifier'):
+                self.bot.notifier.clear_cooldown(f'rss_alert_{url}')
+                asyncio.create_task(
+                    self.bot.notifier.send_alert(
+                        title='RSS Feed Recovered',
+                        description=f'The RSS feed `{url}` is now responding correctly.',
+                        severity='INFO',
+                    )
+                )
+
+    def _mark_seen(self, key: tuple[str, str]) -> None:
+        self._seen[key] = None
+        self._seen.move_to_end(key)
+        if len(self._seen) > self._seen_capacity:
+            self._seen.popitem(last=False)
+
     async def process_and_dedupe(self, url: str, entries: list[dict]) -> list[dict]:
-        new_entries = []
+        """Insert unseen entries in one statement and return exactly those that were new."""
+        candidates: dict[str, dict] = {}
         for entry in entries:
-            try:
-                exists = await db.fetch_one(
-                    'SELECT 1 FROM rss_cache WHERE feed_url = $1 AND entry_id = $2', url, entry['entry_id']
-                )
-            except DatabaseUnavailableError:
-                logger.warning('Database unavailable during feed dedup check, stopping feed processing')
-                break
-            except Exception as exc:
-                logger.error('Failed to check RSS entry in db: %s', exc)
+            key = (url, entry['entry_id'])
+            if key in self._seen:
+                self._seen.move_to_end(key)
                 continue
-            if not exists:
+            if len(entry['entry_id']) > _ENTRY_ID_MAX_LENGTH:
+                # Truncating could merge distinct entries; skip it so the rest of the feed still posts
+                logger.warning('Skipping RSS entry with a %d-character id in %s', len(entry['entry_id']), url)
+                self._mark_seen(key)
+                continue
+            candidates.setdefault(entry['entry_id'], entry)
+        if not candidates:
+            return []
+
+        batch = list(candidates.values())
+        try:
+            rows = await self._insert_entries(url, batch)
+        except DatabaseUnavailableError as exc:
+            if is_connection_failure(exc):
+                logger.warning('Database unavailable during feed dedup, skipping feed %s', url)
+                return []
+            # The server rejected the batch; insert entry by entry so one bad entry only loses itself
+            logger.error('RSS entry batch for %s rejected, retrying one by one: %s', url, exc)
+            rows = []
+            attempted = []
+            for entry in batch:
                 try:
-                    await db.execute(
-                        """INSERT INTO rss_cache
-                           (feed_url, entry_id, title, link, summary, author)
-                           VALUES ($1, $2, $3, $4, $5, $6)
-                           ON CONFLICT DO NOTHING""",
-                        url,
-                        entry['entry_id'],
-                        entry['title'][:500],
-                        entry['link'][:500],
-                        entry['description'],
-                        entry['author'][:255],
-                    )
-                    new_entries.append(entry)
-                except Exception as exc:
-                    logger.error('Failed to insert RSS entry into db: %s', exc)
-        return new_entries
+                    rows.extend(await self._insert_entries(url, [entry]))
+                except DatabaseUnavailableError as entry_exc:
+                    if is_connection_failure(entry_exc):
+                        break
+                    logger.error('Dropping RSS entry %s from %s: %s', entry['entry_id'], url, entry_exc)
+                attempted.append(entry)
+            batch = attempted
+        except Exception as exc:
+            logger.error('Failed to insert RSS entries into db: %s', exc)
+            return []
 
-    async def get_latest_new_entries(self, category: str, limit: int = 5) -> list[dict]:
-        """Fetch feeds and return ONLY new entries (deduplicated via Postgres)."""
-        feeds_info = RSS_FEEDS.get(category, [])
-        all_new_entries: list[dict] = []
+        inserted = {row['entry_id'] for row in rows}
+        for entry in batch:
+            self._mark_seen((url, entry['entry_id']))
+        return [entry for entry in batch if entry['entry_id'] in inserted]
 
-        for url in feeds_info:
-            feed_data = await self.fetch_feed(url)
-            if not feed_data:
-                continue
+    async def _insert_entries(self, url: str, batch: list[dict]) -> list:
+        return await db.fetch(
+            _INSERT_NEW_ENTRIES_SQL,
+            url,
+            [entry['entry_id'] for entry in batch],
+            [entry['title'][:500] for entry in batch],
+            [entry['link'][:500] for entry in batch],
+            [entry['description'] for entry in batch],
+            [entry['author'][:255] for entry in batch],
+        )
 
-            new_entries = await self.process_and_dedupe(url, feed_data['entries'])
-            all_new_entries.extend(new_entries)
+    async def _fetch_bounded(self, url: str, require_entries: bool = False) -> dict | None:
+        """Fetch one feed under the per-host rate limit and the fan-out semaphore, recording latency."""
+        await self._host_limiter.acquire(url)
+        async with self._fetch_semaphore:
+            started = time.perf_counter()
+            feed_data = await self.fetch_feed(url, require_entries=require_entries)
+            elapsed = time.perf_counter() - started
+        self.feed_latency[url] = elapsed
+        logger.debug(
+            'Fetched feed %s in %.2fs (%s)',
+            url,
+            elapsed,
+            'failed' if feed_data is None else 'not modified' if feed_data['not_modified'] else 'ok',
+        )
+        return feed_data
 
+    async def fetch_feeds(self, urls: list[str], require_entries: bool = False) -> dict[str, dict | None]:
+        """Fetch many feeds concurrently; a refresh takes about as long as the slowest feed."""
+        unique_urls = list(dict.fromkeys(urls))
+        started = time.perf_counter()
+        results = await asyncio.gather(*(self._fetch_bounded(url, require_entries) for url in unique_urls))
+        if unique_urls:
+            slowest = max(unique_urls, key=lambda url: self.feed_latency.get(url, 0.0))
+            logger.info(
+                'Fetched %d feeds in %.2fs (slowest: %s at %.2fs)',
+                len(unique_urls),
+                time.perf_counter() - started,
+                slowest,
+                self.feed_latency.get(slowest, 0.0),
+            )
+        return dict(zip(unique_urls, results, strict=True))
+
+    @staticmethod
+    def _newest_first(entries: list[dict], limit: int) -> list[dict]:
         try:
-            all_new_entries.sort(
+            entries.sort(
                 key=lambda x: datetime.strptime(x['published'], '%a, %d %b %Y %H:%M:%S %z'),
                 reverse=True,
             )
         except Exception:
             pass
+        return entries[:limit]
+
+    async def refresh_feeds(self, categories: list[str] | None = None, limit: int = 5) -> dict[str, list[dict]]:
+        """Fetch every feed in ``categories`` concurrently and return only new entries per category."""
+        categories = list(categories) if categories is not None else list(RSS_FEEDS)
+        fetched = await self.fetch_feeds([url for category in categories for url in RSS_FEEDS.get(category, [])])
 
-        return all_new_entries[:limit]
+        new_by_url: dict[str, list[dict]] = {}
+        for url, feed_data in fetched.items():
+            # Unchanged feeds (HTTP 304) have nothing new to dedupe
+            if not feed_data or feed_data['not_modified']:
+                continue
+            new_by_url[url] = await self.process_and_dedupe(url, feed_data['entries'])
+
+        results = {}
+        for category in categories:
+            entries = [entry for url in RSS_FEEDS.get(category, []) for entry in new_by_url.pop(url, [])]
+            results[category] = self._newest_first(entries, limit)
+        return results
+
+    async def get_latest_new_entries(self, category: str, limit: int = 5) -> list[dict]:
+        """Fetch feeds and return ONLY new entries (deduplicated via Postgres)."""
+        results = await self.refresh_feeds([category], limit=limit)
+        return results.get(category, [])
 
     def get_available_categories(self) -> list[str]:
         return list(RSS_FEEDS.keys())
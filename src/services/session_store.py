@@ -0,0 +1,116 @@
+"""
+Persistence for in-flight activity sessions (``user_active_activities``).
+
+Open presence sessions (``PresencePipeline``) and voice sessions (RPG cog)
+only exist in memory, so a deploy or crash used to drop every session in
+progress. ``save`` writes a snapshot of all open sessions in one statement:
+rows for sessions that are still open are upserted and every other row is
+deleted, so the table always holds exactly one checkpoint. The presence
+pipeline writes it in the same transaction as the minutes it banks
+(``PresencePipeline.checkpoint``). ``load`` returns it
+on startup and the RPG cog reconciles it against live presence and voice state.
+
+Timestamps are naive UTC. Sessions are tracked on the monotonic clock in
+memory; ``to_wall`` / ``to_monotonic`` convert between the two.
+"""
+
+from __future__ import annotations
+
+import logging
+import time
+from collections.abc import Iterable
+from datetime import UTC, datetime, timedelta
+
+from src.database.backend import DatabaseBackend
+from src.database.database import db
+from src.database.statements import statements
+
+logger = logging.getLogger('VEKA.presence')
+
+# activity_type values besides the presence detail types ('game', 'listening', ...)
+CATEGORY_SESSION = 'category'  # activity_name: 'streaming', 'gaming' or 'listening'
+VOICE_SESSION = 'voice'  # activity_name: voice channel id
+
+_SAVE_SESSIONS_SQL = statements.register(
+    'sessions.save',
+    """
+    WITH open_sessions AS (
+        SELECT * FROM unnest($1::VARCHAR[], $2::VARCHAR[], $3::TEXT[], $4::TIMESTAMP[])
+            AS s(user_id, activity_type, activity_name, started_at)
+    ), closed AS (
+        DELETE FROM user_active_activities AS a
+        WHERE NOT EXISTS (
+            SELECT 1 FROM open_sessions AS o
+            WHERE o.user_id = a.user_id AND o.activity_type = a.activity_type AND o.activity_name = a.activity_name
+        )
+    )
+    INSERT INTO user_active_activities (user_id, activity_type, activity_name, started_at, checkpointed_at)
+    SELECT user_id, activity_type, activity_name, started_at, $5 FROM open_sessions
+    ON CONFLICT (user_id, activity_type, activity_name)
+    DO UPDATE SET started_at = EXCLUDED.started_at, checkpointed_at = EXCLUDED.checkpointed_at
+    """,
+)
+
+
+def utcnow() -> datetime:
+    return datetime.now(UTC).replace(tzinfo=None)
+
+
+def to_wall(started: float, now_monotonic: float, now: datetime) -> datetime:
+    """Naive-UTC time of a monotonic ``started``."""
+    return now - timedelta(seconds=now_monotonic - started)
+
+
+def to_monotonic(started_at: datetime, now_monotonic: float, now: datetime) -> float:
+    """Monotonic equivalent of a naive-UTC ``started_at``."""
+    return now_monotonic - (now - started_at).total_seconds()
+
+
+class SessionStore:
+    """Snapshot writes and startup reads of ``user_active_activities``."""
+
+    def __init__(self) -> None:
+        self.stats: dict[str, float] = {'saves': 0, 'rows_saved': 0, 'last_save_ms': 0.0, 'loaded': 0}
+
+    async def save(self, sessions: Iterable[tuple[int, str, str, float]], conn: DatabaseBackend | None = None) -> int:
+        """
+        Replace the stored checkpoint with ``sessions`` ((user_id, activity_type,
+        activity_name, monotonic start) tuples). Without ``conn`` it spills to the
+        outbox during outages.
+        """
+        started = time.perf_counter()
+        now_monotonic, now = time.monotonic(), utcnow()
+        user_ids: list[str] = []
+        activity_types: list[str] = []
+        activity_names: list[str] = []
+        started_at: list[datetime] = []
+        for user_id, activity_type, activity_name, session_start in sessions:
+            user_ids.append(str(user_id))
+            activity_types.append(activity_type)
+            activity_names.append(activity_name)
+            started_at.append(to_wall(session_start, now_monotonic, now))
+
+        args = (user_ids, activity_types, activity_names, started_at, now)
+        if conn is None:
+            await db.execute(_SAVE_SESSIONS_SQL, *args, outbox=True)
+        else:
+            await conn.execute(_SAVE_SESSIONS_SQL, *args)
+        self.stats['saves'] += 1
+        self.stats['rows_saved'] = len(user_ids)
+        self.stats['last_save_ms'] = round((time.perf_counter() - started) * 1000, 3)
+        return len(user_ids)
+
+    async def load(self) -> list:
+        """The stored checkpoint: user_id, activity_type, activity_name, started_at, checkpointed_at."""
+        rows = await db.fetch(
+            """
+            SELECT user_id, activity_type, activity_name, started_at, checkpointed_at
+            FROM user_active_activities
+            """
+        )
+        self.stats['loaded'] = len(rows)
+        return rows
+
+
+# Global session store instance
+session_store = SessionStore()
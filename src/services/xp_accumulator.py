@@ -0,0 +1,257 @@
+"""
+Write-behind XP accumulator.
+
+Merges per-user XP and activity counter deltas in memory and flushes them to
+``users`` as one set-based upsert, instead of issuing several UPDATEs per
+rewarded message, command, or voice session. The matching
+``user_activity_log`` rows are handed to the buffered COPY writer, and the
+upserted totals are fed to the in-process leaderboard cache.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+from dataclasses import dataclass
+from datetime import UTC, datetime
+
+from src.config.config import XP_ACCUMULATOR_MAX_USERS
+from src.core.runtime_state import runtime_state
+from src.database.database import db
+from src.database.identity_map import user_ids
+from src.database.outbox import is_connection_failure
+from src.database.statements import statements
+from src.services.activity_log_writer import activity_log_writer
+from src.services.activity_role_tracker import activity_role_tracker
+from src.services.leaderboard_service import leaderboard_cache
+from src.utils.safety import DatabaseUnavailableError
+
+logger = logging.getLogger('VEKA.xp_accumulator')
+
+# Activity types that bump a counter column on `users`
+_COUNTER_FIELDS = {
+    'message': 'messages',
+    'voice': 'voice_minutes',
+    'command': 'commands',
+}
+
+_FLUSH_USERS_SQL = statements.register(
+    'xp.flush_users',
+    """
+    INSERT INTO users (
+        discord_id, points, experience, level,
+        total_messages, total_voice_minutes, total_commands,
+        last_active, inactive_week_notified, inactive_month_notified
+    )
+    SELECT d.discord_id, d.points, d.points, FLOOR(SQRT(GREATEST(d.points, 0) / 100.0))::INT,
+           d.messages, d.voice_minutes, d.commands,
+           d.last_active, FALSE, FALSE
+    FROM unnest($1::VARCHAR[], $2::INT[], $3::INT[], $4::INT[], $5::INT[], $6::TIMESTAMP[])
+        AS d(discord_id, points, messages, voice_minutes, commands, last_active)
+    ON CONFLICT (discord_id) DO UPDATE SET
+        points = COALESCE(users.points, 0) + EXCLUDED.points,
+        experience = COALESCE(users.experience, 0) + EXCLUDED.experience,
+        level = FLOOR(SQRT(GREATEST(COALESCE(users.points, 0) + EXCLUDED.points, 0) / 100.0))::INT,
+        total_messages = COALESCE(users.total_messages, 0) + EXCLUDED.total_messages,
+        total_voice_minutes = COALESCE(users.total_voice_minutes, 0) + EXCLUDED.total_voice_minutes,
+        total_commands = COALESCE(users.total_commands, 0) + EXCLUDED.total_commands,
+        last_active = GREATEST(users.last_active, EXCLUDED.last_active),
+        inactive_week_notified = FALSE,
+        inactive_month_notified = FALSE
+    RETURNING discord_id, points, total_messages, total_voice_minutes
+""",
+)
+
+
+@dataclass
+class XPDelta:
+    """Pending, not-yet-persisted changes for a single user."""
+
+    points: int = 0
+    messages: int = 0
+    voice_minutes: int = 0
+    commands: int = 0
+    last_active: datetime | None = None
+
+    def merge(self, other: XPDelta) -> None:
+        self.points += other.points
+        self.messages += other.messages
+        self.voice_minutes += other.voice_minutes
+        self.commands += other.commands
+        if other.last_active and (self.last_active is None or other.last_active > self.last_active):
+            self.last_active = other.last_active
+
+
+class XPAccumulator:
+    """
+    In-memory, per-user delta accumulator with periodic set-based flushing.
+
+    ``add()`` never touches the database. ``flush()`` swaps the pending buffer
+    out and writes it in one upsert; on failure the deltas are merged back so
+    nothing is lost while the database is unavailable. A batch the server
+    rejects is split until the offending user's delta is isolated and dropped,
+    the way outbox replay isolates a rejected entry. The buffer is bounded:
+    once ``max_users`` distinct users are pending, deltas for new users are
+    dropped (and counted) until the next successful flush.
+    """
+
+    def __init__(self, max_users: int = XP_ACCUMULATOR_MAX_USERS):
+        self.max_users = max_users
+        self._pending: dict[str, XPDelta] = {}
+        self._inflight: dict[str, XPDelta] = {}
+        self._flush_lock = asyncio.Lock()
+        self.stats: dict[str, int] = {
+            'events': 0,
+            'flushes': 0,
+            'users_flushed': 0,
+            'dropped_events': 0,
+            'failed_flushes': 0,
+            'rejected_users': 0,
+        }
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def add(
+        self,
+        user_id: int,
+        activity_type: str,
+        points: int,
+        quantity: int = 1,
+        guild_id: int = 0,
+        channel_id: int = 0,
+    ) -> bool:
+        """Record an XP event. Returns False if it was dropped because the buffer is full."""
+        key = str(user_id)
+        now = datetime.now(UTC).replace(tzinfo=None)
+
+        delta = self._pending.get(key)
+        if delta is None:
+            if len(self._pending) >= self.max_users:
+                self.stats['dropped_events'] += 1
+                logger.warning(
+                    'XP accumulator full (%d users); dropping %s event for %s', self.max_users, activity_type, key
+                )
+                return False
+            delta = self._pending[key] = XPDelta()
+
+        delta.points += points
+        delta.last_active = now
+        counter = _COUNTER_FIELDS.get(activity_type)
+        if counter:
+            setattr(delta, counter, getattr(delta, counter) + quantity)
+
+        activity_log_writer.add(key, activity_type, points, channel_id=channel_id, guild_id=guild_id, created_at=now)
+
+        self.stats['events'] += 1
+        return True
+
+    def pending_for(self, user_id: int) -> XPDelta:
+        """Return the unpersisted delta for a user (pending plus in-flight), for read-your-writes."""
+        key = str(user_id)
+        combined = XPDelta()
+        for source in (self._inflight, self._pending):
+            delta = source.get(key)
+            if delta is not None:
+                combined.merge(delta)
+        return combined
+
+    def _restore(self, batch: dict[str, XPDelta]) -> None:
+        """Merge a failed batch back into the pending buffer."""
+        for key, delta in batch.items():
+            existing = self._pending.get(key)
+            if existing is not None:
+                delta.merge(existing)
+                self._pending[key] = delta
+            elif len(self._pending) < self.max_users:
+                self._pending[key] = delta
+            else:
+                self.stats['dropped_events'] += 1
+
+    async def flush(self) -> int:
+        """Persist all pending deltas. Returns the number of users written."""
+        async with self._flush_lock:
+            if not self._pending:
+                return 0
+            if not runtime_state.db_available and not db.deferring_writes:
+                return 0
+
+            batch, self._pending = self._pending, {}
+            self._inflight = batch
+
+            parts = [batch]
+            part: dict[str, XPDelta] | None = None
+            rows: list = []
+            written: list[str] = []
+            try:
+                while parts:
+                    part = parts.pop()
+                    try:
+                        rows.extend(await self._write(part))
+                    except DatabaseUnavailableError as exc:
+                        if is_connection_failure(exc):
+                            raise
+                        self._split_rejected(part, parts, exc)
+                    else:
+                        written.extend(part)
+                    part = None
+            except DatabaseUnavailableError as exc:
+                self.stats['failed_flushes'] += 1
+                logger.warning('XP flush failed for %d users, will retry: %s', len(batch) - len(written), exc)
+            finally:
+                self._inflight = {}
+                # Any exit before a part is written (outage, cancellation) keeps its deltas
+                if part is not None:
+                    parts.append(part)
+                for unwritten in parts:
+                    self._restore(unwritten)
+
+            if not written:
+                return 0
+            # The upsert may have created users that were cached as missing
+            user_ids.forget_missing(written)
+            leaderboard_cache.observe(rows)
+            for row in rows:
+                activity_role_tracker.observe_points(row['discord_id'], row['points'])
+            self.stats['flushes'] += 1
+            self.stats['users_flushed'] += len(written)
+            logger.debug('Flushed XP deltas for %d users', len(written))
+            return len(written)
+
+    async def _write(self, batch: dict[str, XPDelta]) -> list:
+        """Upsert one batch; returns the updated rows (none when spilled to the outbox)."""
+        keys = list(batch)
+        args = (
+            keys,
+            [batch[k].points for k in keys],
+            [batch[k].messages for k in keys],
+            [batch[k].voice_minutes for k in keys],
+            [batch[k].commands for k in keys],
+            [batch[k].last_active for k in keys],
+        )
+        if db.deferring_writes:
+            # Circuit open (or a backlog replaying): persist the batch in the local
+            # outbox so it survives restarts; ``reconcile`` refreshes the leaderboard
+            await db.execute(_FLUSH_USERS_SQL, *args, outbox=True)
+            return []
+        return await db.fetch(_FLUSH_USERS_SQL, *args)
+
+    def _split_rejected(self, part: dict[str, XPDelta], parts: list[dict[str, XPDelta]], exc: Exception) -> None:
+        """
+        Queue the halves of a batch the server rejected, until the offending
+        user is isolated and dropped. Requeueing the batch as is would fail on
+        every flush and block all XP persistence.
+        """
+        if len(part) > 1:
+            items = list(part.items())
+            middle = len(items) // 2
+            parts.append(dict(items[:middle]))
+            parts.append(dict(items[middle:]))
+            return
+        key, delta = next(iter(part.items()))
+        self.stats['rejected_users'] += 1
+        logger.error('Dropping XP delta for %s rejected by the database: %s | %r', key, exc, delta)
+
+
+# Global accumulator instance
+xp_accumulator = XPAccumulator()
@@ -0,0 +1,113 @@
+"""
+Expiring per-key state for cooldowns and throttles.
+
+``ExpiringDict`` keeps entries in two generations. Writes go to the current
+generation; once ``ttl`` has passed the current one becomes the previous one,
+and the old previous generation is dropped whole. Every entry therefore lives
+at least ``ttl`` and at most ``2 * ttl`` after it was last written. Lookups are
+O(1) and eviction is amortized O(1). Memory stays bounded by the keys written
+in the last two windows, rather than growing with every key ever seen.
+
+It fits state that is equivalent to "no entry" once ``ttl`` has passed, such as
+a cooldown timestamp or a token bucket that has refilled.
+"""
+
+from __future__ import annotations
+
+import time
+from collections.abc import Callable, Iterator
+from typing import cast, overload
+
+_MISSING = object()
+
+
+class ExpiringDict[K, V]:
+    """Mapping whose entries expire ``ttl`` to ``2 * ttl`` seconds after they were last set."""
+
+    __slots__ = ('ttl', '_clock', '_current', '_previous', '_rotated_at')
+
+    def __init__(self, ttl: float, clock: Callable[[], float] = time.monotonic):
+        if ttl <= 0:
+            raise ValueError('ttl must be positive')
+        self.ttl = ttl
+        self._clock = clock
+        self._current: dict[K, V] = {}
+        self._previous: dict[K, V] = {}
+        self._rotated_at = clock()
+
+    def _rotate(self) -> None:
+        now = self._clock()
+        elapsed = now - self._rotated_at
+        if elapsed < self.ttl:
+            return
+        # After two idle windows even the current generation has expired
+        self._previous = self._current if elapsed < 2 * self.ttl else {}
+        self._current = {}
+        self._rotated_at = now
+
+    def _find(self, key: K) -> V | object:
+        self._rotate()
+        value = self._current.get(key, _MISSING)
+        if value is _MISSING:
+            value = self._previous.get(key, _MISSING)
+        return value
+
+    @overload
+    def get(self, key: K, default: None = None) -> V | None: ...
+
+    @overload
+    def get(self, key: K, default: V) -> V: ...
+
+    def get(self, key: K, default: V | None = None) -> V | None:
+        value = self._find(key)
+        return default if value is _MISSING else cast(V, value)
+
+    def __getitem__(self, key: K) -> V:
+        value = self._find(key)
+        if value is _MISSING:
+            raise KeyError(key)
+        return cast(V, value)
+
+    def __setitem__(self, key: K, value: V) -> None:
+        self._rotate()
+        self._current[key] = value
+        self._previous.pop(key, None)
+
+    def __delitem__(self, key: K) -> None:
+        if self._take(key) is _MISSING:
+            raise KeyError(key)
+
+    def _take(self, key: K) -> V | object:
+        value = self._current.pop(key, _MISSING)
+        previous = self._previous.pop(key, _MISSING)
+        return previous if value is _MISSING else value
+
+    @overload
+    def pop(self, key: K, default: None = None) -> V | None: ...
+
+    @overload
+    def pop(self, key: K, default: V) -> V: ...
+
+    def pop(self, key: K, default: V | None = None) -> V | None:
+        value = self._take(key)
+        return default if value is _MISSING else cast(V, value)
+
+    def __contains__(self, key: object) -> bool:
+        self._rotate()
+        return key in self._current or key in self._previous
+
+    def __len__(self) -> int:
+        self._rotate()
+        return len(self._current) + len(self._previous)
+
+    def __iter__(self) -> Iterator[K]:
+        self._rotate()
+        yield from list(self._current)
+        yield from list(self._previous)
+
+    def keys(self) -> list[K]:
+        return list(self)
+
+    def clear(self) -> None:
+        self._current.clear()
+        self._previous.clear()
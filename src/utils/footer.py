@@ -1,15 +1,21 @@
 """
 Dynamic Embed Footer Engine
 Builds footer text based on user role, server join date, and DB-persisted state.
+Footer state is cached in memory and written back to the DB in batches.
 """
 
+import asyncio
 import logging
+import time
+from collections import OrderedDict
 from datetime import UTC, datetime, timedelta
 from types import SimpleNamespace
 
 import nextcord
 
+from src.config.config import FOOTER_CACHE_SIZE, FOOTER_CACHE_TTL, FOOTER_FLUSH_INTERVAL
 from src.database.database import db
+from src.database.statements import statements
 from src.utils.security.rbac import ROLE_HIERARCHY, Role, rbac
 
 logger = logging.getLogger('VEKA.footer')
@@ -58,53 +64,175 @@ _ADS = [
 # DB helpers
 # ============================================================
 
+_SELECT_FOOTER_STATE_SQL = statements.register(
+    'footer.select_state', 'SELECT * FROM user_footer_state WHERE user_id = $1'
+)
+# NULL means "not changed": existing rows keep that field, new rows get the defaults
+_UPSERT_FOOTER_STATES_SQL = statements.register(
+    'footer.upsert_states',
+    """
+    WITH changes AS (
+        SELECT * FROM unnest($1::BIGINT[], $2::TIMESTAMP[], $3::INT[]) AS c(user_id, prompt, tip)
+    ), updated AS (
+        UPDATE user_footer_state AS f SET
+            last_contribution_prompt = COALESCE(c.prompt, f.last_contribution_prompt),
+            tip_index = COALESCE(c.tip, f.tip_index)
+        FROM changes AS c
+        WHERE f.user_id = c.user_id
+        RETURNING f.user_id
+    )
+    INSERT INTO user_footer_state (user_id, last_contribution_prompt, tip_index)
+    SELECT user_id, COALESCE(prompt, NOW() AT TIME ZONE 'UTC'), COALESCE(tip, 0)
+    FROM changes
+    WHERE user_id NOT IN (SELECT user_id FROM updated)
+    ON CONFLICT (user_id) DO NOTHING
+    """,
+)
+
 
 async def _get_footer_state(user_id: int) -> dict | None:
     """Fetch user footer state from DB. Returns None if no row exists."""
     try:
-        row = await db.fetch_one('SELECT * FROM user_footer_state WHERE user_id = $1', user_id)
+        row = await db.fetch_one(_SELECT_FOOTER_STATE_SQL, user_id)
         return dict(row) if row else None
     except Exception as exc:
         logger.warning('Failed to fetch footer state for %s: %s', user_id, exc)
         return None
 
 
-async def _upsert_footer_state(
-    user_id: int,
-    *,
-    last_contribution_prompt: datetime | None = None,
-    tip_index: int | None = None,
-) -> None:
-    """Insert or update user footer state row."""
-    try:
-        existing = await _get_footer_state(user_id)
-        if existing:
-            updates = []
-            params: list = []
-            idx = 1
-            if last_contribution_prompt is not None:
-                updates.append(f'last_contribution_prompt = ${idx}')
-                params.append(last_contribution_prompt)
-                idx += 1
-            if tip_index is not None:
-                updates.append(f'tip_index = ${idx}')
-                params.append(tip_index)
-                idx += 1
-            if updates:
-                params.append(user_id)
-                await db.execute(
-                    f'UPDATE user_footer_state SET {", ".join(updates)} WHERE user_id = ${idx}',
-                    *params,
-                )
-        else:
-            await db.execute(
-                'INSERT INTO user_footer_state (user_id, last_contribution_prompt, tip_index) VALUES ($1, $2, $3)',
-                user_id,
-                last_contribution_prompt or datetime.now(UTC),
-                tip_index if tip_index is not None else 0,
-            )
-    except Exception as exc:
-        logger.warning('Failed to upsert footer state for %s: %s', user_id, exc)
+def _naive_utc(value: datetime | None) -> datetime | None:
+    if value is None or value.tzinfo is None:
+        return value
+    return value.astimezone(UTC).replace(tzinfo=None)
+
+
+async def _write_footer_states(changes: dict[int, dict]) -> None:
+    """Upsert the changed fields of many users in one statement (spilled to the outbox during outages)."""
+    user_ids = list(changes)
+    await db.execute(
+        _UPSERT_FOOTER_STATES_SQL,
+        user_ids,
+        [_naive_utc(changes[uid].get('last_contribution_prompt')) for uid in user_ids],
+        [changes[uid].get('tip_index') for uid in user_ids],
+        outbox=True,
+    )
+
+
+# ============================================================
+# Footer state cache
+# ============================================================
+
+
+class FooterStateCache:
+    """
+    TTL/LRU cache of per-user footer state with batched write-back.
+
+    Reads are served from memory after the first load; tip rotation and
+    contribution-prompt updates only touch the cache and record the changed
+    fields. Those are upserted together ``flush_interval`` seconds after the
+    first change and are kept (and retried) until a write succeeds, so they
+    survive both LRU eviction and database outages. Only changed fields are
+    written, so a state that could not be loaded never overwrites the row.
+    """
+
+    def __init__(
+        self,
+        max_size: int = FOOTER_CACHE_SIZE,
+        ttl: float = FOOTER_CACHE_TTL,
+        flush_interval: float = FOOTER_FLUSH_INTERVAL,
+    ):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.flush_interval = flush_interval
+        # user_id -> (loaded_at, state)
+        self._entries: OrderedDict[int, tuple[float, dict]] = OrderedDict()
+        # user_id -> fields changed since the last write
+        self._dirty: dict[int, dict] = {}
+        self._flush_task: asyncio.Task | None = None
+        self.stats: dict[str, int] = {'hits': 0, 'misses': 0, 'writes': 0, 'failed_writes': 0}
+
+    def _store(self, user_id: int, state: dict) -> None:
+        self._entries[user_id] = (time.monotonic(), state)
+        self._entries.move_to_end(user_id)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    async def get(self, user_id: int) -> dict | None:
+        """Return a user's footer state, loading it from the DB on a miss or after expiry."""
+        entry = self._entries.get(user_id)
+        if entry is not None and (time.monotonic() - entry[0] < self.ttl or user_id in self._dirty):
+            self._entries.move_to_end(user_id)
+            self.stats['hits'] += 1
+            return entry[1]
+
+        self.stats['misses'] += 1
+        state = await _get_footer_state(user_id)
+        changes = self._dirty.get(user_id)
+        if changes:
+            # Unflushed changes win over whatever the DB still holds
+            state = {**(state or {'user_id': user_id}), **changes}
+        if state is not None:
+            self._store(user_id, state)
+        return state
+
+    def update(
+        self,
+        user_id: int,
+        *,
+        last_contribution_prompt: datetime | None = None,
+        tip_index: int | None = None,
+    ) -> None:
+        """Apply a change in memory and queue it for the next batched write."""
+        changes: dict = {}
+        if last_contribution_prompt is not None:
+            changes['last_contribution_prompt'] = last_contribution_prompt
+        if tip_index is not None:
+            changes['tip_index'] = tip_index
+        if not changes:
+            return
+
+        # Uncached states are not synthesized here; ``get`` loads the row and applies the changes
+        entry = self._entries.get(user_id)
+        if entry is not None:
+            self._store(user_id, {**entry[1], **changes})
+        self._dirty[user_id] = {**self._dirty.get(user_id, {}), **changes}
+        self._schedule_flush()
+
+    def _schedule_flush(self) -> None:
+        if self._flush_task is not None and not self._flush_task.done():
+            return
+        try:
+            self._flush_task = asyncio.get_running_loop().create_task(self._delayed_flush())
+        except RuntimeError:
+            pass  # No running loop; the next update (or an explicit flush) persists the batch
+
+    async def _delayed_flush(self) -> None:
+        await asyncio.sleep(self.flush_interval)
+        await self.flush()
+        if self._dirty:
+            # Write failed (e.g. DB down) or new changes arrived meanwhile; try again later
+            self._flush_task = asyncio.get_running_loop().create_task(self._delayed_flush())
+
+    async def flush(self) -> int:
+        """Persist all dirty states in one upsert. Returns the number of rows written."""
+        if not self._dirty:
+            return 0
+        batch, self._dirty = self._dirty, {}
+        try:
+            await _write_footer_states(batch)
+        except Exception as exc:
+            # Keep anything newer that was queued while the write was in flight
+            for user_id, changes in batch.items():
+                self._dirty[user_id] = {**changes, **self._dirty.get(user_id, {})}
+            self.stats['failed_writes'] += 1
+            logger.warning('Failed to write %d footer states, will retry: %s', len(batch), exc)
+            return 0
+        self.stats['writes'] += len(batch)
+        return len(batch)
+
+
+# Global footer state cache instance
+footer_state_cache = FooterStateCache()
 
 
 # ============================================================
@@ -191,18 +319,18 @@ async def build_footer(
 
     # New user check (by server join date)
     if isinstance(user, nextcord.Member) and _is_new_user(user):
-        state = await _get_footer_state(user.id)
-        tip_idx = (state.get('tip_index', 0) if state else 0) % len(_NEW_USER_TIPS)
+        state = await footer_state_cache.get(user.id)
+        tip_idx = ((state.get('tip_index') or 0) if state else 0) % len(_NEW_USER_TIPS)
         tip = _NEW_USER_TIPS[tip_idx]
         # Advance tip index for next time
-        await _upsert_footer_state(user.id, tip_index=tip_idx + 1)
+        footer_state_cache.update(user.id, tip_index=tip_idx + 1)
         footer = _NEW_USER_FOOTER.format(**contrib, tip=tip)
         if guild and guild.id != MAIN_GUILD_ID:
             footer = f'{footer} | {_JOIN_VEKA_CTA.format(invite_url=MAIN_SERVER_INVITE_URL)}'
         return footer
 
     # Regular user: contribution link once/day, then ads
-    state = await _get_footer_state(user.id)
+    state = await footer_state_cache.get(user.id)
     now = datetime.now(UTC)
     show_contribution = True
     if state and state.get('last_contribution_prompt'):
@@ -213,7 +341,7 @@ async def build_footer(
             show_contribution = False
 
     if show_contribution:
-        await _upsert_footer_state(user.id, last_contribution_prompt=now)
+        footer_state_cache.update(user.id, last_contribution_prompt=now)
         footer = _FULL_FOOTER.format(**contrib, repo=REPO_URL)
         if guild and guild.id != MAIN_GUILD_ID:
             footer = f'{footer} | {_JOIN_VEKA_CTA.format(invite_url=MAIN_SERVER_INVITE_URL)}'
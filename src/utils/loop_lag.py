@@ -0,0 +1,53 @@
+"""
+Event loop lag monitor.
+
+Sleeps for a fixed interval and measures how late it wakes up. The overshoot is
+time the loop spent running something else without yielding (CPU-bound parsing,
+blocking calls), which is also how late heartbeats and command handlers run.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+
+from src.config.config import LOOP_LAG_INTERVAL, LOOP_LAG_WARN_MS
+from src.core.runtime_state import runtime_state
+
+logger = logging.getLogger('VEKA.loop_lag')
+
+
+class LoopLagMonitor:
+    """Background task that records event loop lag into ``runtime_state``."""
+
+    def __init__(self, interval: float = LOOP_LAG_INTERVAL, warn_ms: float = LOOP_LAG_WARN_MS):
+        self.interval = interval
+        self.warn_ms = warn_ms
+        self._task: asyncio.Task | None = None
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run(), name='loop-lag-monitor')
+
+    def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            lag_ms = max(0.0, (time.perf_counter() - started - self.interval) * 1000)
+
+            runtime_state.loop_lag_ms = lag_ms
+            runtime_state.loop_lag_max_ms = max(runtime_state.loop_lag_max_ms, lag_ms)
+            # Exponentially weighted average, roughly the last ~20 samples
+            runtime_state.loop_lag_avg_ms += (lag_ms - runtime_state.loop_lag_avg_ms) * 0.05
+            if lag_ms >= self.warn_ms:
+                logger.warning('Event loop lag %.0fms (blocked for longer than %.0fms)', lag_ms, self.warn_ms)
+
+
+# Global loop lag monitor instance
+loop_lag_monitor = LoopLagMonitor()
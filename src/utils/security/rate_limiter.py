@@ -8,6 +8,8 @@ import logging
 import time
 from functools import wraps
 
+from src.utils.expiring import ExpiringDict
+
 logger = logging.getLogger('VEKA.security.rate_limiter')
 
 
@@ -22,8 +24,6 @@ class RateLimiter:
     """
 
     def __init__(self):
-        # user_id:command -> (tokens, last_update)
-        self.buckets: dict[str, tuple[float, float]] = {}
         self.lock = asyncio.Lock()
 
         # Default limits per command type
@@ -35,6 +35,12 @@ class RateLimiter:
             'admin': (10, 60),  # 10 admin commands per minute
         }
 
+        # user_id:command -> (tokens, last_update)
+        # A bucket left alone for a full window has refilled, which is the same as having no
+        # entry, so buckets expire after the longest window instead of accumulating forever
+        longest_window = max(window for _, window in self.default_limits.values())
+        self.buckets: ExpiringDict[str, tuple[float, float]] = ExpiringDict(longest_window, clock=time.time)
+
     def _get_key(self, user_id: str, command: str) -> str:
         """Generate unique key for user-command combination"""
         return f'{user_id}:{command}'